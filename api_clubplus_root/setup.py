@@ -8,11 +8,17 @@ setup(
     install_requires=[
         'Flask',
         'requests',
-        'python-dotenv'
+        'python-dotenv',
+        'SQLAlchemy',
+        'humanize'
     ],
+    extras_require={
+        # Columnar activity frames, /analytics and activity streams
+        'analytics': ['numpy'],
+    },
     entry_points='''
         [console_scripts]
-        strava_api=strava_api_clubplus.api:main
+        strava_api=api_clubplus.api:main
     ''',
     author='Club+',
     author_email='reddyrithwik23@gmail.com',
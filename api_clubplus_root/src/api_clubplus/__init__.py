@@ -1 +1,19 @@
-from .api import authorize, strava_auth, refresh_token, revoke_token, get_activities
+# Public names, each imported from its module on first access so that
+# `import api_clubplus.<module>` doesn't pull in Flask apps it won't use
+_EXPORTS = {
+    'create_app': '.factory',
+    'authorize': '.api',
+    'strava_auth': '.api',
+    'refresh_token': '.api',
+    'revoke_token': '.api',
+    'get_activities': '.api',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(_EXPORTS[name], __name__), name)
@@ -0,0 +1,103 @@
+# analytics.py :
+
+from datetime import date
+
+from sqlalchemy import select
+
+from .frames import np, require_numpy
+from .models import SportType
+
+# Pace histogram bins, seconds per km (2:00 to 12:00 in 30 s steps)
+PACE_BINS = tuple(range(120, 721, 30))
+SPEED_PERCENTILES = (10, 25, 50, 75, 90)
+# Rolling windows for acute and chronic training load, in days
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 42
+
+
+def pace_distribution(frame, bins=PACE_BINS):
+    """Histogram of average pace (s/km) over activities with distance; outliers fall in the end bins"""
+    dist = frame['dist']
+    moving = frame['moving_time']
+    has_distance = dist > 0
+    pace = moving[has_distance] / (dist[has_distance] / 1000.0)
+    edges = np.asarray(bins, dtype='float64')
+    counts, _ = np.histogram(np.clip(pace, edges[0], edges[-1]), bins=edges)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def speed_percentiles(frame, percentiles=SPEED_PERCENTILES):
+    """Percentiles of average and max speed (m/s), ignoring activities without them"""
+    result = {}
+    for column in ('avg_speed', 'max_speed'):
+        values = frame[column]
+        values = values[~np.isnan(values)]
+        result[column] = ({str(p): float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+                          if len(values) else {})
+    return result
+
+
+def sport_totals(frame):
+    """Count, distance, moving time and elevation per sport type id, busiest first"""
+    sports, index = np.unique(frame['sport_type_id'], return_inverse=True)
+    count = np.bincount(index, minlength=len(sports))
+    distance = np.bincount(index, weights=frame['dist'], minlength=len(sports))
+    moving_time = np.bincount(index, weights=frame['moving_time'], minlength=len(sports))
+    elevation = np.bincount(index, weights=np.nan_to_num(frame['total_elevation_gain']),
+                            minlength=len(sports))
+    order = np.argsort(-distance, kind='stable')
+    return [{
+        'sport_type_id': int(sports[i]),
+        'activities': int(count[i]),
+        'distance': float(distance[i]),
+        'moving_time': int(moving_time[i]),
+        'elevation_gain': float(elevation[i]),
+    } for i in order]
+
+
+def training_load(frame, days=90, today=None):
+    """Daily load (moving minutes by local day) with its acute and chronic rolling means
+
+    Returns the last `days` days.  The ratio of acute to chronic load is the
+    usual injury-risk signal: well above 1 means a sudden jump in training.
+    """
+    today = np.datetime64(today or date.today(), 'D')
+    first = today - (days + CHRONIC_DAYS - 2)
+    day = frame['start_date_local'].astype('datetime64[D]')
+    recent = (day >= first) & (day <= today)
+    offsets = (day[recent] - first).astype('int64')
+    span = days + CHRONIC_DAYS - 1
+    load = np.bincount(offsets, weights=frame['moving_time'][recent] / 60.0, minlength=span)
+
+    cumulative = np.concatenate(([0.0], np.cumsum(load)))
+    end = np.arange(CHRONIC_DAYS - 1, span) + 1
+    acute = (cumulative[end] - cumulative[end - ACUTE_DAYS]) / ACUTE_DAYS
+    chronic = (cumulative[end] - cumulative[end - CHRONIC_DAYS]) / CHRONIC_DAYS
+    ratio = np.divide(acute, chronic, out=np.zeros_like(acute), where=chronic > 0)
+    start = today - (days - 1)
+    return [{
+        'date': (start + i).item().isoformat(),
+        'load': float(load[CHRONIC_DAYS - 1 + i]),
+        'acute': float(acute[i]),
+        'chronic': float(chronic[i]),
+        'ratio': float(ratio[i]),
+    } for i in range(days)]
+
+
+def sport_names(session):
+    return dict(session.execute(select(SportType.id, SportType.name)).all())
+
+
+def summarize(frame, days=90, today=None, sport_names=None):
+    """Everything /analytics reports, from one frame"""
+    require_numpy()
+    totals = sport_totals(frame)
+    for row in totals:
+        row['sport_type'] = (sport_names or {}).get(row['sport_type_id'], 'Other')
+    return {
+        'activities': len(frame),
+        'pace_distribution': pace_distribution(frame),
+        'speed_percentiles': speed_percentiles(frame),
+        'sport_totals': totals,
+        'training_load': training_load(frame, days, today),
+    }
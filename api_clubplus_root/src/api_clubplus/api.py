@@ -1,97 +1,154 @@
 # api.py :
 
-from flask import Flask, request, jsonify
-import requests
-from dotenv import load_dotenv
-import os
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+import json
+from .config import authorization_url, credentials
+from .conditional import is_not_modified, make_etag, not_modified, with_validators
 
-app = Flask(__name__)
+api_bp = Blueprint("api", __name__)
 
-# Load environment variables
-load_dotenv()
 
-# Strava OAuth settings
-CLIENT_ID = os.getenv('CLIENT_ID')
-CLIENT_SECRET = os.getenv('CLIENT_SECRET')
-REDIRECT_URI = 'http://localhost'
-STRAVA_AUTH_URL = 'https://www.strava.com/oauth/authorize'
-TOKEN_URL = 'https://www.strava.com/oauth/token'
-API_URL = 'https://www.strava.com/api/v3'
+def strava():
+    # The shared Strava client; requests and the caches load with the first call
+    from .client import get_client
+    return get_client()
 
-@app.route("/authorize")
+
+def request_access_token():
+    """The caller's Strava token, from an `Authorization: Bearer` header or the JSON body
+
+    Never from the query string, which ends up in access logs and proxies.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    body = request.get_json(silent=True) or {}
+    return body.get('access_token')
+
+
+def token_fields(token_set):
+    """What a client needs from a token response to refresh ahead of expiry"""
+    return {key: token_set.get(key) for key in ('access_token', 'refresh_token', 'expires_at')}
+
+
+@api_bp.route("/authorize")
 def authorize():
     """Redirect user to the Strava Authorization page"""
-    # Define the desired scope
-    scope = "activity:read_all,read_all" 
-    auth_url = f"{STRAVA_AUTH_URL}?client_id={CLIENT_ID}&redirect_uri={REDIRECT_URI}&response_type=code&scope={scope}"
-    return jsonify({"authorization_url": auth_url})
+    return jsonify({"authorization_url": authorization_url()})
 
-@app.route("/strava/auth", methods=['POST'])
+@api_bp.route("/strava/auth", methods=['POST'])
 def strava_auth():
     """Exchange authorization code for access token"""
     auth_code = request.json.get('code')
 
-    token_params = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'code': auth_code,
-        'grant_type': 'authorization_code'
-    }
-    response = requests.post(TOKEN_URL, data=token_params)
+    response = strava().exchange_code(*credentials(), auth_code)
     if response.status_code == 200:
-        access_token = response.json().get('access_token')
-        return jsonify({"access_token": access_token})
+        return jsonify(token_fields(response.json()))
     else:
         return jsonify({"error": "Failed to authenticate with Strava"}), response.status_code
     
-@app.route("/refresh_token", methods=['POST'])
+@api_bp.route("/refresh_token", methods=['POST'])
 def refresh_token():
-    """Refresh the access token"""
+    """Refresh the access token
+
+    Returns the new refresh token and expires_at too: Strava may rotate the
+    refresh token, and clients should refresh again shortly before expiry.
+    """
     refresh_token = request.json.get('refresh_token')
-    token_params = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'refresh_token': refresh_token,
-        'grant_type': 'refresh_token'
-    }
-    response = requests.post(TOKEN_URL, data=token_params)
+    response = strava().refresh(*credentials(), refresh_token)
     if response.status_code == 200:
-        access_token = response.json().get('access_token')
-        return jsonify({"access_token": access_token})
+        return jsonify(token_fields(response.json()))
     else:
         return jsonify({"error": "Failed to refresh token"}), response.status_code
 
-@app.route("/revoke_token", methods=['POST'])
+@api_bp.route("/revoke_token", methods=['POST'])
 def revoke_token():
     """Revoke the access token"""
     access_token = request.json.get('access_token')
-    revoke_params = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'access_token': access_token
-    }
-    response = requests.post('https://www.strava.com/oauth/deauthorize', data=revoke_params)
+    response = strava().deauthorize(*credentials(), access_token)
     if response.status_code == 200:
         return jsonify({"message": "Access token revoked successfully"})
     else:
         return jsonify({"error": "Failed to revoke access token"}), response.status_code
 
 
-@app.route("/activities", methods=['POST', 'GET'])
+@api_bp.route("/activities", methods=['POST', 'GET'])
 def get_activities():
-    """Get activities from Strava"""
-    access_token = request.json.get('access_token')
+    """Get activities from Strava
+
+    The caller's token comes in an `Authorization: Bearer` header (or as
+    `access_token` in a JSON body).  `?format=ndjson` streams activities one JSON object per line; add
+    `all=true` to walk every page of the athlete's history.  JSON answers
+    carry a strong ETag of the athlete's activities, and a GET with a
+    matching If-None-Match gets 304 Not Modified without a body.
+    """
+    access_token = request_access_token()
     if not access_token:
         return jsonify({"error": "Access token not provided"}), 400
 
-    headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.get(f"{API_URL}/athlete/activities", headers=headers)
+    if request.args.get('format') == 'ndjson':
+        return stream_activities(access_token, request.args.get('all') == 'true')
+
+    import requests
+    try:
+        response = strava().cached_get("/athlete/activities", access_token)
+    except requests.RequestException as e:
+        return upstream_failure(e)
     if response.status_code == 200:
+        # Hash of the cached body, so unchanged activities keep their ETag across refreshes
+        etag = getattr(response, 'etag', None) or make_etag(response.json())
+        if is_not_modified(etag):
+            return not_modified(etag)
         activities = response.json()
-        return jsonify(activities)
+        return with_validators(jsonify(activities), etag)
     else:
         return jsonify({"error": "Failed to fetch activities from Strava"}), response.status_code
 
 
+def upstream_failure(error):
+    """The answer for a Strava call that raised: 429 with Retry-After when
+    rate limited, Strava's own status for an HTTP error, otherwise 502"""
+    import requests
+    from .ratelimit import RateLimited
+    if isinstance(error, RateLimited):
+        response = jsonify({"error": "Strava rate limit reached, try again later"})
+        response.headers['Retry-After'] = str(max(1, round(error.retry_after)))
+        return response, 429
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return jsonify({"error": "Failed to fetch activities from Strava"}), error.response.status_code
+    # Strava unreachable, timed out or sent something unreadable
+    return jsonify({"error": "Failed to fetch activities from Strava"}), 502
+
+
+def stream_activities(access_token, all_pages):
+    """Stream activities as NDJSON while pages are still being fetched upstream"""
+    import requests
+    activities = strava().iter_activities(access_token, max_pages=None if all_pages else 1)
+    # Fetch the first page before committing to a 200 so upstream errors keep their status
+    try:
+        first = next(activities, None)
+    except requests.RequestException as e:
+        return upstream_failure(e)
+
+    def generate():
+        if first is None:
+            return
+        yield json.dumps(first) + '\n'
+        try:
+            for activity in activities:
+                yield json.dumps(activity) + '\n'
+        except requests.RequestException:
+            # Headers are already sent; report the failure in-band as the last line
+            yield json.dumps({"error": "Failed to fetch activities from Strava"}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def main():
+    """Run the JSON API on its own (the strava_api console script)"""
+    from .factory import create_app
+    create_app({'REDIRECT_URI': 'http://localhost'}, blueprints=('api',)).run(debug=True)
+
+
 if __name__ == "__main__":
-    app.run(debug=True) 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,254 @@
+# cache.py :
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .config import data_path
+
+# Unset: strava_cache.db in the data directory (see config.data_path)
+CACHE_PATH = os.getenv('STRAVA_CACHE_PATH')
+CACHE_SIZE = int(os.getenv('STRAVA_CACHE_SIZE', 1024))
+
+# Per-endpoint (ttl, stale_while_revalidate) in seconds.  Within ttl an entry
+# is served as-is; within the stale window it is served while a background
+# refresh runs.  Beyond that it is only used if Strava is failing.
+ENDPOINT_TTLS = {
+    '/athlete': (300, 3600),
+    '/athlete/activities': (60, 900),
+}
+DEFAULT_TTL = (60, 300)
+STALE_IF_ERROR = int(os.getenv('STRAVA_STALE_IF_ERROR', 86400))
+
+
+def ttl_for(path):
+    return ENDPOINT_TTLS.get(path, DEFAULT_TTL)
+
+
+def cache_key(access_token, path, params=None):
+    """Build a cache key from the token and request; the token is hashed, never stored"""
+    raw = json.dumps([access_token, path, sorted((params or {}).items())], default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def athlete_tag(athlete_id):
+    """Tag for every cached response belonging to one athlete"""
+    return f"athlete:{athlete_id}"
+
+
+def token_tag(access_token):
+    """Tag for cached responses fetched with a token whose athlete the caller didn't know"""
+    return "token:" + hashlib.sha256(access_token.encode()).hexdigest()
+
+
+class CacheEntry:
+    """A cached body plus the validators Strava sent with it (ETag, Last-Modified)"""
+
+    def __init__(self, data, stored_at, tag=None, etag=None, last_modified=None):
+        self.data = data
+        self.stored_at = stored_at
+        self.tag = tag
+        self.etag = etag
+        self.last_modified = last_modified
+        self._digest = None
+
+    def age(self, now=None):
+        return (now or time.time()) - self.stored_at
+
+    @property
+    def digest(self):
+        """Strong hash of the body, computed once per entry; used as our own ETag"""
+        if self._digest is None:
+            body = json.dumps(self.data, sort_keys=True, separators=(',', ':'))
+            self._digest = hashlib.sha256(body.encode()).hexdigest()[:32]
+        return self._digest
+
+    def renewed(self, stored_at):
+        """The same body and validators, stored again (after a 304 from Strava)"""
+        entry = CacheEntry(self.data, stored_at, self.tag, self.etag, self.last_modified)
+        entry._digest = self._digest
+        return entry
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response built from a cache entry"""
+
+    def __init__(self, entry, stale=False, from_cache=True):
+        self.status_code = 200
+        self.headers = {}
+        if entry.etag:
+            self.headers['ETag'] = entry.etag
+        if entry.last_modified:
+            self.headers['Last-Modified'] = entry.last_modified
+        self.entry = entry
+        self.stale = stale
+        self.from_cache = from_cache
+
+    @property
+    def etag(self):
+        return self.entry.digest
+
+    def json(self):
+        # Shared with other readers of the entry, treat as read-only
+        return self.entry.data
+
+
+class MemoryCache:
+    """Bounded in-process LRU"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            if entry.tag is not None:
+                self._tags.setdefault(entry.tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.tag is not None:
+            keys = self._tags.get(entry.tag)
+            keys.discard(key)
+            if not keys:
+                del self._tags[entry.tag]
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class DiskCache:
+    """Persistent SQLite tier, shared by every worker on the host"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path or data_path('strava_cache.db')
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY, body TEXT NOT NULL, stored_at REAL NOT NULL, tag TEXT,"
+            " etag TEXT, last_modified TEXT)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(response_cache)")]
+        for column in ('tag', 'etag', 'last_modified'):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE response_cache ADD COLUMN {column} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_tag ON response_cache (tag)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT body, stored_at, tag, etag, last_modified FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3], row[4])
+
+    def set(self, key, entry):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO response_cache (key, body, stored_at, tag, etag, last_modified)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, json.dumps(entry.data), entry.stored_at, entry.tag, entry.etag, entry.last_modified),
+        )
+
+    def touch(self, key, stored_at):
+        """Restart an entry's TTL without rewriting its body"""
+        self._conn().execute("UPDATE response_cache SET stored_at = ? WHERE key = ?", (stored_at, key))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def invalidate_tag(self, tag):
+        self._conn().execute("DELETE FROM response_cache WHERE tag = ?", (tag,))
+
+    def purge(self, older_than):
+        """Drop entries stored before the given timestamp"""
+        self._conn().execute("DELETE FROM response_cache WHERE stored_at < ?", (older_than,))
+
+
+class TieredCache:
+    """LRU in front of SQLite; disk hits are promoted into memory"""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def set(self, key, data, tag=None, etag=None, last_modified=None):
+        entry = CacheEntry(data, time.time(), tag, etag, last_modified)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, entry)
+            except sqlite3.Error:
+                # A locked or unwritable disk tier must not fail the request
+                pass
+        return entry
+
+    def renew(self, key, entry):
+        """Mark an entry fresh again after Strava answered 304 Not Modified"""
+        entry = entry.renewed(time.time())
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.touch(key, entry.stored_at)
+            except sqlite3.Error:
+                pass
+        return entry
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def invalidate_tag(self, tag):
+        """Drop every entry stored with this tag, in both tiers
+
+        Only this process's memory tier is cleared; other workers hold on to
+        their copies until the TTL runs out.
+        """
+        self.memory.invalidate_tag(tag)
+        if self.disk is not None:
+            self.disk.invalidate_tag(tag)
@@ -0,0 +1,253 @@
+# client.py :
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import (CACHE_PATH, STALE_IF_ERROR, CachedResponse, DiskCache,
+                    TieredCache, cache_key, token_tag, ttl_for)
+from .config import API_URL, DEAUTHORIZE_URL, TOKEN_URL
+from .metrics import count_cache, observe_upstream
+from .ratelimit import BACKGROUND, INTERACTIVE, RATELIMIT_PATH, RateLimitScheduler
+from .singleflight import SingleFlight
+
+# Connection pool / retry settings, tunable per deployment
+POOL_CONNECTIONS = int(os.getenv('STRAVA_POOL_CONNECTIONS', 10))
+POOL_MAXSIZE = int(os.getenv('STRAVA_POOL_MAXSIZE', 20))
+CONNECT_TIMEOUT = float(os.getenv('STRAVA_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('STRAVA_READ_TIMEOUT', 10))
+MAX_RETRIES = int(os.getenv('STRAVA_MAX_RETRIES', 3))
+BACKOFF_FACTOR = float(os.getenv('STRAVA_BACKOFF_FACTOR', 0.5))
+
+
+class StravaClient:
+    """Keep-alive HTTP client for the Strava API
+
+    One requests.Session per process, so every upstream call reuses a pooled
+    TCP+TLS connection instead of paying a fresh handshake.
+    """
+
+    def __init__(self, api_url=API_URL, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, cache=None, scheduler=None):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Idempotent calls are retried on 5xx as well; POSTs (token exchange,
+        # deauthorize) are only retried when the connection itself failed.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.cache = cache
+        self.scheduler = scheduler
+        # Concurrent identical cached GETs share one upstream call
+        self.flights = SingleFlight('strava')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    def _url(self, path):
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.api_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, access_token=None, priority=INTERACTIVE, **kwargs):
+        """Send a request through the shared pool and return the response
+
+        API calls are admitted by the rate limit scheduler first, which may
+        queue them or raise ratelimit.RateLimited (a requests.RequestException).
+        """
+        headers = kwargs.pop('headers', None) or {}
+        if access_token:
+            headers['Authorization'] = f'Bearer {access_token}'
+        kwargs.setdefault('timeout', self.timeout)
+        url = self._url(path)
+        scheduled = self.scheduler is not None and url.startswith(self.api_url)
+        if scheduled:
+            self.scheduler.acquire(priority)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, headers=headers, **kwargs)
+        except requests.RequestException:
+            observe_upstream(self._endpoint(url), 'error', time.perf_counter() - start)
+            raise
+        observe_upstream(self._endpoint(url), response.status_code, time.perf_counter() - start)
+        if scheduled:
+            self.scheduler.update(response)
+        return response
+
+    def _endpoint(self, url):
+        # Metrics label: the API path, or the path of an OAuth URL
+        if url.startswith(self.api_url):
+            return url[len(self.api_url):]
+        return urlsplit(url).path
+
+    def get(self, path, access_token=None, params=None, **kwargs):
+        return self.request('GET', path, access_token, params=params, **kwargs)
+
+    def post(self, path, data=None, access_token=None, **kwargs):
+        return self.request('POST', path, access_token, data=data, **kwargs)
+
+    def cached_get(self, path, access_token=None, params=None, priority=INTERACTIVE, tag=None):
+        """GET through the response cache with stale-while-revalidate
+
+        Fresh entries are returned without touching Strava.  Stale entries are
+        returned immediately while a background thread refreshes them, and any
+        cached entry is preferred over an upstream error or rate limit.
+        Concurrent misses for the same key share a single upstream call.
+        Expired entries are revalidated with If-None-Match/If-Modified-Since,
+        so an unchanged resource costs Strava a 304 and us no JSON parsing.
+        `tag` (e.g. cache.athlete_tag) lets the entry be invalidated in bulk;
+        untagged entries fetched with a token get its cache.token_tag.
+        Successful answers are CachedResponses, whose `etag` hashes the body.
+        """
+        key = cache_key(access_token, path, params)
+        if tag is None and access_token:
+            tag = token_tag(access_token)
+        if self.cache is None:
+            return self.flights.do(key, lambda: self.get(path, access_token, params=params,
+                                                         priority=priority))
+
+        ttl, stale_window = ttl_for(path)
+        entry = self.cache.get(key)
+        if entry is not None:
+            age = entry.age()
+            if age < ttl:
+                count_cache('strava', 'hit')
+                return CachedResponse(entry)
+            if age < ttl + stale_window:
+                count_cache('strava', 'stale')
+                self._refresh_in_background(key, path, access_token, params, tag, entry)
+                return CachedResponse(entry, stale=True)
+        count_cache('strava', 'miss')
+
+        try:
+            response = self.flights.do(key, lambda: self._fetch_and_store(key, path, access_token,
+                                                                          params, priority, tag, entry))
+        except requests.RequestException:
+            # Includes RateLimited: an old answer beats no answer
+            if entry is not None and entry.age() < STALE_IF_ERROR:
+                return CachedResponse(entry, stale=True)
+            raise
+
+        if entry is not None and entry.age() < STALE_IF_ERROR and \
+                (response.status_code == 429 or response.status_code >= 500):
+            return CachedResponse(entry, stale=True)
+        return response
+
+    def iter_activities(self, access_token, params=None, per_page=200, max_pages=None,
+                        priority=INTERACTIVE):
+        """Yield the athlete's activities page by page
+
+        `params` narrows the listing (e.g. Strava's `after`/`before`), so only
+        the matching window is paged through.  Only one page is held in memory
+        at a time.  Raises requests.HTTPError if Strava refuses a page, and
+        other requests.RequestException (RateLimited included) if it can't be asked.
+        """
+        page = 1
+        while max_pages is None or page <= max_pages:
+            response = self.get('/athlete/activities', access_token,
+                                params=dict(params or {}, page=page, per_page=per_page),
+                                priority=priority)
+            response.raise_for_status()
+            activities = response.json()
+            yield from activities
+            if len(activities) < per_page:
+                return
+            page += 1
+
+    def _fetch_and_store(self, key, path, access_token, params, priority, tag=None, entry=None):
+        # Revalidate what we already hold rather than downloading it again
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        response = self.get(path, access_token, params=params, priority=priority, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            return CachedResponse(self.cache.renew(key, entry), from_cache=False)
+        if response.status_code == 200:
+            entry = self.cache.set(key, response.json(), tag, response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+            return CachedResponse(entry, from_cache=False)
+        return response
+
+    def _refresh_in_background(self, key, path, access_token, params, tag=None, entry=None):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.flights.do(key, lambda: self._fetch_and_store(key, path, access_token,
+                                                                   params, BACKGROUND, tag, entry))
+            except requests.RequestException:
+                pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    # OAuth helpers
+
+    def exchange_code(self, client_id, client_secret, code):
+        """Exchange an authorization code for a token set"""
+        return self.post(TOKEN_URL, data={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'code': code,
+            'grant_type': 'authorization_code'
+        })
+
+    def refresh(self, client_id, client_secret, refresh_token):
+        """Exchange a refresh token for a new token set"""
+        return self.post(TOKEN_URL, data={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'refresh_token': refresh_token,
+            'grant_type': 'refresh_token'
+        })
+
+    def deauthorize(self, client_id, client_secret, access_token):
+        """Revoke an access token"""
+        return self.post(DEAUTHORIZE_URL, data={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'access_token': access_token
+        })
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide StravaClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = StravaClient(cache=TieredCache(disk=DiskCache(CACHE_PATH)),
+                                       scheduler=RateLimitScheduler(RATELIMIT_PATH))
+    return _client
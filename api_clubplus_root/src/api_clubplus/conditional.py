@@ -0,0 +1,46 @@
+# conditional.py :
+
+import hashlib
+import json
+from datetime import timezone
+
+from flask import Response, request
+
+
+def make_etag(*parts):
+    """Strong entity tag for the representation identified by `parts` (data version, query, ...)"""
+    raw = json.dumps(parts, default=str, separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _http_date(dt):
+    # Stored datetimes are naive UTC
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def is_not_modified(etag, last_modified=None):
+    """True when the client's If-None-Match/If-Modified-Since show its copy is current
+
+    Checked before rendering, so an unchanged page costs neither a query
+    nor serialisation.  If-None-Match wins when both are sent (RFC 9110).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _http_date(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach ETag/Last-Modified; clients may keep the copy but must revalidate it"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    return with_validators(Response(status=304), etag, last_modified)
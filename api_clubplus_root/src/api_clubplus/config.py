@@ -0,0 +1,63 @@
+# config.py :
+
+import os
+
+from dotenv import load_dotenv
+from flask import current_app, has_app_context
+
+# Strava endpoints, for the client and the login redirect (STRAVA_URL can point
+# at a local stand-in for benchmarks)
+STRAVA_URL = os.getenv('STRAVA_URL', 'https://www.strava.com')
+STRAVA_AUTH_URL = f"{STRAVA_URL}/oauth/authorize"
+TOKEN_URL = f"{STRAVA_URL}/oauth/token"
+DEAUTHORIZE_URL = f"{STRAVA_URL}/oauth/deauthorize"
+API_URL = f"{STRAVA_URL}/api/v3"
+
+# Scope the web UI and /authorize ask for
+SCOPE = 'activity:read_all,read_all'
+
+
+def load_config(overrides=None):
+    """Settings for create_app: the environment (and .env), then `overrides`
+
+    CLIENT_ID, CLIENT_SECRET, REDIRECT_URI and SECRET_KEY come from the
+    environment variables of the same name; `overrides` wins over both.
+    """
+    load_dotenv()
+    config = {
+        'CLIENT_ID': os.getenv('CLIENT_ID'),
+        'CLIENT_SECRET': os.getenv('CLIENT_SECRET'),
+        'REDIRECT_URI': os.getenv('REDIRECT_URI', 'http://localhost:5000/strava/auth'),
+        'SECRET_KEY': os.getenv('SECRET_KEY', 'supersekrit'),
+        'STRAVA_AUTH_URL': STRAVA_AUTH_URL,
+        'SCOPE': SCOPE,
+    }
+    config.update(overrides or {})
+    return config
+
+
+def data_path(filename):
+    """Where a local data file (response cache, rate limit state) lives unless its path is set
+
+    In STRAVA_DATA_DIR, else the running app's instance folder, else
+    ~/.api_clubplus; never the current directory.  The directory is
+    created if needed.
+    """
+    directory = os.getenv('STRAVA_DATA_DIR')
+    if not directory:
+        directory = current_app.instance_path if has_app_context() else \
+            os.path.join(os.path.expanduser('~'), '.api_clubplus')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def authorization_url():
+    """Strava's authorization page for the current app's client id, redirect URI and scope"""
+    config = current_app.config
+    return (f"{config['STRAVA_AUTH_URL']}?client_id={config['CLIENT_ID']}"
+            f"&redirect_uri={config['REDIRECT_URI']}&response_type=code&scope={config['SCOPE']}")
+
+
+def credentials():
+    """(client id, client secret) of the app handling the request"""
+    return current_app.config['CLIENT_ID'], current_app.config['CLIENT_SECRET']
@@ -0,0 +1,24 @@
+# display.py :
+
+from datetime import timedelta
+
+import humanize
+
+DISPLAY_DATE_FORMAT = '%d %B %Y, %I:%M:%S %p'
+
+
+def format_start_date(dt):
+    return dt.strftime(DISPLAY_DATE_FORMAT) if dt else ''
+
+
+def format_duration(seconds):
+    return humanize.precisedelta(timedelta(seconds=seconds or 0))
+
+
+def display_values(start_date, moving_time, elapsed_time):
+    """Display strings for an activity row, computed once when it is written"""
+    return {
+        'start_date_display': format_start_date(start_date),
+        'moving_time_display': format_duration(moving_time),
+        'elapsed_time_display': format_duration(elapsed_time),
+    }
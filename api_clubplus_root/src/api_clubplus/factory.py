@@ -0,0 +1,48 @@
+# factory.py :
+
+from flask import Flask
+
+from .config import load_config
+from .metrics import init_metrics
+from .templating import init_templating
+
+# Blueprint name -> (module, attribute); a module is only imported when its blueprint is asked for
+BLUEPRINTS = {
+    'web': ('.web', 'web_bp'),
+    'api': ('.api', 'api_bp'),
+    'webhooks': ('.webhooks', 'webhooks_bp'),
+}
+
+
+def load_blueprint(name):
+    from importlib import import_module
+    module, attribute = BLUEPRINTS[name]
+    return getattr(import_module(module, __package__), attribute)
+
+
+def create_app(config=None, blueprints=('web', 'api', 'webhooks'), import_name=None):
+    """Build a Flask app serving the chosen blueprints
+
+    'web' is the dashboard UI, 'api' the JSON API and 'webhooks' the Strava
+    push subscription.  With the web UI on the same app the API moves under
+    /api, unless config sets API_PREFIX.  `import_name` locates templates/
+    and static/ (the calling module's __name__ for the apps at the repo
+    root).  Nothing here touches the database: SQLAlchemy, humanize and
+    NumPy are imported by the first request that needs them.
+    """
+    unknown = set(blueprints) - set(BLUEPRINTS)
+    if unknown:
+        raise ValueError(f"Unknown blueprints: {', '.join(sorted(unknown))}")
+    app = Flask(import_name or __package__)
+    app.config.update(load_config(config))
+    app.config.setdefault('API_PREFIX', '/api' if 'web' in blueprints else None)
+
+    # Prometheus /metrics and per-request Server-Timing spans
+    init_metrics(app)
+    # Filters for the templates every app shares (dashboard.html, _activity_rows.html)
+    init_templating(app)
+
+    for name in blueprints:
+        prefix = app.config['API_PREFIX'] if name == 'api' else None
+        app.register_blueprint(load_blueprint(name), url_prefix=prefix)
+    return app
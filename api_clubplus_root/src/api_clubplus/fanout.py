@@ -0,0 +1,26 @@
+# fanout.py :
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads shared by every request that fans out upstream calls
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', 16))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='strava-fanout')
+
+
+def gather(*calls):
+    """Run independent callables concurrently and return their results in order
+
+    Latency is the slowest call rather than the sum of all of them.  If a call
+    raises, the exception is re-raised here once every call has finished.
+    Calls run in a copy of the caller's context, so per-request state
+    (e.g. metrics spans) follows them onto the worker threads.
+    """
+    futures = [_executor.submit(contextvars.copy_context().run, call) for call in calls]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [future.result() for future in futures]
@@ -0,0 +1,130 @@
+# feed.py :
+
+import heapq
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+
+from sqlalchemy import bindparam, select, tuple_, union_all
+
+from .models import Activity, SportType, User, user_club_table
+from .queries import MAX_PAGE_SIZE, PAGE_SIZE, ActivityPage, activity_to_dict, decode_cursor, encode_cursor
+
+# Rows fetched per member on the first round trip; a member whose stream
+# is drained by the merge gets twice as many on the next one
+FEED_MIN_CHUNK = 4
+FEED_MAX_CHUNK = 256
+# Member subqueries combined into one UNION ALL round trip (SQLite allows 500)
+FEED_UNION_BATCH = 250
+
+
+def club_members(session, club_id):
+    return session.execute(
+        select(User.id, User.first_name, User.last_name)
+        .join(user_club_table, user_club_table.c.user_id == User.id)
+        .where(user_club_table.c.club_id == club_id)
+    ).all()
+
+
+@lru_cache(maxsize=None)
+def _stream_query(user_id_param='user_id', with_position=False):
+    """A member's public activities before a position, newest first: one ix_activities_user_start range scan
+
+    Built once per shape with bind parameters (user id, `position_date`,
+    `position_id`, `chunk`) so a page doesn't pay for constructing SQL.
+    """
+    query = (
+        select(*Activity.__table__.c, SportType.name.label('sport_type_name'))
+        .outerjoin(SportType, SportType.id == Activity.sport_type_id)
+        .where(Activity.user_id == bindparam(user_id_param), Activity.private.is_(False))
+    )
+    if with_position:
+        # Typed, so the date is bound in the stored format and compares correctly within its second
+        query = query.where(tuple_(Activity.start_date, Activity.id) <
+                            tuple_(bindparam('position_date', type_=Activity.start_date.type),
+                                   bindparam('position_id', type_=Activity.id.type)))
+    return query.order_by(Activity.start_date.desc(), Activity.id.desc()).limit(bindparam('chunk'))
+
+
+@lru_cache(maxsize=None)
+def _heads_query(members, with_position):
+    parts = [select(_stream_query(f'user_{i}', with_position).subquery()) for i in range(members)]
+    return parts[0] if members == 1 else union_all(*parts)
+
+
+def _params(position, chunk, **extra):
+    params = dict(extra, chunk=chunk)
+    if position is not None:
+        params['position_date'], params['position_id'] = position
+    return params
+
+
+def _sort_key(row):
+    return row.start_date, row.id
+
+
+def stream_heads(session, member_ids, position, chunk):
+    """The first `chunk` rows of every member's stream, fetched in a few UNION ALL round trips"""
+    heads = defaultdict(list)
+    for i in range(0, len(member_ids), FEED_UNION_BATCH):
+        batch = member_ids[i:i + FEED_UNION_BATCH]
+        query = _heads_query(len(batch), position is not None)
+        params = _params(position, chunk, **{f'user_{n}': user_id for n, user_id in enumerate(batch)})
+        for row in session.execute(query, params):
+            heads[row.user_id].append(row)
+    for rows in heads.values():
+        rows.sort(key=_sort_key, reverse=True)
+    return heads
+
+
+def member_stream(session, user_id, head, chunk):
+    """A member's stream: the prefetched head, then further chunks of doubling size"""
+    rows = head
+    while True:
+        yield from rows
+        if len(rows) < chunk:
+            return
+        position = _sort_key(rows[-1])
+        chunk = min(chunk * 2, FEED_MAX_CHUNK)
+        rows = session.execute(_stream_query(with_position=True),
+                               _params(position, chunk, user_id=user_id)).all()
+
+
+def club_feed(session, club_id, cursor=None, page_size=PAGE_SIZE):
+    """A page of a club's activity feed, newest first, keyed on (start_date, id)
+
+    Members' activity streams are k-way merged with a heap, and each stream
+    is only read as far as the page needs: a short index scan per member
+    (batched into a few round trips) plus O(page_size * log members),
+    whatever the length of their histories.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor is not None else None
+    members = club_members(session, club_id)
+    if not members:
+        return ActivityPage([])
+
+    # Enough per member that a page usually fills in one round trip
+    chunk = min(page_size + 1, max(FEED_MIN_CHUNK, 2 * (page_size + 1) // len(members) + 1))
+    heads = stream_heads(session, [member.id for member in members], position, chunk)
+    streams = [member_stream(session, user_id, head, chunk) for user_id, head in heads.items()]
+    rows = list(islice(heapq.merge(*streams, key=_sort_key, reverse=True), page_size + 1))
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    names = {member.id: member for member in members}
+    activities = []
+    for row in rows:
+        item = activity_to_dict(row, row.sport_type_name)
+        member = names[row.user_id]
+        item['athlete'] = {'id': member.id, 'firstname': member.first_name, 'lastname': member.last_name}
+        activities.append(item)
+    last = rows[-1] if rows else None
+    return ActivityPage(activities, next_cursor=encode_cursor(last.start_date, last.id) if has_more else None)
+
+
+def is_member(session, club_id, user_id):
+    return session.execute(
+        select(user_club_table.c.user_id).where(user_club_table.c.club_id == club_id,
+                                                user_club_table.c.user_id == user_id)
+    ).first() is not None
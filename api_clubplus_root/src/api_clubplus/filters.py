@@ -0,0 +1,41 @@
+# filters.py :
+
+import calendar
+from datetime import datetime, timedelta
+
+DATE_INPUT_FORMAT = '%d-%m-%Y'
+
+
+class DateRange:
+    """A [start, end) window over activity start dates (UTC)"""
+
+    def __init__(self, start=None, end=None):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_form(cls, start_input, end_input):
+        """Build a range from DD-MM-YYYY form fields; both ends are inclusive days
+
+        Raises ValueError for malformed dates or an end before the start.
+        """
+        start = datetime.strptime(start_input, DATE_INPUT_FORMAT) if start_input else None
+        end = None
+        if end_input:
+            end = datetime.strptime(end_input, DATE_INPUT_FORMAT) + timedelta(days=1)
+        if start and end and end <= start:
+            raise ValueError("End date is before start date")
+        return cls(start, end)
+
+    def __bool__(self):
+        return self.start is not None or self.end is not None
+
+    def strava_params(self):
+        """The window as Strava's `after`/`before` epoch parameters"""
+        params = {}
+        if self.start is not None:
+            # `after` is exclusive, step back a second to keep activities starting at midnight
+            params['after'] = calendar.timegm(self.start.utctimetuple()) - 1
+        if self.end is not None:
+            params['before'] = calendar.timegm(self.end.utctimetuple())
+        return params
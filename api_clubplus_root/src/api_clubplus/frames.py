@@ -0,0 +1,130 @@
+# frames.py :
+
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import String, func, select, type_coerce
+
+from .models import Activity
+from .versions import data_version
+
+try:
+    import numpy as np
+except ImportError:  # pip install api_clubplus[analytics]
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# Where memory-mapped column files are kept; unset disables the on-disk cache
+FRAME_DIR = os.getenv('ACTIVITY_FRAME_DIR')
+
+# Column name -> (SQL expression, dtype).  Missing floats load as NaN and a
+# missing sport type as 0, so every column is a plain fixed-width array.
+# Dates skip SQLAlchemy's per-row datetime parsing: NumPy converts the raw
+# ISO strings (SQLite) or driver datetimes (PostgreSQL) a column at a time.
+FRAME_COLUMNS = {
+    'id': (Activity.id, 'int64'),
+    'dist': (Activity.dist, 'float64'),
+    'moving_time': (Activity.moving_time, 'int64'),
+    'elapsed_time': (Activity.elapsed_time, 'int64'),
+    'total_elevation_gain': (Activity.total_elevation_gain, 'float64'),
+    'avg_speed': (Activity.avg_speed, 'float64'),
+    'max_speed': (Activity.max_speed, 'float64'),
+    'start_date': (type_coerce(Activity.start_date, String), 'datetime64[s]'),
+    'start_date_local': (type_coerce(func.coalesce(Activity.start_date_local, Activity.start_date), String),
+                         'datetime64[s]'),
+    'sport_type_id': (func.coalesce(Activity.sport_type_id, 0), 'int32'),
+}
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Activity analytics need NumPy: pip install api_clubplus[analytics]")
+
+
+class ActivityFrame:
+    """An athlete's activities as NumPy column arrays, oldest first
+
+    `frame['dist']`, `frame['start_date']`, ... are aligned arrays of the
+    same length, so analytics run as whole-column operations instead of a
+    Python loop over rows.  Arrays loaded from the frame store are read-only
+    memory maps.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @classmethod
+    def load(cls, conn, user_id):
+        """Read the athlete's rows from `activities` in one query"""
+        require_numpy()
+        query = (select(*(expr.label(name) for name, (expr, _) in FRAME_COLUMNS.items()))
+                 .where(Activity.user_id == user_id)
+                 .order_by(Activity.start_date, Activity.id))
+        rows = conn.execute(query).all()
+        values = list(zip(*rows)) if rows else [()] * len(FRAME_COLUMNS)
+        return cls({name: np.array(column, dtype=dtype)
+                    for (name, (_, dtype)), column in zip(FRAME_COLUMNS.items(), values)})
+
+    def select(self, mask):
+        """The rows where `mask` is true, as a new frame"""
+        return ActivityFrame({name: column[mask] for name, column in self.columns.items()})
+
+    def since(self, start):
+        """Activities starting on or after `start` (a date or datetime)"""
+        return self.select(self.columns['start_date'] >= np.datetime64(start, 's'))
+
+    def save(self, directory):
+        for name, column in self.columns.items():
+            np.save(os.path.join(directory, f'{name}.npy'), column)
+
+    @classmethod
+    def open(cls, directory):
+        """Map a saved frame's columns without reading them into memory"""
+        return cls({name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+                    for name in FRAME_COLUMNS})
+
+
+class FrameStore:
+    """Frames saved as one .npy file per column, reused until the data version changes
+
+    Layout is `<directory>/<user_id>/<version>/<column>.npy`; older versions
+    are removed when a new one is written.  Without a directory every call
+    loads from the database.
+    """
+
+    def __init__(self, directory=FRAME_DIR):
+        self.directory = directory
+
+    def get(self, session, user_id):
+        require_numpy()
+        if not self.directory:
+            return ActivityFrame.load(session, user_id)
+        version, _ = data_version(session, user_id)
+        athlete_dir = os.path.join(self.directory, str(user_id))
+        path = os.path.join(athlete_dir, str(version))
+        if os.path.isdir(path):
+            return ActivityFrame.open(path)
+
+        frame = ActivityFrame.load(session, user_id)
+        os.makedirs(athlete_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=athlete_dir, prefix='.tmp-')
+        try:
+            frame.save(staging)
+            # Another worker may have written the same version first; theirs is as good
+            os.rename(staging, path)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(path):
+                return frame
+        for name in os.listdir(athlete_dir):
+            if name != str(version) and not name.startswith('.tmp-'):
+                shutil.rmtree(os.path.join(athlete_dir, name), ignore_errors=True)
+        return ActivityFrame.open(path)
@@ -0,0 +1,160 @@
+# geo.py :
+
+import math
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, and_, case, false, or_, select, tuple_
+
+from .models import Activity, SportType, has_sqlite_table
+from .queries import MAX_PAGE_SIZE, PAGE_SIZE, ActivityPage, activity_to_dict, decode_cursor, encode_cursor
+
+EARTH_RADIUS = 6371008.8  # Mean radius, metres
+MAX_RADIUS = 100000  # Largest "near" radius, metres
+
+# The R*Tree that models.init_db creates on SQLite, described for querying only
+activity_geo = Table(
+    'activity_geo', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('min_lat', Float),
+    Column('max_lat', Float),
+    Column('min_lng', Float),
+    Column('max_lng', Float),
+)
+
+# Whether each SQLite database has the R*Tree, by URL
+_rtree = {}
+
+
+class BoundingBox:
+    """A latitude/longitude box; west > east means it crosses the antimeridian"""
+
+    def __init__(self, south, west, north, east):
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise ValueError("Invalid bounding box")
+        self.south = south
+        self.west = west
+        self.north = north
+        self.east = east
+
+    @classmethod
+    def from_string(cls, value):
+        """Parse "south,west,north,east" in degrees; raises ValueError if malformed"""
+        parts = [float(part) for part in (value or '').split(',')]
+        if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+            raise ValueError(f"Invalid bounding box: {value}")
+        return cls(*parts)
+
+    @classmethod
+    def around(cls, lat, lng, radius):
+        """The smallest box holding every point within `radius` metres of (lat, lng)"""
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius < 0:
+            raise ValueError("Invalid point or radius")
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        if south == -90 or north == 90:
+            return cls(south, -180.0, north, 180.0)
+        dlng = math.degrees(radius / (EARTH_RADIUS * math.cos(math.radians(lat))))
+        if dlng >= 180:
+            return cls(south, -180.0, north, 180.0)
+        west, east = lng - dlng, lng + dlng
+        return cls(south, west + 360 if west < -180 else west, north, east - 360 if east > 180 else east)
+
+    def ranges(self):
+        """(west, east) longitude ranges that don't cross the antimeridian"""
+        if self.west <= self.east:
+            return [(self.west, self.east)]
+        return [(self.west, 180.0), (-180.0, self.east)]
+
+
+def distance(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def has_rtree(session):
+    bind = session.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return False
+    key = str(bind.url)
+    if key not in _rtree:
+        _rtree[key] = has_sqlite_table(session.connection(), 'activity_geo')
+    return _rtree[key]
+
+
+def _box_condition(columns, box):
+    # Start point inside the box; on the R*Tree the points are zero-size boxes
+    lat_min, lat_max, lng_min, lng_max = columns
+    return or_(*(and_(lat_min <= box.north, lat_max >= box.south, lng_min <= east, lng_max >= west)
+                 for west, east in box.ranges()))
+
+
+def spatial_query(session, box, viewer_id=None, user_id=None):
+    """SELECT for activities starting inside `box`, newest first
+
+    Only public activities and the viewer's own are visible; `user_id`
+    narrows the result to one athlete.  On SQLite the R*Tree finds the
+    candidates and the exact coordinates are checked on the rows it points
+    at (R*Tree bounds are stored as float32, rounded outwards).
+    """
+    query = select(Activity, SportType.name).outerjoin(SportType, SportType.id == Activity.sport_type_id)
+    if has_rtree(session):
+        candidates = select(activity_geo.c.id).where(_box_condition(
+            (activity_geo.c.min_lat, activity_geo.c.max_lat, activity_geo.c.min_lng, activity_geo.c.max_lng), box))
+        query = query.where(Activity.id.in_(candidates))
+    query = query.where(_box_condition(
+        (Activity.start_lat, Activity.start_lat, Activity.start_lng, Activity.start_lng), box))
+    if user_id is not None:
+        query = query.where(Activity.user_id == user_id)
+    if user_id is None or user_id != viewer_id:
+        query = query.where(or_(Activity.private == false(), Activity.user_id == viewer_id)
+                            if viewer_id is not None else Activity.private == false())
+    return query
+
+
+def _page(session, query, cursor, page_size, extra=None):
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if cursor is not None:
+        query = query.where(tuple_(Activity.start_date, Activity.id) < tuple_(*decode_cursor(cursor)))
+    query = query.order_by(Activity.start_date.desc(), Activity.id.desc()).limit(page_size + 1)
+    rows = session.execute(query).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    activities = []
+    for activity, sport_type in rows:
+        values = activity_to_dict(activity, sport_type)
+        if extra:
+            values.update(extra(activity))
+        activities.append(values)
+    last = rows[-1][0] if rows else None
+    return ActivityPage(activities, next_cursor=encode_cursor(last.start_date, last.id) if has_more else None)
+
+
+def activities_in_box(session, box, viewer_id=None, user_id=None, cursor=None, page_size=PAGE_SIZE):
+    """A page of activities starting inside a BoundingBox, newest first, keyed on (start_date, id)"""
+    return _page(session, spatial_query(session, box, viewer_id, user_id), cursor, page_size)
+
+
+def activities_near(session, lat, lng, radius, viewer_id=None, user_id=None, cursor=None, page_size=PAGE_SIZE):
+    """A page of activities starting within `radius` metres of (lat, lng), newest first
+
+    The index narrows the search to the enclosing box; rows in its corners
+    are dropped with a flat-earth distance test in SQL (accurate to well
+    under 1% at MAX_RADIUS) and each result carries its great-circle
+    `distance` in metres.
+    """
+    radius = min(radius, MAX_RADIUS)
+    box = BoundingBox.around(lat, lng, radius)
+    # Degrees of longitude shrink by cos(latitude); wrap differences across the antimeridian
+    scale = math.cos(math.radians(lat))
+    dlng = Activity.start_lng - lng
+    if box.west > box.east:
+        dlng = case((dlng > 180, dlng - 360), (dlng < -180, dlng + 360), else_=dlng)
+    dlat = Activity.start_lat - lat
+    reach = math.degrees(radius / EARTH_RADIUS)
+    query = spatial_query(session, box, viewer_id, user_id).where(
+        dlat * dlat + (dlng * scale) * (dlng * scale) <= reach * reach)
+    return _page(session, query, cursor, page_size,
+                 lambda activity: {'distance': round(distance(lat, lng, activity.start_lat,
+                                                              activity.start_lng), 1)})
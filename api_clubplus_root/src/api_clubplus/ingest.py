@@ -0,0 +1,158 @@
+# ingest.py :
+
+import os
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import select
+
+from .display import display_values
+from .leaderboard import get_standings
+from .models import Activity, SportType, dialect_insert, engine, user_activity_table
+from .queries import STRAVA_DATE_FORMAT
+from .rollups import RollupDelta, tracked_values
+from .versions import bump_versions
+
+# Activities written per transaction
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 5000))
+
+
+def parse_date(value):
+    if not value:
+        return None
+    if value.endswith('Z'):
+        # fromisoformat is several times faster than strptime on the bulk path
+        return datetime.fromisoformat(value[:-1])
+    return datetime.strptime(value, STRAVA_DATE_FORMAT)
+
+
+def format_latlng(latlng):
+    if not latlng:
+        return None
+    return f"{latlng[0]},{latlng[1]}"
+
+
+def latlng_part(latlng, index):
+    return float(latlng[index]) if latlng else None
+
+
+def activity_values(data, sport_type_id, user_id=None):
+    """Map a Strava activity JSON object onto `activities` column values"""
+    values = {
+        'id': data['id'],
+        'user_id': user_id,
+        'name': data.get('name'),
+        'dist': data.get('distance') or 0.0,
+        'moving_time': data.get('moving_time') or 0,
+        'elapsed_time': data.get('elapsed_time') or 0,
+        'total_elevation_gain': data.get('total_elevation_gain'),
+        'elevation_high': data.get('elev_high'),
+        'elevation_low': data.get('elev_low'),
+        'sport_type_id': sport_type_id,
+        'start_date': parse_date(data['start_date']),
+        'start_date_local': parse_date(data.get('start_date_local')),
+        'timezone': data.get('timezone'),
+        'start_latlng': format_latlng(data.get('start_latlng')),
+        'end_latlng': format_latlng(data.get('end_latlng')),
+        'start_lat': latlng_part(data.get('start_latlng'), 0),
+        'start_lng': latlng_part(data.get('start_latlng'), 1),
+        'end_lat': latlng_part(data.get('end_latlng'), 0),
+        'end_lng': latlng_part(data.get('end_latlng'), 1),
+        'avg_speed': data.get('average_speed'),
+        'max_speed': data.get('max_speed'),
+        'private': bool(data.get('private')),
+        'likes': data.get('kudos_count') or 0,
+    }
+    values.update(display_values(values['start_date'], values['moving_time'], values['elapsed_time']))
+    return values
+
+
+def upsert_statement(conn, table, index_elements, update=True):
+    """INSERT ... ON CONFLICT for the connection's dialect (SQLite or PostgreSQL)"""
+    stmt = dialect_insert(conn, table)
+    if not update:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name not in index_elements},
+    )
+
+
+class SportTypeLookup:
+    """In-memory name -> id map for `sport_types`, creating missing names on demand"""
+
+    def __init__(self):
+        self.ids = None
+
+    def resolve(self, conn, names):
+        if self.ids is None:
+            self.ids = dict(conn.execute(select(SportType.name, SportType.id)).all())
+        missing = {name for name in names if name and name not in self.ids}
+        if missing:
+            conn.execute(SportType.__table__.insert(), [{'name': name} for name in sorted(missing)])
+            self.ids.update(conn.execute(
+                select(SportType.name, SportType.id).where(SportType.name.in_(missing))
+            ).all())
+        return self.ids
+
+    def id_for(self, conn, name):
+        if not name:
+            return None
+        return self.resolve(conn, [name])[name]
+
+
+def ingest_batch(conn, activities, user_id=None, sport_types=None, standings=None):
+    """Upsert one batch of Strava activity JSON on `conn` (a Connection or Session)
+
+    Rows are owned by `user_id`, or by each activity's `athlete.id` when it
+    isn't given.  The rollups, challenge standings and the owners' data
+    versions are updated in the same transaction.  Returns the column values
+    written.
+    """
+    sport_types = sport_types or SportTypeLookup()
+    ids = sport_types.resolve(conn, {data.get('sport_type') or data.get('type')
+                                     for data in activities})
+    rows, links = [], []
+    for data in activities:
+        owner = user_id if user_id is not None else data['athlete']['id']
+        rows.append(activity_values(data, ids.get(data.get('sport_type') or data.get('type')), owner))
+        links.append({'user_id': owner, 'activity_id': data['id']})
+    if rows:
+        old = tracked_values(conn, [row['id'] for row in rows])
+        delta = RollupDelta()
+        for values in old:
+            delta.remove(values)
+        for values in rows:
+            delta.add(values)
+        conn.execute(upsert_statement(conn, Activity.__table__, ['id']), rows)
+        conn.execute(upsert_statement(conn, user_activity_table, ['user_id', 'activity_id'],
+                                      update=False), links)
+        delta.apply(conn)
+        (standings or get_standings()).apply(conn, old, rows)
+        bump_versions(conn, [values['user_id'] for values in list(old) + rows])
+    return rows
+
+
+class BulkIngest:
+    """Writes large streams of Strava activity JSON through Core executemany
+
+    Each batch is mapped in one pass and written in its own transaction, so
+    a failure only loses the batch in flight.
+    """
+
+    def __init__(self, bind=None, batch_size=INGEST_BATCH_SIZE, standings=None):
+        self.bind = bind or engine
+        self.batch_size = batch_size
+        self.sport_types = SportTypeLookup()
+        self.standings = standings
+
+    def ingest(self, activities, user_id=None):
+        """Upsert an iterable of activities; returns the number written"""
+        written = 0
+        activities = iter(activities)
+        while True:
+            batch = list(islice(activities, self.batch_size))
+            if not batch:
+                return written
+            with self.bind.begin() as conn:
+                written += len(ingest_batch(conn, batch, user_id, self.sport_types, self.standings))
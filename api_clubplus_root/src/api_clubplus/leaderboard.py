@@ -0,0 +1,475 @@
+# leaderboard.py :
+
+import os
+import random
+import threading
+import weakref
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session as OrmSession
+
+from .models import (Activity, Challenge, Leadership, Session, SportType, challenge_activity_table,
+                     dialect_insert, user_challenge_table)
+
+# Challenge.metric -> what one activity adds to a participant's score
+METRICS = {
+    'distance': lambda values: values.get('dist') or 0.0,
+    'moving_time': lambda values: values.get('moving_time') or 0,
+    'elevation_gain': lambda values: values.get('total_elevation_gain') or 0.0,
+    'activities': lambda values: 1,
+}
+
+ANY_SPORT = 'Any'
+
+# Seconds between a change to a challenge's standings and writing its ranks to `leadership.rank`
+RANK_FLUSH_INTERVAL = float(os.getenv('LEADERBOARD_RANK_FLUSH_INTERVAL', '30'))
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, height):
+        self.key = key
+        self.next = [None] * height
+        # width[i]: how many positions next[i] is ahead of this node
+        self.width = [1] * height
+
+
+class RankIndex:
+    """Indexable skiplist of sortable keys
+
+    Insert, remove and "how many keys sort before this one" are O(log n);
+    the first n keys are read in O(log n + n).
+    """
+
+    def __init__(self, max_level=24, seed=None):
+        self.max_level = max_level
+        self.head = _Node(None, max_level)
+        self.size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _search(self, key):
+        """Rightmost node before `key` on every level, with its position"""
+        chain = [None] * self.max_level
+        positions = [0] * self.max_level
+        node, position = self.head, 0
+        for level in reversed(range(self.max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def count_less(self, key):
+        """Number of keys that sort before `key`"""
+        node, position = self.head, 0
+        for level in reversed(range(self.max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def insert(self, key):
+        chain, positions = self._search(key)
+        height = 1
+        while height < self.max_level and self._random.random() < 0.5:
+            height += 1
+        node = _Node(key, height)
+        position = positions[0]
+        for level in range(height):
+            previous = chain[level]
+            steps = position - positions[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+        for level in range(height, self.max_level):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._search(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), self.max_level):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def first(self, n):
+        keys = []
+        node = self.head.next[0]
+        while node is not None and len(keys) < n:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """In-memory standings of one challenge, highest score first
+
+    Participants are ordered on (-score, user_id).  Ranks use competition
+    ranking: tied scores share a rank and the next rank is skipped.
+    """
+
+    def __init__(self, challenge_id, scores=(), version=None):
+        self.challenge_id = challenge_id
+        # Challenge.standings_version the scores were loaded at or last moved to
+        self.version = version
+        self.scores = {}
+        self.index = RankIndex()
+        # Set whenever standings move; cleared once ranks are written to the database
+        self.ranks_dirty = True
+        for user_id, score in scores:
+            self.set(user_id, score)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def set(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old is not None:
+            if old == score:
+                return
+            self.index.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.index.insert((-score, user_id))
+        self.ranks_dirty = True
+
+    def remove(self, user_id):
+        score = self.scores.pop(user_id, None)
+        if score is not None:
+            self.index.remove((-score, user_id))
+            self.ranks_dirty = True
+
+    def rank(self, user_id):
+        """The participant's rank, or None if they aren't in the challenge"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.index.count_less((-score, float('-inf'))) + 1
+
+    def top(self, n):
+        """[(rank, user_id, score)] for the first n participants"""
+        standings = []
+        for position, (negated, user_id) in enumerate(self.index.first(n)):
+            if standings and standings[-1][2] == -negated:
+                rank = standings[-1][0]
+            else:
+                rank = position + 1
+            standings.append((rank, user_id, -negated))
+        return standings
+
+    def ranked(self):
+        """Every participant's (rank, user_id, score), in order"""
+        return self.top(len(self.scores))
+
+
+# Session or Connection -> callbacks waiting for its transaction to commit
+_pending = weakref.WeakKeyDictionary()
+_pending_lock = threading.Lock()
+
+
+def _after_commit(conn, fn):
+    """Run fn once the transaction on `conn` (a Session or Connection) commits; drop it on rollback
+
+    The commit and rollback listeners are added once per Session or
+    Connection and drain a shared list, so a long-lived session doesn't
+    collect a pair of listeners per transaction.
+    """
+    with _pending_lock:
+        pending = _pending.get(conn)
+        if pending is None:
+            pending = _pending[conn] = []
+            if isinstance(conn, OrmSession):
+                commit, rollback = 'after_commit', 'after_rollback'
+            else:
+                commit, rollback = 'commit', 'rollback'
+
+            def committed(*args):
+                callbacks = pending[:]
+                del pending[:]
+                for callback in callbacks:
+                    callback()
+
+            def rolled_back(*args):
+                del pending[:]
+
+            event.listen(conn, commit, committed)
+            event.listen(conn, rollback, rolled_back)
+    pending.append(fn)
+
+
+def challenge_window(challenge):
+    """[start, end] of a challenge from its date and time columns"""
+    return (datetime.combine(challenge.start_date.date(), challenge.start_time.time()),
+            datetime.combine(challenge.end_date.date(), challenge.end_time.time()))
+
+
+class ChallengeStandings:
+    """Keeps challenge leaderboards current as activities are written
+
+    Scores are persisted in `leadership` inside the same transaction as the
+    activity write, and the in-memory Leaderboard of a challenge is moved to
+    the committed score afterwards, so a new activity costs O(log n) per
+    challenge it counts towards instead of a re-sort of every participant.
+    Every write also bumps the challenge's `standings_version`.  A board
+    is loaded from `leadership` on first use and reloaded when a read finds
+    the version moved by a write it didn't see (one made by another worker
+    process).  flush_ranks() writes the `rank` column; with a
+    `flush_interval` it runs on a timer that many seconds after the
+    standings change.
+    """
+
+    def __init__(self, session_factory=Session, flush_interval=RANK_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.boards = {}
+        self._lock = threading.Lock()
+        # challenge_id -> pending flush_ranks() timer
+        self._flush_timers = {}
+
+    def board(self, challenge_id):
+        """The challenge's Leaderboard, reloaded if the stored standings moved on without it"""
+        with self.session_factory() as session:
+            version = session.scalar(select(Challenge.standings_version).where(Challenge.id == challenge_id))
+            with self._lock:
+                board = self.boards.get(challenge_id)
+                if board is not None and board.version == version:
+                    return board
+            # The scores are read after the version, so they are at least that new
+            scores = session.execute(
+                select(Leadership.user_id, Leadership.score)
+                .where(Leadership.challenge_id == challenge_id)
+            ).all()
+        board = Leaderboard(challenge_id, scores, version)
+        with self._lock:
+            current = self.boards.get(challenge_id)
+            # Another thread may have moved the board past this load meanwhile
+            if current is not None and (current.version or 0) > (version or 0):
+                return current
+            self.boards[challenge_id] = board
+        return board
+
+    def top(self, challenge_id, n=10):
+        return self.board(challenge_id).top(n)
+
+    def rank(self, challenge_id, user_id):
+        """(rank, score) of a participant, or None"""
+        board = self.board(challenge_id)
+        rank = board.rank(user_id)
+        return None if rank is None else (rank, board.scores[user_id])
+
+    def _set_scores(self, scores, versions):
+        """Move loaded boards to the committed `scores`; `versions` is each challenge's new standings_version
+
+        A board that missed the write before this one is dropped, to be
+        reloaded on its next read.
+        """
+        with self._lock:
+            moved = set()
+            for challenge_id, version in versions.items():
+                board = self.boards.get(challenge_id)
+                if board is None or board.version is None or board.version >= version:
+                    continue
+                if board.version == version - 1:
+                    board.version = version
+                    moved.add(challenge_id)
+                else:
+                    del self.boards[challenge_id]
+            for (challenge_id, user_id), score in scores.items():
+                if challenge_id in moved:
+                    self.boards[challenge_id].set(user_id, score)
+        for challenge_id in versions:
+            self._schedule_flush(challenge_id)
+
+    def _bump_versions(self, conn, challenge_ids):
+        """Increment the challenges' standings_version in the caller's transaction: {challenge_id: new version}"""
+        table = Challenge.__table__
+        rows = conn.execute(
+            update(table).where(table.c.id.in_(challenge_ids))
+            .values(standings_version=table.c.standings_version + 1)
+            .returning(table.c.id, table.c.standings_version)
+        ).all()
+        return {row.id: row.standings_version for row in rows}
+
+    def _challenges_for(self, conn, user_ids):
+        """Open challenges the users take part in: {user_id: [(challenge row, sport_type_id)]}"""
+        rows = conn.execute(
+            select(Challenge.id, Challenge.activity_type, Challenge.metric,
+                   Challenge.start_date, Challenge.start_time, Challenge.end_date, Challenge.end_time,
+                   user_challenge_table.c.user_id, SportType.id.label('sport_type_id'))
+            .join(user_challenge_table, user_challenge_table.c.challenge_id == Challenge.id)
+            .outerjoin(SportType, SportType.name == Challenge.activity_type)
+            .where(user_challenge_table.c.user_id.in_(user_ids), Challenge.complete.is_(False))
+        ).all()
+        challenges = defaultdict(list)
+        for row in rows:
+            challenges[row.user_id].append((row, row.sport_type_id))
+        return challenges
+
+    @staticmethod
+    def _qualifies(challenge, sport_type_id, values):
+        if challenge.activity_type != ANY_SPORT and (
+                sport_type_id is None or values.get('sport_type_id') != sport_type_id):
+            # A sport with no sport_types row yet has no activities of its own
+            return False
+        start, end = challenge_window(challenge)
+        return start <= values['start_date'] <= end
+
+    def apply(self, conn, removed, added):
+        """Account for activity writes on `conn`, given the tracked values before and after
+
+        `removed` holds the old values of updated or deleted activities and
+        `added` the new values of inserted or updated ones (see rollups.TRACKED).
+        """
+        user_ids = {values['user_id'] for values in list(removed) + list(added)
+                    if values.get('user_id') is not None}
+        if not user_ids:
+            return
+        challenges = self._challenges_for(conn, user_ids)
+        if not challenges:
+            return
+
+        deltas = defaultdict(lambda: [0.0, 0])
+        links, unlinks = set(), set()
+        for sign, batch in ((-1, removed), (1, added)):
+            for values in batch:
+                for challenge, sport_type_id in challenges.get(values.get('user_id'), ()):
+                    if not self._qualifies(challenge, sport_type_id, values):
+                        continue
+                    delta = deltas[challenge.id, values['user_id']]
+                    delta[0] += sign * METRICS[challenge.metric](values)
+                    delta[1] += sign
+                    (links if sign > 0 else unlinks).add((challenge.id, values['id']))
+        if not deltas:
+            return
+
+        unlinks -= links
+        if unlinks:
+            conn.execute(challenge_activity_table.delete().where(
+                challenge_activity_table.c.challenge_id == bindparam('c'),
+                challenge_activity_table.c.activity_id == bindparam('a'),
+            ), [{'c': c, 'a': a} for c, a in unlinks])
+        if links:
+            stmt = dialect_insert(conn, challenge_activity_table)
+            conn.execute(stmt.on_conflict_do_nothing(index_elements=['challenge_id', 'activity_id']),
+                         [{'challenge_id': c, 'activity_id': a} for c, a in links])
+
+        stmt = dialect_insert(conn, Leadership.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['challenge_id', 'user_id'],
+            set_={'score': Leadership.__table__.c.score + stmt.excluded.score,
+                  'activity_count': Leadership.__table__.c.activity_count + stmt.excluded.activity_count},
+        ).returning(Leadership.challenge_id, Leadership.user_id, Leadership.score)
+        rows = conn.execute(stmt, [{'challenge_id': challenge_id, 'user_id': user_id,
+                                    'score': score, 'activity_count': count}
+                                   for (challenge_id, user_id), (score, count) in deltas.items()])
+        scores = {(row.challenge_id, row.user_id): row.score for row in rows}
+        versions = self._bump_versions(conn, {challenge_id for challenge_id, _ in deltas})
+        _after_commit(conn, lambda: self._set_scores(scores, versions))
+
+    def join(self, session, challenge_id, user_id):
+        """Enter a user into a challenge, scoring the qualifying activities they already have"""
+        challenge = session.get(Challenge, challenge_id)
+        stmt = dialect_insert(session, user_challenge_table)
+        session.execute(stmt.on_conflict_do_nothing(index_elements=['user_id', 'challenge_id']),
+                        {'user_id': user_id, 'challenge_id': challenge_id})
+        start, end = challenge_window(challenge)
+        query = select(Activity).where(Activity.user_id == user_id,
+                                       Activity.start_date >= start, Activity.start_date <= end)
+        if challenge.activity_type != ANY_SPORT:
+            query = query.join(SportType, SportType.id == Activity.sport_type_id) \
+                .where(SportType.name == challenge.activity_type)
+        activities = session.scalars(query).all()
+        score = sum(METRICS[challenge.metric](
+            {'dist': a.dist, 'moving_time': a.moving_time,
+             'total_elevation_gain': a.total_elevation_gain}) for a in activities)
+        stmt = dialect_insert(session, Leadership.__table__)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=['challenge_id', 'user_id'],
+            set_={'score': stmt.excluded.score, 'activity_count': stmt.excluded.activity_count},
+        ), {'challenge_id': challenge_id, 'user_id': user_id, 'score': score,
+            'activity_count': len(activities)})
+        if activities:
+            stmt = dialect_insert(session, challenge_activity_table)
+            session.execute(stmt.on_conflict_do_nothing(index_elements=['challenge_id', 'activity_id']),
+                            [{'challenge_id': challenge_id, 'activity_id': a.id} for a in activities])
+        versions = self._bump_versions(session, [challenge_id])
+        _after_commit(session, lambda: self._set_scores({(challenge_id, user_id): score}, versions))
+
+    def flush_ranks(self, challenge_id):
+        """Write the current ranks to `leadership.rank` if the standings moved since the last flush"""
+        board = self.board(challenge_id)
+        with self._lock:
+            if not board.ranks_dirty:
+                return 0
+            ranked = board.ranked()
+            board.ranks_dirty = False
+        if not ranked:
+            return 0
+        try:
+            with self.session_factory() as session:
+                session.execute(
+                    update(Leadership.__table__)
+                    .where(Leadership.__table__.c.challenge_id == bindparam('c'),
+                           Leadership.__table__.c.user_id == bindparam('u'))
+                    .values(rank=bindparam('r')),
+                    [{'c': challenge_id, 'u': user_id, 'r': rank} for rank, user_id, _ in ranked],
+                )
+                session.commit()
+        except SQLAlchemyError:
+            board.ranks_dirty = True
+            raise
+        return len(ranked)
+
+    def _schedule_flush(self, challenge_id):
+        """Start a flush_ranks() timer for the challenge unless one is already waiting"""
+        if self.flush_interval is None:
+            return
+        with self._lock:
+            if challenge_id in self._flush_timers:
+                return
+            timer = self._flush_timers[challenge_id] = threading.Timer(
+                self.flush_interval, self._timed_flush, (challenge_id,))
+            timer.daemon = True
+        timer.start()
+
+    def _timed_flush(self, challenge_id):
+        with self._lock:
+            self._flush_timers.pop(challenge_id, None)
+        try:
+            self.flush_ranks(challenge_id)
+        except SQLAlchemyError:
+            # Ranks are derived data; the next change to the standings schedules another try
+            pass
+
+
+_standings = None
+_standings_lock = threading.Lock()
+
+
+def get_standings():
+    """Return the process-wide ChallengeStandings"""
+    global _standings
+    with _standings_lock:
+        if _standings is None:
+            _standings = ChallengeStandings()
+    return _standings
@@ -0,0 +1,298 @@
+# metrics.py :
+
+import contextvars
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of samples keyed by label values; safe to update from any thread"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One slot per bucket plus +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def _samples(self, key, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])}'
+                         f' {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}')
+        lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """Every metric in the Prometheus text exposition format"""
+        return '\n'.join(line for metric in self.metrics for line in metric.expose()) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'Requests handled, by app, route, method and status',
+    ('app', 'endpoint', 'method', 'status')))
+REQUEST_TIME = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to handle a request, by app and route', ('app', 'endpoint')))
+SPAN_TIME = REGISTRY.register(Histogram(
+    'http_request_span_seconds', 'Time a request spent in Strava calls, database queries and templates',
+    ('app', 'endpoint', 'span')))
+UPSTREAM = REGISTRY.register(Counter(
+    'strava_requests_total', 'Calls made to Strava, by endpoint and status', ('endpoint', 'status')))
+UPSTREAM_TIME = REGISTRY.register(Histogram(
+    'strava_request_duration_seconds', 'Latency of calls made to Strava, by endpoint', ('endpoint',)))
+CACHE = REGISTRY.register(Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit, stale, miss)', ('cache', 'result')))
+DB_TIME = REGISTRY.register(Histogram(
+    'db_query_duration_seconds', 'Database statement execution time, by statement type', ('statement',)))
+TEMPLATE_TIME = REGISTRY.register(Histogram(
+    'template_render_duration_seconds', 'Template render time, by template', ('template',)))
+SINGLEFLIGHT = REGISTRY.register(Counter(
+    'singleflight_calls_total', 'Coalesced calls by flight and role (leader ran the call, follower shared it)',
+    ('flight', 'role')))
+RATELIMIT_REMAINING = REGISTRY.register(Gauge(
+    'strava_ratelimit_remaining', 'Strava calls left in the current window, as last reported', ('window',)))
+
+
+# Per-request spans: the time spent in each kind of work while handling the
+# current request.  Fan-out threads run in a copy of the request's context
+# (see fanout.gather), so their upstream calls land in the same spans.
+_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+class Spans:
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, span, seconds):
+        with self._lock:
+            self.totals[span] = self.totals.get(span, 0.0) + seconds
+
+
+def add_span(span, seconds):
+    spans = _spans.get()
+    if spans is not None:
+        spans.add(span, seconds)
+
+
+def endpoint_label(path):
+    """Strava path with ids collapsed, so calls group by endpoint"""
+    return re.sub(r'/[0-9]+(?=/|$)', '/{id}', path.split('?', 1)[0])
+
+
+def observe_upstream(path, status, seconds):
+    endpoint = endpoint_label(path)
+    UPSTREAM.inc(endpoint=endpoint, status=status)
+    UPSTREAM_TIME.observe(seconds, endpoint=endpoint)
+    add_span('strava', seconds)
+
+
+def count_cache(cache, result):
+    CACHE.inc(cache=cache, result=result)
+
+
+def count_singleflight(flight, role):
+    SINGLEFLIGHT.inc(flight=flight, role=role)
+
+
+def set_ratelimit_remaining(short, daily):
+    RATELIMIT_REMAINING.set(short, window='15min')
+    RATELIMIT_REMAINING.set(daily, window='daily')
+
+
+_hooks_installed = False
+_db_hooks_installed = False
+_hooks_lock = threading.Lock()
+_local = threading.local()
+
+
+def install_db_hooks():
+    """Time every SQLAlchemy statement, process-wide
+
+    Called by whatever first opens the local store; apps that never import
+    SQLAlchemy don't load it just to be instrumented.
+    """
+    global _db_hooks_installed
+    with _hooks_lock:
+        if _db_hooks_installed:
+            return
+        _db_hooks_installed = True
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        DB_TIME.observe(elapsed, statement=statement.lstrip().split(None, 1)[0].upper())
+        add_span('db', elapsed)
+
+
+def _install_hooks():
+    """Time every Flask template render, process-wide, and SQLAlchemy once it is loaded"""
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        _hooks_installed = True
+    if 'sqlalchemy' in sys.modules:
+        install_db_hooks()
+
+    from flask import before_render_template, template_rendered
+
+    def before_render(sender, template, context, **extra):
+        _local.__dict__.setdefault('renders', []).append(time.perf_counter())
+
+    def rendered(sender, template, context, **extra):
+        elapsed = time.perf_counter() - _local.renders.pop()
+        TEMPLATE_TIME.observe(elapsed, template=template.name)
+        add_span('template', elapsed)
+
+    before_render_template.connect(before_render, weak=False)
+    template_rendered.connect(rendered, weak=False)
+
+
+def metrics_view():
+    return Response(REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app, name=None):
+    """Instrument a Flask app and serve /metrics from it
+
+    Every request is counted and timed by route, and its Strava, database
+    and template time is reported in a Server-Timing header and in
+    http_request_span_seconds.  Works the same for app.py, api.py and
+    apps built from the routes/ blueprints; `name` labels this app's series.
+    """
+    name = name or app.import_name
+    _install_hooks()
+
+    @app.before_request
+    def start_request_timer():
+        if not _db_hooks_installed and 'sqlalchemy' in sys.modules:
+            # Loaded since startup (lazily, by an earlier request or a background thread)
+            install_db_hooks()
+        g.metrics_start = time.perf_counter()
+        g.metrics_spans = Spans()
+        _spans.set(g.metrics_spans)
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUESTS.inc(app=name, endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_TIME.observe(elapsed, app=name, endpoint=endpoint)
+        spans = g.metrics_spans.totals
+        for span, seconds in spans.items():
+            SPAN_TIME.observe(seconds, app=name, endpoint=endpoint, span=span)
+        timings = [f'{span};dur={seconds * 1000:.1f}' for span, seconds in sorted(spans.items())]
+        timings.append(f'total;dur={elapsed * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    @app.teardown_request
+    def finish_request(error=None):
+        if g.get('metrics_start') is not None:
+            # The request failed before a response was made
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUESTS.inc(app=name, endpoint=endpoint, method=request.method, status=500)
+        _spans.set(None)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    return app
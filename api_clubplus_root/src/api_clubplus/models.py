@@ -0,0 +1,516 @@
+import os
+
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Text, Float, Boolean, LargeBinary
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import ForeignKey
+from sqlalchemy import Table, Index, UniqueConstraint
+from sqlalchemy import bindparam, inspect, literal, or_, select, update
+from sqlalchemy.exc import OperationalError
+
+
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///my_database1.db')
+
+Base = declarative_base()
+engine = create_engine(DATABASE_URL)
+Session = sessionmaker(bind=engine)
+__all__ = ["Base", "engine", "Session", "init_db", "SportType", "User", "Activity",
+           "SyncState", "AthleteToken", "ActivityRollup", "ActivityStream", "DataVersion", "Club", "Challenge", "Leadership", "Comment", "Share"]
+
+# Sport Type table (optional, if needed)
+class SportType(Base):
+  __tablename__ = "sport_types"
+  id = Column(Integer, primary_key=True)
+  name = Column(String(length=50), nullable=False)
+
+class User(Base):
+    __tablename__ = "users"
+
+    # Users are keyed by their Strava athlete id
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    first_name = Column(String(50), nullable=False)
+    last_name = Column(String(50), nullable=False)
+    profileURL = Column(String(255))
+    city = Column(String(50))
+    state = Column(String(50))
+    country = Column(String(50))
+    sex = Column(String(10))
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    mobile_num = Column(String(20), unique=True)
+    email = Column(String(255), unique=True)  # Not provided by Strava
+
+    # One user to one comment (optional, replace with many-to-one if needed)
+    comment = relationship("Comment", uselist=False, backref="user")  
+
+    # Relationship with activities (many-to-many)
+    activities = relationship("Activity", secondary="user_activity")
+
+    # Relationship with challenges (many-to-many)
+    challenges = relationship("Challenge", secondary="user_challenge")
+
+    # Relationship with clubs (many-to-many)
+    clubs = relationship("Club", secondary="user_club")
+
+    # Relationship with shares (one-to-many)
+    shares = relationship("Share", backref="user")
+
+class Activity(Base):
+    __tablename__ = "activities"
+
+    # Activities are keyed by their Strava activity id
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Owning athlete, denormalised from user_activity so per-user range scans hit one index
+    user_id = Column(Integer, ForeignKey("users.id"))
+    name = Column(String(255))
+    dist = Column(Float, nullable=False)
+    moving_time = Column(Integer, nullable=False)
+    elapsed_time = Column(Integer, nullable=False)
+    total_elevation_gain = Column(Float)
+    elevation_high = Column(Float)
+    elevation_low = Column(Float)
+    sport_type_id = Column(Integer, ForeignKey("sport_types.id"))  # Optional foreign key if using SportType table
+    start_date = Column(DateTime, nullable=False)
+    start_date_local = Column(DateTime)
+    timezone = Column(String(length=50))
+    start_latlng = Column(String)
+    end_latlng = Column(String)
+    # Numeric copies of the coordinates for spatial queries (geo.py); NULL for indoor activities
+    start_lat = Column(Float)
+    start_lng = Column(Float)
+    end_lat = Column(Float)
+    end_lng = Column(Float)
+    avg_speed = Column(Float)
+    max_speed = Column(Float)
+    private = Column(Boolean, nullable=False)
+    likes = Column(Integer, nullable=False)
+    # Rendered once at ingest so the dashboard doesn't format every row on every view
+    start_date_display = Column(String(40))
+    moving_time_display = Column(String(80))
+    elapsed_time_display = Column(String(80))
+
+    # Relationship with comments (many-to-many)
+    comments = relationship("Comment", secondary="activity_comment", overlaps="activities")
+
+    # Relationship with shares (one-to-many)
+    shares = relationship("Share", backref="activity")
+
+    __table_args__ = (
+        # "this user's activities between two dates", newest first
+        Index("ix_activities_user_start", "user_id", "start_date", "id"),
+        # "this user's runs between two dates"
+        Index("ix_activities_user_sport_start", "user_id", "sport_type_id", "start_date", "id"),
+        # Global date range scans (challenges, club feeds)
+        Index("ix_activities_start_date", "start_date"),
+        # Start point bounding box scans where the R*Tree below isn't available (PostgreSQL)
+        Index("ix_activities_start_lat_lng", "start_lat", "start_lng"),
+    )
+
+class SyncState(Base):  # Per-athlete progress of the activity sync
+    __tablename__ = "sync_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Newest activity start seen; incremental syncs ask for activities after it
+    high_water_mark = Column(DateTime)
+    # Oldest activity start seen while backfilling; the next backfill page starts before it
+    backfill_cursor = Column(DateTime)
+    backfilled = Column(Boolean, nullable=False, default=False)
+    synced_at = Column(DateTime)
+
+class AthleteToken(Base):  # Latest Strava token set per athlete, for work done outside a request
+    __tablename__ = "athlete_tokens"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    access_token = Column(String(255), nullable=False)
+    refresh_token = Column(String(255))
+    expires_at = Column(Integer)  # Epoch seconds, as returned by Strava
+
+class DataVersion(Base):  # Bumped on every write to an athlete's activities
+    __tablename__ = "data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+class ActivityRollup(Base):  # Per-athlete totals by sport and week/month, maintained on every write
+    __tablename__ = "activity_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String(10), primary_key=True)  # "week" or "month"
+    period_start = Column(Date, primary_key=True)  # Monday / first of the month, local time
+    sport_type_id = Column(Integer, primary_key=True)  # 0 when the activity has no sport type
+    activity_count = Column(Integer, nullable=False, default=0)
+    distance = Column(Float, nullable=False, default=0.0)
+    moving_time = Column(Integer, nullable=False, default=0)
+    elevation_gain = Column(Float, nullable=False, default=0.0)
+
+class ActivityStream(Base):  # One Strava stream (GPS, heart rate, ...) of an activity, packed by streams.py
+    __tablename__ = "activity_streams"
+
+    activity_id = Column(Integer, ForeignKey("activities.id"), primary_key=True)
+    stream_type = Column(String(20), primary_key=True)  # "latlng", "altitude", "heartrate", ...
+    encoding = Column(String(10), nullable=False)  # "delta-i32", "delta-i64" or "f32"
+    scale = Column(Float, nullable=False, default=1.0)  # Stored integers are value * scale
+    components = Column(Integer, nullable=False, default=1)  # 2 for latlng
+    point_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+class Club(Base):
+    __tablename__ = "clubs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(length=255), nullable=False)
+    profile_medium = Column(String(length=255))
+    city = Column(String(50))
+    state = Column(String(50))
+    country = Column(String(50))
+    cover_photo = Column(String(length=255))
+    admin_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    verified = Column(Boolean, nullable=False)
+
+    # Relationship with challenges (one-to-many)
+    challenges = relationship("Challenge", backref="club")
+
+    # Relationship with shares (one-to-many)
+    shares = relationship("Share", backref="club")
+
+    # Relationship with users (many-to-many)
+    members = relationship("User", secondary="user_club", overlaps="clubs")
+
+class Challenge(Base):
+    __tablename__ = "challenges"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(length=255), nullable=False)
+    start_date = Column(DateTime, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    activity_type = Column(String(length=50), nullable=False)  # Sport type name, or "Any"
+    # What participants are ranked on: distance, moving_time, elevation_gain or activities
+    metric = Column(String(length=20), nullable=False, default="distance")
+    description = Column(Text)
+    complete = Column(Boolean, nullable=False)
+    # Bumped with every change to the participants' scores, so each worker can tell its in-memory board is stale
+    standings_version = Column(Integer, nullable=False, default=0)
+
+    # One challenge to one leaderboard row per participant
+    leadership = relationship("Leadership", back_populates="challenge")
+
+    # Relationship with activities (many-to-many)
+    activities = relationship("Activity", secondary="challenge_activity")
+
+    # Relationship with clubs (one-to-many)
+    club_id = Column(Integer, ForeignKey("clubs.id"))
+
+    # Relationship with shares (one-to-many)
+    shares = relationship("Share", backref="challenge")
+
+class Leadership(Base):  # Leadership table for challenge leaderboard, one row per participant
+    __tablename__ = "leadership"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    challenge_id = Column(Integer, ForeignKey("challenges.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(Float, nullable=False, default=0.0)  # Kept current as activities arrive
+    activity_count = Column(Integer, nullable=False, default=0)
+    rank = Column(Integer)  # Written by leaderboard.ChallengeStandings.flush_ranks, a little after scores change
+
+    # Relationship with Challenge (many-to-one)
+    challenge = relationship("Challenge", back_populates="leadership")
+
+    __table_args__ = (
+        UniqueConstraint("challenge_id", "user_id", name="uq_leadership"),
+    )
+
+class Comment(Base):
+    __tablename__ = "comments"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    comment = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    # Relationship with activities (many-to-many)
+    activities = relationship("Activity", secondary="activity_comment", overlaps="comments")
+
+    # Relationship with challenges (many-to-many)
+    challenges = relationship("Challenge", secondary="challenge_comment")
+
+class Share(Base):
+    __tablename__ = "shares"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    url = Column(String(length=255))
+    email = Column(String(length=255))  # Optional email for sharing
+    created_at = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # Relationship with activities (one-to-many)
+    activity_id = Column(Integer, ForeignKey("activities.id"))
+
+    # Relationship with challenges (one-to-many)
+    challenge_id = Column(Integer, ForeignKey("challenges.id"))
+
+    # Relationship with clubs (one-to-many)
+    club_id = Column(Integer, ForeignKey("clubs.id"))
+
+# Many-to-many association tables.  Each pair is unique (which also indexes
+# lookups by the first column) and the second column is indexed for reverse lookups.
+user_activity = relationship("User", secondary="user_activity")
+user_activity_table = Table(
+    "user_activity",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("activity_id", Integer, ForeignKey("activities.id")),
+    UniqueConstraint("user_id", "activity_id", name="uq_user_activity"),
+    Index("ix_user_activity_activity_id", "activity_id"),
+)
+
+user_challenge = relationship("User", secondary="user_challenge")
+user_challenge_table = Table(
+    "user_challenge",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("challenge_id", Integer, ForeignKey("challenges.id")),
+    UniqueConstraint("user_id", "challenge_id", name="uq_user_challenge"),
+    Index("ix_user_challenge_challenge_id", "challenge_id"),
+)
+
+user_club = relationship("User", secondary="user_club")
+user_club_table = Table(
+    "user_club",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("club_id", Integer, ForeignKey("clubs.id")),
+    UniqueConstraint("user_id", "club_id", name="uq_user_club"),
+    Index("ix_user_club_club_id", "club_id"),
+)
+
+challenge_activity = relationship("Challenge", secondary="challenge_activity")
+challenge_activity_table = Table(
+    "challenge_activity",
+    Base.metadata,
+    Column("challenge_id", Integer, ForeignKey("challenges.id")),
+    Column("activity_id", Integer, ForeignKey("activities.id")),
+    UniqueConstraint("challenge_id", "activity_id", name="uq_challenge_activity"),
+    Index("ix_challenge_activity_activity_id", "activity_id"),
+)
+
+activity_comment = relationship("Activity", secondary="activity_comment")
+activity_comment_table = Table(
+    "activity_comment",
+    Base.metadata,
+    Column("activity_id", Integer, ForeignKey("activities.id")),
+    Column("comment_id", Integer, ForeignKey("comments.id")),
+    UniqueConstraint("activity_id", "comment_id", name="uq_activity_comment"),
+    Index("ix_activity_comment_comment_id", "comment_id"),
+)
+
+# Challenge comment association table (many-to-many)
+challenge_comment = relationship("Challenge", secondary="challenge_comment")
+challenge_comment_table = Table(
+    "challenge_comment",
+    Base.metadata,
+    Column("challenge_id", Integer, ForeignKey("challenges.id")),
+    Column("comment_id", Integer, ForeignKey("comments.id")),
+    UniqueConstraint("challenge_id", "comment_id", name="uq_challenge_comment"),
+    Index("ix_challenge_comment_comment_id", "comment_id"),
+)
+
+
+# SQLite R*Tree over activity start points, kept in step with `activities` by
+# triggers so every write path (ORM, bulk ingest, sync, webhooks) maintains it
+SPATIAL_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS activity_geo USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    """CREATE TRIGGER IF NOT EXISTS activity_geo_insert AFTER INSERT ON activities
+       WHEN new.start_lat IS NOT NULL AND new.start_lng IS NOT NULL BEGIN
+           INSERT OR REPLACE INTO activity_geo
+           VALUES (new.id, new.start_lat, new.start_lat, new.start_lng, new.start_lng);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS activity_geo_update AFTER UPDATE OF start_lat, start_lng ON activities
+       WHEN old.start_lat IS NOT new.start_lat OR old.start_lng IS NOT new.start_lng BEGIN
+           DELETE FROM activity_geo WHERE id = old.id;
+           INSERT INTO activity_geo
+           SELECT new.id, new.start_lat, new.start_lat, new.start_lng, new.start_lng
+           WHERE new.start_lat IS NOT NULL AND new.start_lng IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS activity_geo_delete AFTER DELETE ON activities BEGIN
+           DELETE FROM activity_geo WHERE id = old.id;
+       END""",
+)
+# Index start points stored before the spatial table existed
+SPATIAL_INDEX_FILL = (
+    """INSERT OR REPLACE INTO activity_geo
+       SELECT id, start_lat, start_lat, start_lng, start_lng FROM activities
+       WHERE start_lat IS NOT NULL AND start_lng IS NOT NULL""",
+)
+
+
+# SQLite FTS5 indexes over activity names, challenge names/descriptions and
+# comments, kept in step with their tables by triggers.  The owner/club
+# columns hold "u<user id>" / "c<club id>" tokens so a search scoped to one
+# athlete or club is an index intersection; they carry no weight in ranking.
+SEARCH_TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+SEARCH_INDEX_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS activity_search USING fts5(name, owner, {SEARCH_TOKENIZE})",
+    "INSERT INTO activity_search(activity_search, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    """CREATE TRIGGER IF NOT EXISTS activity_search_insert AFTER INSERT ON activities BEGIN
+           INSERT INTO activity_search(rowid, name, owner) VALUES (new.id, new.name, 'u' || new.user_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS activity_search_update AFTER UPDATE OF name, user_id ON activities
+       WHEN old.name IS NOT new.name OR old.user_id IS NOT new.user_id BEGIN
+           DELETE FROM activity_search WHERE rowid = old.id;
+           INSERT INTO activity_search(rowid, name, owner) VALUES (new.id, new.name, 'u' || new.user_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS activity_search_delete AFTER DELETE ON activities BEGIN
+           DELETE FROM activity_search WHERE rowid = old.id;
+       END""",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS challenge_search USING fts5(name, description, club, {SEARCH_TOKENIZE})",
+    "INSERT INTO challenge_search(challenge_search, rank) VALUES ('rank', 'bm25(2.0, 1.0, 0.0)')",
+    """CREATE TRIGGER IF NOT EXISTS challenge_search_insert AFTER INSERT ON challenges BEGIN
+           INSERT INTO challenge_search(rowid, name, description, club)
+           VALUES (new.id, new.name, new.description, 'c' || new.club_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS challenge_search_update AFTER UPDATE OF name, description, club_id ON challenges
+       BEGIN
+           DELETE FROM challenge_search WHERE rowid = old.id;
+           INSERT INTO challenge_search(rowid, name, description, club)
+           VALUES (new.id, new.name, new.description, 'c' || new.club_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS challenge_search_delete AFTER DELETE ON challenges BEGIN
+           DELETE FROM challenge_search WHERE rowid = old.id;
+       END""",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS comment_search USING fts5(comment, owner, {SEARCH_TOKENIZE})",
+    "INSERT INTO comment_search(comment_search, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    """CREATE TRIGGER IF NOT EXISTS comment_search_insert AFTER INSERT ON comments BEGIN
+           INSERT INTO comment_search(rowid, comment, owner) VALUES (new.id, new.comment, 'u' || new.user_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_search_update AFTER UPDATE OF comment, user_id ON comments BEGIN
+           DELETE FROM comment_search WHERE rowid = old.id;
+           INSERT INTO comment_search(rowid, comment, owner) VALUES (new.id, new.comment, 'u' || new.user_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_search_delete AFTER DELETE ON comments BEGIN
+           DELETE FROM comment_search WHERE rowid = old.id;
+       END""",
+)
+# Index rows written before the search tables existed
+SEARCH_INDEX_FILL = (
+    "INSERT INTO activity_search(rowid, name, owner) SELECT id, name, 'u' || user_id FROM activities",
+    """INSERT INTO challenge_search(rowid, name, description, club)
+       SELECT id, name, description, 'c' || club_id FROM challenges""",
+    "INSERT INTO comment_search(rowid, comment, owner) SELECT id, comment, 'u' || user_id FROM comments",
+)
+
+
+def init_db(bind=None):
+    """Create any missing tables, columns and indexes (and the spatial and search indexes, on SQLite builds with R*Tree/FTS5)"""
+    bind = bind or engine
+    existing = set(inspect(bind).get_table_names())
+    Base.metadata.create_all(bind)
+    added = upgrade_tables(bind, [table for table in Base.metadata.sorted_tables if table.name in existing])
+    if ('activities', 'start_lat') in added:
+        with bind.begin() as conn:
+            fill_coordinates(conn)
+    if bind.dialect.name != 'sqlite':
+        return
+    try:
+        with bind.begin() as conn:
+            new = not has_sqlite_table(conn, 'activity_geo')
+            for statement in SPATIAL_INDEX_DDL:
+                conn.exec_driver_sql(statement)
+            if new:
+                for statement in SPATIAL_INDEX_FILL:
+                    conn.exec_driver_sql(statement)
+    except OperationalError:
+        # No R*Tree module: spatial queries fall back to ix_activities_start_lat_lng
+        pass
+    try:
+        with bind.begin() as conn:
+            new = not has_sqlite_table(conn, 'activity_search')
+            for statement in SEARCH_INDEX_DDL:
+                conn.exec_driver_sql(statement)
+            if new:
+                for statement in SEARCH_INDEX_FILL:
+                    conn.exec_driver_sql(statement)
+    except OperationalError:
+        # No FTS5 module: /search answers 501
+        pass
+
+
+def upgrade_tables(bind, tables):
+    """Add the columns and indexes that `tables` gained since they were created
+
+    create_all() skips tables that already exist, so a database made by an
+    older version would be missing them.  New NOT NULL columns are added
+    with their default; constraints on existing columns are left alone.
+    Returns the (table, column) names that were added.
+    """
+    inspector = inspect(bind)
+    added = set()
+    with bind.begin() as conn:
+        for table in tables:
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl(column, conn.dialect)}")
+                    added.add((table.name, column.name))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
+
+
+def parse_latlng(value):
+    """(lat, lng) floats from a stored "lat,lng" string; (None, None) if absent or unreadable"""
+    try:
+        lat, lng = value.split(',')
+        return float(lat), float(lng)
+    except (AttributeError, ValueError):
+        return None, None
+
+
+def fill_coordinates(conn):
+    """Copy the stored start/end "lat,lng" strings into the numeric coordinate columns
+
+    For rows written before those columns existed; later writes set both.
+    """
+    activities = Activity.__table__
+    rows = conn.execute(select(activities.c.id, activities.c.start_latlng, activities.c.end_latlng).where(
+        or_(activities.c.start_latlng.isnot(None), activities.c.end_latlng.isnot(None)))).all()
+    values = []
+    for activity_id, start, end in rows:
+        start_lat, start_lng = parse_latlng(start)
+        end_lat, end_lng = parse_latlng(end)
+        values.append({'activity_id': activity_id, 'start_lat': start_lat, 'start_lng': start_lng,
+                       'end_lat': end_lat, 'end_lng': end_lng})
+    if values:
+        conn.execute(update(activities).where(activities.c.id == bindparam('activity_id')).values(
+            start_lat=bindparam('start_lat'), start_lng=bindparam('start_lng'),
+            end_lat=bindparam('end_lat'), end_lng=bindparam('end_lng')), values)
+
+
+def column_ddl(column, dialect):
+    """`name TYPE [DEFAULT x] [NOT NULL]` for ALTER TABLE ... ADD COLUMN"""
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += " DEFAULT " + str(literal(default, column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}))
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def has_sqlite_table(conn, name):
+    """Whether a SQLite database has a table (virtual tables included) called `name`"""
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).first() is not None
+
+
+def dialect_insert(conn, table):
+    """The INSERT ... ON CONFLICT capable insert() for a Connection or Session"""
+    # Sessions expose the engine through get_bind(), Connections directly
+    dialect = conn.get_bind().dialect if hasattr(conn, 'get_bind') else conn.dialect
+    if dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
@@ -0,0 +1,185 @@
+# queries.py :
+
+import base64
+import os
+from datetime import datetime
+
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.dialects import sqlite
+
+from .display import format_duration, format_start_date
+from .models import Activity, SportType
+
+STRAVA_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Default and maximum rows per page of a paginated activity list
+PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = 200
+
+
+def _format_date(value):
+    return value.strftime(STRAVA_DATE_FORMAT) if value else None
+
+
+def _parse_latlng(value):
+    if not value:
+        return []
+    lat, lng = value.split(',')
+    return [float(lat), float(lng)]
+
+
+def activity_to_dict(activity, sport_type=None, display=False):
+    """Render a stored activity in the shape of Strava's activity JSON
+
+    With `display`, also includes the precomputed display strings under
+    'display' (formatted now for rows stored before they existed).
+    """
+    values = {
+        'id': activity.id,
+        'name': activity.name,
+        'type': sport_type,
+        'sport_type': sport_type,
+        'distance': activity.dist,
+        'moving_time': activity.moving_time,
+        'elapsed_time': activity.elapsed_time,
+        'total_elevation_gain': activity.total_elevation_gain,
+        'elev_high': activity.elevation_high,
+        'elev_low': activity.elevation_low,
+        'start_date': _format_date(activity.start_date),
+        'start_date_local': _format_date(activity.start_date_local),
+        'timezone': activity.timezone,
+        'start_latlng': _parse_latlng(activity.start_latlng),
+        'end_latlng': _parse_latlng(activity.end_latlng),
+        'average_speed': activity.avg_speed,
+        'max_speed': activity.max_speed,
+        'private': activity.private,
+        'kudos_count': activity.likes,
+    }
+    if display:
+        values['display'] = {
+            'start_date': activity.start_date_display or format_start_date(activity.start_date),
+            'moving_time': activity.moving_time_display or format_duration(activity.moving_time),
+            'elapsed_time': activity.elapsed_time_display or format_duration(activity.elapsed_time),
+        }
+    return values
+
+
+def activities_query(user_id, start=None, end=None, sport_type_id=None):
+    """SELECT for a user's activities in a [start, end) window, newest first
+
+    Served by ix_activities_user_start, or ix_activities_user_sport_start when
+    a sport type is given; both also satisfy the ORDER BY.
+    """
+    query = (
+        select(Activity, SportType.name)
+        .outerjoin(SportType, SportType.id == Activity.sport_type_id)
+        .where(Activity.user_id == user_id)
+    )
+    if sport_type_id is not None:
+        query = query.where(Activity.sport_type_id == sport_type_id)
+    if start is not None:
+        query = query.where(Activity.start_date >= start)
+    if end is not None:
+        query = query.where(Activity.start_date < end)
+    return query.order_by(Activity.start_date.desc(), Activity.id.desc())
+
+
+def activities_in_range(session, user_id, start=None, end=None, sport_type_id=None, limit=None):
+    """A user's activities in a start date window (optionally one sport), as Strava-shaped dicts"""
+    query = activities_query(user_id, start, end, sport_type_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [activity_to_dict(activity, sport_type) for activity, sport_type in session.execute(query)]
+
+
+def athlete_activities(session, user_id, date_range=None):
+    """An athlete's stored activities, newest first, as Strava-shaped dicts
+
+    `date_range` (a filters.DateRange) restricts the result to a start date window.
+    """
+    if date_range is None:
+        return activities_in_range(session, user_id)
+    return activities_in_range(session, user_id, date_range.start, date_range.end)
+
+
+def encode_cursor(start_date, activity_id):
+    raw = f"{start_date.strftime(STRAVA_DATE_FORMAT)}|{activity_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into (start_date, id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        start_date, activity_id = raw.split('|')
+        return datetime.strptime(start_date, STRAVA_DATE_FORMAT), int(activity_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class ActivityPage:
+    """One page of a keyset-paginated activity list"""
+
+    def __init__(self, activities, next_cursor=None, prev_cursor=None):
+        self.activities = activities
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def activity_page(session, user_id, cursor=None, backwards=False, page_size=PAGE_SIZE,
+                  start=None, end=None, display=False):
+    """A page of a user's activities, newest first, keyed on (start_date, id)
+
+    `cursor` is the next/prev cursor of a previous page; `backwards` pages
+    towards newer activities.  Each page is an index range scan that stops
+    after page_size + 1 rows, so its cost doesn't grow with history length.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    key = tuple_(Activity.start_date, Activity.id)
+    query = (
+        select(Activity, SportType.name)
+        .outerjoin(SportType, SportType.id == Activity.sport_type_id)
+        .where(Activity.user_id == user_id)
+    )
+    if start is not None:
+        query = query.where(Activity.start_date >= start)
+    if end is not None:
+        query = query.where(Activity.start_date < end)
+    if cursor is not None:
+        position = tuple_(*decode_cursor(cursor))
+        query = query.where(key > position if backwards else key < position)
+    if backwards:
+        query = query.order_by(Activity.start_date.asc(), Activity.id.asc())
+    else:
+        query = query.order_by(Activity.start_date.desc(), Activity.id.desc())
+    rows = session.execute(query.limit(page_size + 1)).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return ActivityPage([])
+
+    first, last = rows[0][0], rows[-1][0]
+    more_newer = has_more if backwards else cursor is not None
+    more_older = cursor is not None if backwards else has_more
+    return ActivityPage(
+        [activity_to_dict(activity, sport_type, display) for activity, sport_type in rows],
+        next_cursor=encode_cursor(last.start_date, last.id) if more_older else None,
+        prev_cursor=encode_cursor(first.start_date, first.id) if more_newer else None,
+    )
+
+
+def sport_type_id(session, name):
+    """Look up a sport type id by name, or None if it has never been synced"""
+    return session.execute(select(SportType.id).where(SportType.name == name)).scalar_one_or_none()
+
+
+def explain(session, query):
+    """SQLite's EXPLAIN QUERY PLAN for a SELECT, one detail string per step"""
+    compiled = query.compile(dialect=sqlite.dialect(paramstyle='named'))
+    params = {key: value.isoformat(' ') if isinstance(value, datetime) else value
+              for key, value in compiled.params.items()}
+    rows = session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"), params)
+    return [row[-1] for row in rows]
@@ -0,0 +1,197 @@
+# ratelimit.py :
+
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from .config import data_path
+from .metrics import set_ratelimit_remaining
+
+# Unset: strava_ratelimit.db in the data directory (see config.data_path)
+RATELIMIT_PATH = os.getenv('STRAVA_RATELIMIT_PATH')
+
+# Assumed quotas until Strava reports the real ones in X-RateLimit-Limit
+SHORT_LIMIT = int(os.getenv('STRAVA_RATE_LIMIT_15MIN', 200))
+DAILY_LIMIT = int(os.getenv('STRAVA_RATE_LIMIT_DAILY', 2000))
+# Share of every quota (and of the token bucket) that background work may not touch
+INTERACTIVE_RESERVE = float(os.getenv('STRAVA_INTERACTIVE_RESERVE', 0.2))
+# Token bucket size as a share of the 15-minute quota; refills evenly over the window
+BURST_FRACTION = float(os.getenv('STRAVA_BURST_FRACTION', 0.25))
+
+SHORT_WINDOW = 15 * 60
+DAY = 24 * 60 * 60
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# How long a caller will queue for quota before giving up
+MAX_WAIT = {
+    INTERACTIVE: float(os.getenv('STRAVA_INTERACTIVE_MAX_WAIT', 2)),
+    BACKGROUND: float(os.getenv('STRAVA_BACKGROUND_MAX_WAIT', 60)),
+}
+
+
+class RateLimited(requests.RequestException):
+    """No quota left within the caller's wait budget"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Strava rate limit reached, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def parse_pair(value):
+    """Parse a "15min,daily" header value"""
+    try:
+        short, daily = value.split(',')[:2]
+        return int(short), int(daily)
+    except (AttributeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """Admits upstream calls against Strava's 15-minute and daily quotas
+
+    State lives in a small SQLite file so every worker process on the host
+    shares one view of the quota.  Usage is resynchronised from the
+    X-RateLimit-Usage / X-RateLimit-Limit headers of each response and
+    counted locally in between.  A token bucket spreads the 15-minute quota
+    over the window, and background callers must leave INTERACTIVE_RESERVE
+    of every budget for interactive ones.
+    """
+
+    def __init__(self, path=RATELIMIT_PATH, short_limit=SHORT_LIMIT, daily_limit=DAILY_LIMIT,
+                 reserve=INTERACTIVE_RESERVE, burst_fraction=BURST_FRACTION, clock=time.time,
+                 sleep=time.sleep):
+        self.path = path or data_path('strava_ratelimit.db')
+        self.reserve = reserve
+        self.burst_fraction = burst_fraction
+        self.clock = clock
+        self.sleep = sleep
+        self._local = threading.local()
+        now = self.clock()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " short_limit INTEGER NOT NULL, daily_limit INTEGER NOT NULL,"
+            " short_used INTEGER NOT NULL, daily_used INTEGER NOT NULL,"
+            " short_window REAL NOT NULL, day_window REAL NOT NULL,"
+            " tokens REAL NOT NULL, refilled_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO rate_limit VALUES (1, ?, ?, 0, 0, ?, ?, ?, ?)",
+            (short_limit, daily_limit, now - now % SHORT_WINDOW, now - now % DAY,
+             short_limit * burst_fraction, now),
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _load(self, conn, now):
+        state = dict(conn.execute("SELECT * FROM rate_limit WHERE id = 1").fetchone())
+        # Roll the fixed windows Strava uses (quarter hours, UTC days)
+        if now - state['short_window'] >= SHORT_WINDOW:
+            state['short_window'] = now - now % SHORT_WINDOW
+            state['short_used'] = 0
+        if now - state['day_window'] >= DAY:
+            state['day_window'] = now - now % DAY
+            state['daily_used'] = 0
+        capacity = max(1.0, state['short_limit'] * self.burst_fraction)
+        rate = state['short_limit'] / SHORT_WINDOW
+        state['tokens'] = min(capacity, state['tokens'] + (now - state['refilled_at']) * rate)
+        state['refilled_at'] = now
+        return state, capacity, rate
+
+    def _save(self, conn, state):
+        conn.execute(
+            "UPDATE rate_limit SET short_limit = :short_limit, daily_limit = :daily_limit,"
+            " short_used = :short_used, daily_used = :daily_used,"
+            " short_window = :short_window, day_window = :day_window,"
+            " tokens = :tokens, refilled_at = :refilled_at WHERE id = 1",
+            state,
+        )
+
+    def _try_acquire(self, priority):
+        """Take one call's worth of quota; returns 0 on success or seconds to wait"""
+        conn = self._conn()
+        now = self.clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state, capacity, rate = self._load(conn, now)
+            share = 1.0 if priority == INTERACTIVE else 1.0 - self.reserve
+            floor = 0.0 if priority == INTERACTIVE else capacity * self.reserve
+
+            if state['daily_used'] + 1 > state['daily_limit'] * share:
+                wait = state['day_window'] + DAY - now
+            elif state['short_used'] + 1 > state['short_limit'] * share:
+                wait = state['short_window'] + SHORT_WINDOW - now
+            elif state['tokens'] - 1 < floor:
+                wait = (floor + 1 - state['tokens']) / rate
+            else:
+                state['tokens'] -= 1
+                state['short_used'] += 1
+                state['daily_used'] += 1
+                wait = 0
+            self._save(conn, state)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return max(wait, 0.001) if wait else 0
+
+    def acquire(self, priority=INTERACTIVE):
+        """Block until a call may be made, or raise RateLimited past the priority's wait budget"""
+        deadline = self.clock() + MAX_WAIT[priority]
+        while True:
+            wait = self._try_acquire(priority)
+            if not wait:
+                return
+            remaining = deadline - self.clock()
+            if wait > remaining:
+                raise RateLimited(wait)
+            self.sleep(wait)
+
+    def update(self, response):
+        """Resynchronise usage from a Strava response's rate limit headers"""
+        limits = parse_pair(response.headers.get('X-RateLimit-Limit'))
+        usage = parse_pair(response.headers.get('X-RateLimit-Usage'))
+        if limits is None and usage is None and response.status_code != 429:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state, capacity, rate = self._load(conn, self.clock())
+            if limits is not None:
+                state['short_limit'], state['daily_limit'] = limits
+            if usage is not None:
+                state['short_used'], state['daily_used'] = usage
+            if response.status_code == 429:
+                # Strava says we're out; don't trust local counting until the window rolls
+                state['short_used'] = max(state['short_used'], state['short_limit'])
+                state['tokens'] = 0.0
+            self._save(conn, state)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        set_ratelimit_remaining(state['short_limit'] - state['short_used'],
+                                state['daily_limit'] - state['daily_used'])
+
+    def headroom(self):
+        """Remaining (15-minute, daily) calls as last seen"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            state, capacity, rate = self._load(conn, self.clock())
+        finally:
+            conn.execute("ROLLBACK")
+        return (state['short_limit'] - state['short_used'],
+                state['daily_limit'] - state['daily_used'])
@@ -0,0 +1,128 @@
+# rollups.py :
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import delete, select
+
+from .models import Activity, ActivityRollup, SportType, dialect_insert
+
+PERIODS = ('week', 'month')
+
+# Columns of `activities` the rollups are computed from
+TRACKED = (Activity.id, Activity.user_id, Activity.sport_type_id, Activity.start_date,
+           Activity.start_date_local, Activity.dist, Activity.moving_time,
+           Activity.total_elevation_gain)
+
+
+def period_start(period, day):
+    """First day of the week (Monday) or month containing `day`"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def periods_back(period, day, count):
+    """Start of the period `count - 1` periods before the one containing `day`"""
+    start = period_start(period, day)
+    for _ in range(count - 1):
+        start = period_start(period, start - timedelta(days=1))
+    return start
+
+
+def rollup_values(activity):
+    """The tracked column values of a loaded Activity"""
+    return {column.key: getattr(activity, column.key) for column in TRACKED}
+
+
+def tracked_values(conn, activity_ids):
+    """The tracked column values of the stored activities among `activity_ids`"""
+    if not activity_ids:
+        return []
+    return conn.execute(select(*TRACKED).where(Activity.id.in_(activity_ids))).mappings().all()
+
+
+class RollupDelta:
+    """Net change to the rollup rows from a set of activity writes
+
+    Remove each activity's old values and add its new ones, then apply()
+    the difference in a single upsert on the same transaction.
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(lambda: [0, 0.0, 0, 0.0])
+
+    def add(self, values, sign=1):
+        if values.get('user_id') is None:
+            return
+        day = (values.get('start_date_local') or values['start_date']).date()
+        for period in PERIODS:
+            key = (values['user_id'], period, period_start(period, day), values.get('sport_type_id') or 0)
+            totals = self.totals[key]
+            totals[0] += sign
+            totals[1] += sign * (values.get('dist') or 0.0)
+            totals[2] += sign * (values.get('moving_time') or 0)
+            totals[3] += sign * (values.get('total_elevation_gain') or 0.0)
+
+    def remove(self, values):
+        self.add(values, -1)
+
+    def apply(self, conn):
+        rows = [{
+            'user_id': user_id, 'period': period, 'period_start': start, 'sport_type_id': sport_type_id,
+            'activity_count': count, 'distance': distance, 'moving_time': moving_time,
+            'elevation_gain': elevation_gain,
+        } for (user_id, period, start, sport_type_id), (count, distance, moving_time, elevation_gain)
+            in self.totals.items() if count or distance or moving_time or elevation_gain]
+        self.totals.clear()
+        if not rows:
+            return
+        table = ActivityRollup.__table__
+        stmt = dialect_insert(conn, table)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'period', 'period_start', 'sport_type_id'],
+            set_={name: table.c[name] + stmt.excluded[name]
+                  for name in ('activity_count', 'distance', 'moving_time', 'elevation_gain')},
+        ), rows)
+        conn.execute(delete(ActivityRollup).where(
+            ActivityRollup.user_id.in_({row['user_id'] for row in rows}),
+            ActivityRollup.activity_count <= 0,
+        ))
+
+
+def rebuild(conn, user_id=None):
+    """Recompute the rollups from `activities`, e.g. for a database that predates them"""
+    query = select(*TRACKED)
+    clear = delete(ActivityRollup)
+    if user_id is not None:
+        query = query.where(Activity.user_id == user_id)
+        clear = clear.where(ActivityRollup.user_id == user_id)
+    conn.execute(clear)
+    delta = RollupDelta()
+    for values in conn.execute(query).mappings():
+        delta.add(values)
+    delta.apply(conn)
+
+
+def summary(session, user_id, period, count, today=None):
+    """Per-sport totals for the athlete's last `count` weeks or months, newest first
+
+    Reads only the rollup table, so the cost doesn't grow with history length.
+    """
+    since = periods_back(period, today or date.today(), count)
+    rows = session.execute(
+        select(ActivityRollup, SportType.name)
+        .outerjoin(SportType, SportType.id == ActivityRollup.sport_type_id)
+        .where(ActivityRollup.user_id == user_id,
+               ActivityRollup.period == period,
+               ActivityRollup.period_start >= since)
+        .order_by(ActivityRollup.period_start.desc(), ActivityRollup.distance.desc())
+    ).all()
+    return [{
+        'period_start': rollup.period_start,
+        'sport_type': name or 'Other',
+        'activities': rollup.activity_count,
+        'distance': rollup.distance,
+        'moving_time': rollup.moving_time,
+        'elevation_gain': rollup.elevation_gain,
+    } for rollup, name in rows]
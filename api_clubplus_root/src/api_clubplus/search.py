@@ -0,0 +1,189 @@
+# search.py :
+
+import base64
+import re
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, literal_column, select, tuple_
+
+from .models import (Activity, Challenge, Comment, SportType, has_sqlite_table, user_challenge_table,
+                     user_club_table)
+from .queries import MAX_PAGE_SIZE, PAGE_SIZE, STRAVA_DATE_FORMAT, activity_to_dict
+
+SEARCH_TYPES = ('activities', 'challenges', 'comments')
+# Best match first (BM25), or newest (highest id) first.  Ranking has to count every row
+# holding each search term, so for very common words 'recent' is much cheaper.
+SEARCH_ORDERS = ('rank', 'recent')
+# Longest query accepted, in terms
+MAX_TERMS = 16
+
+# The FTS5 tables that models.init_db creates on SQLite, described for querying only
+_metadata = MetaData()
+activity_search = Table('activity_search', _metadata, Column('rowid', Integer), Column('name', Text),
+                        Column('owner', Text), Column('rank', Text))
+challenge_search = Table('challenge_search', _metadata, Column('rowid', Integer), Column('name', Text),
+                         Column('description', Text), Column('club', Text), Column('rank', Text))
+comment_search = Table('comment_search', _metadata, Column('rowid', Integer), Column('comment', Text),
+                       Column('owner', Text), Column('rank', Text))
+
+# Whether each SQLite database has the search tables, by URL
+_fts = {}
+
+
+def has_search_index(session):
+    bind = session.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return False
+    key = str(bind.url)
+    if key not in _fts:
+        _fts[key] = has_sqlite_table(session.connection(), 'activity_search')
+    return _fts[key]
+
+
+def match_expression(text, columns):
+    """Turn search box input into an FTS5 query over `columns`
+
+    Every bare word must match, "quoted words" must match as a phrase and
+    a trailing * makes a word a prefix.  Anything else in the input is
+    ignored, so user text can't reach FTS5's own query syntax.  Raises
+    ValueError when nothing searchable is left.
+    """
+    terms = []
+    for phrase, word, star in re.findall(r'"([^"]*)"?|(\w+)(\*?)', text or ''):
+        if word:
+            terms.append(f'"{word}"{star}')
+        else:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+    if not terms:
+        raise ValueError("Empty search")
+    return '{%s} : (%s)' % (' '.join(columns), ' '.join(terms[:MAX_TERMS]))
+
+
+def encode_cursor(rank, row_id):
+    raw = f"{'' if rank is None else repr(rank)}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into (rank or None, id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        rank, row_id = raw.split('|')
+        return (float(rank) if rank else None), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class SearchPage:
+    """One page of search results"""
+
+    def __init__(self, results, next_cursor=None):
+        self.results = results
+        self.next_cursor = next_cursor
+
+
+def _format_date(value):
+    return value.strftime(STRAVA_DATE_FORMAT) if value else None
+
+
+def _activities(index, user_id, club_id):
+    query = (select(Activity, SportType.name)
+             .join(index, index.c.rowid == Activity.id)
+             .outerjoin(SportType, SportType.id == Activity.sport_type_id))
+    if club_id is None:
+        # The athlete's own activities, private ones included
+        return query, lambda text: f'owner : "u{user_id}" AND ' + match_expression(text, ['name'])
+    members = select(user_club_table.c.user_id).where(user_club_table.c.club_id == club_id)
+    query = query.where(Activity.user_id.in_(members), Activity.private.is_(False))
+    return query, lambda text: match_expression(text, ['name'])
+
+
+def _challenges(index, user_id, club_id):
+    query = select(Challenge).join(index, index.c.rowid == Challenge.id)
+    if club_id is None:
+        # Challenges the athlete has joined
+        joined = select(user_challenge_table.c.challenge_id).where(user_challenge_table.c.user_id == user_id)
+        return query.where(Challenge.id.in_(joined)), lambda text: match_expression(text, ['name', 'description'])
+    return query, lambda text: f'club : "c{club_id}" AND ' + match_expression(text, ['name', 'description'])
+
+
+def _comments(index, user_id, club_id):
+    query = select(Comment).join(index, index.c.rowid == Comment.id)
+    if club_id is None:
+        return query, lambda text: f'owner : "u{user_id}" AND ' + match_expression(text, ['comment'])
+    members = select(user_club_table.c.user_id).where(user_club_table.c.club_id == club_id)
+    return query.where(Comment.user_id.in_(members)), lambda text: match_expression(text, ['comment'])
+
+
+def challenge_to_dict(challenge):
+    return {
+        'id': challenge.id,
+        'name': challenge.name,
+        'description': challenge.description,
+        'club_id': challenge.club_id,
+        'activity_type': challenge.activity_type,
+        'metric': challenge.metric,
+        'start_date': _format_date(challenge.start_date),
+        'end_date': _format_date(challenge.end_date),
+    }
+
+
+def comment_to_dict(comment):
+    return {
+        'id': comment.id,
+        'user_id': comment.user_id,
+        'comment': comment.comment,
+        'created_at': _format_date(comment.created_at),
+    }
+
+
+# Search type -> (FTS table, query builder, row -> dict)
+_SEARCHES = {
+    'activities': (activity_search, _activities, lambda row: activity_to_dict(row[0], row[1])),
+    'challenges': (challenge_search, _challenges, lambda row: challenge_to_dict(row[0])),
+    'comments': (comment_search, _comments, lambda row: comment_to_dict(row[0])),
+}
+
+
+def search(session, kind, text, user_id, club_id=None, cursor=None, page_size=PAGE_SIZE, order='rank'):
+    """A page of `kind` matching `text`, keyed on (rank, id) or, newest first, on id
+
+    Without `club_id` the search covers the athlete's own activities and
+    comments and the challenges they have joined; with it, the club's
+    challenges and its members' public activities and comments.  Ranking
+    is FTS5's BM25.  Raises ValueError for an unknown type or order, an
+    empty query or a malformed cursor.
+    """
+    if kind not in _SEARCHES or order not in SEARCH_ORDERS:
+        raise ValueError(f"Unknown search type or order: {kind}, {order}")
+    index, build, to_dict = _SEARCHES[kind]
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    query, expression = build(index, user_id, club_id)
+    ranked = order == 'rank'
+    rank = index.c.rank
+    query = query.where(literal_column(index.name).op('MATCH')(expression(text)))
+    if cursor is not None:
+        position, row_id = decode_cursor(cursor)
+        if ranked != (position is not None):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        query = query.where(tuple_(rank, index.c.rowid) > tuple_(position, row_id) if ranked
+                            else index.c.rowid < row_id)
+    if ranked:
+        query = query.add_columns(rank).order_by(rank, index.c.rowid)
+    else:
+        query = query.order_by(index.c.rowid.desc())
+    rows = session.execute(query.limit(page_size + 1)).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    results = []
+    for row in rows:
+        values = to_dict(row)
+        if ranked:
+            values['score'] = -row[-1]
+        results.append(values)
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1][-1] if ranked else None, results[-1]['id'])
+    return SearchPage(results, next_cursor)
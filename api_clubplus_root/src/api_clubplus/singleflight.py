@@ -0,0 +1,68 @@
+# singleflight.py :
+
+import threading
+
+from .metrics import count_singleflight
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result (or exception).
+    Once it completes the key is forgotten, so nothing is cached here.
+    Leaders and followers are counted in singleflight_calls_total under `name`.
+    """
+
+    def __init__(self, name='default'):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+        count_singleflight(self.name, 'leader' if leader else 'follower')
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """Counters plus the coalescing ratio (share of requests that rode on another's call)"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'executions': self.executions,
+                'shared': self.shared,
+                'coalescing_ratio': self.shared / self.requests if self.requests else 0.0,
+            }
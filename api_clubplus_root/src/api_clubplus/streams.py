@@ -0,0 +1,188 @@
+# streams.py :
+
+import struct
+import zlib
+
+from sqlalchemy import select
+
+from .frames import np, require_numpy
+from .models import ActivityStream, dialect_insert
+from .ratelimit import INTERACTIVE
+
+# Stream type -> (components, scale).  Values are stored as round(value * scale)
+# in int32, delta-encoded, so the scale is the precision kept: Strava sends
+# distance/altitude to 0.1 m, speed to 0.001 m/s and coordinates to 1e-7 degrees.
+STREAM_SPECS = {
+    'time': (1, 1),
+    'distance': (1, 10),
+    'latlng': (2, 10 ** 7),
+    'altitude': (1, 10),
+    'velocity_smooth': (1, 1000),
+    'heartrate': (1, 1),
+    'cadence': (1, 1),
+    'watts': (1, 1),
+    'temp': (1, 1),
+    'moving': (1, 1),
+    'grade_smooth': (1, 10),
+}
+STREAM_TYPES = tuple(STREAM_SPECS)
+
+DELTA_I32 = 'delta-i32'
+# Fixed-point values whose steps don't fit int32 (a track crossing the antimeridian)
+DELTA_I64 = 'delta-i64'
+# Delta-encoded integer dtype, by encoding
+DELTA_DTYPES = {DELTA_I32: '<i4', DELTA_I64: '<i8'}
+# Anything that doesn't fit the int32 fixed-point form is kept as plain float32
+FLOAT32 = 'f32'
+
+# Points per independently compressed block; a slice only decodes the blocks it touches
+STREAM_BLOCK = 1024
+# Blob header: point count, points per block, components; then block offsets (uint32)
+HEADER = struct.Struct('<IIH')
+INT32_MAX = 2 ** 31 - 1
+
+
+def _shuffle(array):
+    """Group the 1st bytes of every value together, then the 2nd, ...: small deltas compress far better"""
+    return np.ascontiguousarray(array.view(np.uint8).reshape(-1, array.itemsize).T).tobytes()
+
+
+def _unshuffle(raw, dtype):
+    dtype = np.dtype(dtype)
+    return np.ascontiguousarray(np.frombuffer(raw, np.uint8).reshape(dtype.itemsize, -1).T).view(dtype)
+
+
+def encode_stream(values, components=1, scale=1, block_size=STREAM_BLOCK):
+    """Pack a stream's values into (encoding, blob)"""
+    require_numpy()
+    values = np.asarray(values, dtype='float64').reshape(-1, components)
+    fixed = np.rint(values * scale)
+    if len(fixed) and np.abs(fixed).max() > INT32_MAX:
+        encoding, values = FLOAT32, values.astype('<f4')
+    elif len(fixed) > 1 and np.abs(np.diff(fixed, axis=0)).max() > INT32_MAX:
+        encoding, values = DELTA_I64, fixed.astype('<i8')
+    else:
+        encoding, values = DELTA_I32, fixed.astype('<i4')
+
+    blocks = []
+    for start in range(0, len(values), block_size):
+        block = values[start:start + block_size]
+        if encoding in DELTA_DTYPES:
+            # First point absolute, the rest as differences from the previous one
+            block = np.concatenate((block[:1], np.diff(block, axis=0)))
+        blocks.append(zlib.compress(_shuffle(block), 6))
+    offsets = np.zeros(len(blocks) + 1, dtype='<u4')
+    offsets[1:] = np.cumsum([len(block) for block in blocks])
+    return encoding, HEADER.pack(len(values), block_size, components) + offsets.tobytes() + b''.join(blocks)
+
+
+class StreamView:
+    """A stored stream, decoded a block at a time as it is indexed
+
+    The blob is wrapped in a memoryview: the block table is read in place
+    with np.frombuffer and blocks are decompressed straight from slices of
+    it, so nothing is copied until a block is actually needed.
+    """
+
+    def __init__(self, blob, encoding=DELTA_I32, scale=1):
+        self._buffer = memoryview(blob)
+        self.encoding = encoding
+        self.scale = scale
+        self.count, self.block_size, self.components = HEADER.unpack_from(self._buffer)
+        blocks = -(-self.count // self.block_size)
+        self._offsets = np.frombuffer(self._buffer, dtype='<u4', count=blocks + 1, offset=HEADER.size)
+        self._payload = HEADER.size + self._offsets.nbytes
+        self._blocks = {}
+
+    def __len__(self):
+        return self.count
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is None:
+            start = self._payload + int(self._offsets[index])
+            end = self._payload + int(self._offsets[index + 1])
+            raw = zlib.decompress(self._buffer[start:end])
+            if self.encoding in DELTA_DTYPES:
+                deltas = _unshuffle(raw, DELTA_DTYPES[self.encoding]).reshape(-1, self.components)
+                block = np.cumsum(deltas, axis=0, dtype='int64')
+                block = block / self.scale if self.scale != 1 else block
+            else:
+                block = _unshuffle(raw, '<f4').reshape(-1, self.components).astype('float64')
+            if self.components == 1:
+                block = block[:, 0]
+            self._blocks[index] = block
+        return block
+
+    def _range(self, start, stop):
+        # Points start..stop-1 (0 <= start, stop <= count), from the blocks covering them
+        if start >= stop:
+            shape = (0,) if self.components == 1 else (0, self.components)
+            return np.empty(shape, dtype='float64')
+        first, last = start // self.block_size, (stop - 1) // self.block_size
+        blocks = [self._block(i) for i in range(first, last + 1)]
+        values = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+        offset = first * self.block_size
+        return values[start - offset:stop - offset]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.count)
+            if step < 0:
+                return self._range(0, self.count)[key]
+            return self._range(start, stop)[::step]
+        if key < 0:
+            key += self.count
+        if not 0 <= key < self.count:
+            raise IndexError(key)
+        return self._block(key // self.block_size)[key % self.block_size]
+
+    def array(self):
+        return self._range(0, self.count)
+
+
+def parse_streams(payload):
+    """{type: values} from a Strava streams response (keyed by type or not)"""
+    if isinstance(payload, dict):
+        return {name: stream.get('data') or [] for name, stream in payload.items()}
+    return {stream['type']: stream.get('data') or [] for stream in payload}
+
+
+def fetch_streams(client, access_token, activity_id, types=STREAM_TYPES, priority=INTERACTIVE):
+    """An activity's streams from Strava, or None if it has none; raises requests.HTTPError otherwise"""
+    response = client.get(f"/activities/{activity_id}/streams", access_token,
+                          params={'keys': ','.join(types), 'key_by_type': 'true'}, priority=priority)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return parse_streams(response.json())
+
+
+def store_streams(conn, activity_id, streams):
+    """Encode and upsert an activity's streams; `streams` maps type to values"""
+    rows = []
+    for stream_type, values in streams.items():
+        components, scale = STREAM_SPECS.get(stream_type, (1, 1))
+        if stream_type not in STREAM_SPECS and values and isinstance(values[0], list):
+            components = len(values[0])
+        encoding, blob = encode_stream(values, components, scale)
+        rows.append({'activity_id': activity_id, 'stream_type': stream_type, 'encoding': encoding,
+                     'scale': scale, 'components': components, 'point_count': len(values), 'data': blob})
+    if not rows:
+        return
+    stmt = dialect_insert(conn, ActivityStream.__table__)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['activity_id', 'stream_type'],
+        set_={name: stmt.excluded[name] for name in ('encoding', 'scale', 'components', 'point_count', 'data')},
+    ), rows)
+
+
+def load_streams(session, activity_id, types=None):
+    """{type: StreamView} for the stored streams of an activity (all types unless `types` is given)"""
+    require_numpy()
+    query = select(ActivityStream.stream_type, ActivityStream.encoding, ActivityStream.scale,
+                   ActivityStream.data).where(ActivityStream.activity_id == activity_id)
+    if types:
+        query = query.where(ActivityStream.stream_type.in_(types))
+    return {row.stream_type: StreamView(row.data, row.encoding, row.scale)
+            for row in session.execute(query)}
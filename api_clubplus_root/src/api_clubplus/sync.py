@@ -0,0 +1,284 @@
+# sync.py :
+
+import calendar
+import os
+import threading
+from datetime import datetime, timedelta
+
+import requests
+
+from .client import get_client
+from .ingest import SportTypeLookup, ingest_batch, parse_date
+from .leaderboard import get_standings
+from .models import (Activity, ActivityStream, Session, SyncState, User, challenge_activity_table,
+                     user_activity_table)
+from .ratelimit import BACKGROUND, INTERACTIVE
+from .rollups import RollupDelta, rollup_values, tracked_values
+from .versions import bump_versions
+
+# Activities requested per page (Strava allows up to 200)
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 200))
+# Minimum seconds between incremental syncs for the same athlete.  With a
+# webhook subscription (STRAVA_VERIFY_TOKEN set) changes are pushed to us, so
+# polling is only a slow safety net.
+SYNC_INTERVAL = int(os.getenv('SYNC_INTERVAL', 21600 if os.getenv('STRAVA_VERIFY_TOKEN') else 60))
+
+
+def to_epoch(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+def user_values(athlete):
+    """Map a Strava athlete JSON object onto `users` column values"""
+    now = datetime.utcnow()
+    return {
+        'id': athlete['id'],
+        'first_name': athlete.get('firstname') or '',
+        'last_name': athlete.get('lastname') or '',
+        'profileURL': athlete.get('profile'),
+        'city': athlete.get('city'),
+        'state': athlete.get('state'),
+        'country': athlete.get('country'),
+        'sex': athlete.get('sex'),
+        'created_at': parse_date(athlete.get('created_at')) or now,
+        'updated_at': parse_date(athlete.get('updated_at')) or now,
+    }
+
+
+class ActivitySync:
+    """Keeps the local `activities` table in step with an athlete's Strava history
+
+    The first sync backfills the full history page by page, newest first,
+    committing after every page so an interrupted backfill resumes where it
+    stopped.  Only the newest page is fetched inline; with
+    `background_backfill` the rest of the history is paged in on a daemon
+    thread at background rate-limit priority.  After that only activities
+    newer than the stored high-water mark are requested, using Strava's
+    `after` parameter.
+    """
+
+    def __init__(self, client=None, session_factory=Session, page_size=SYNC_PAGE_SIZE,
+                 interval=SYNC_INTERVAL, background_backfill=True, standings=None):
+        self.client = client or get_client()
+        self.standings = standings or get_standings()
+        self.session_factory = session_factory
+        self.page_size = page_size
+        self.interval = timedelta(seconds=interval)
+        self.background_backfill = background_backfill
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, athlete_id):
+        with self._locks_guard:
+            return self._locks.setdefault(athlete_id, threading.Lock())
+
+    def register_athlete(self, athlete):
+        """Create or refresh the `users` row for a Strava athlete"""
+        with self.session_factory() as session:
+            self._upsert_user(session, athlete)
+            session.commit()
+
+    def sync(self, athlete_id, access_token, athlete=None, force=False):
+        """Bring the athlete's activities up to date; returns the number of activities written
+
+        The athlete must already be registered unless their Strava athlete
+        JSON is passed in, in which case the `users` row is refreshed too.
+        If another thread is already syncing this athlete, returns 0 at once.
+        """
+        lock = self._lock_for(athlete_id)
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            with self.session_factory() as session:
+                if athlete is not None:
+                    self._upsert_user(session, athlete)
+                state = session.get(SyncState, athlete_id)
+                if state is None:
+                    state = SyncState(user_id=athlete_id, backfilled=False)
+                    session.add(state)
+                now = datetime.utcnow()
+                if not force and state.synced_at and now - state.synced_at < self.interval:
+                    return 0
+
+                written = 0
+                if state.high_water_mark is not None:
+                    written += self._sync_new(session, state, access_token)
+                if not state.backfilled:
+                    # The newest page is what the caller is waiting for
+                    max_pages = 1 if self.background_backfill else None
+                    written += self._backfill(session, state, access_token, INTERACTIVE, max_pages)
+
+                state.synced_at = now
+                session.commit()
+                backfill_pending = not state.backfilled
+        finally:
+            lock.release()
+
+        if backfill_pending:
+            threading.Thread(target=self.backfill, args=(athlete_id, access_token),
+                             daemon=True).start()
+        return written
+
+    def backfill(self, athlete_id, access_token):
+        """Page in the rest of the athlete's history at background priority"""
+        lock = self._lock_for(athlete_id)
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            with self.session_factory() as session:
+                state = session.get(SyncState, athlete_id)
+                if state is None or state.backfilled:
+                    return 0
+                try:
+                    return self._backfill(session, state, access_token, BACKGROUND)
+                except SyncError:
+                    # Progress is committed per page; the next sync picks up from the cursor
+                    return 0
+        finally:
+            lock.release()
+
+    def _sync_new(self, session, state, access_token):
+        written = 0
+        page = 1
+        while True:
+            # Catching up on new activities is what the waiting page view needs.
+            # Strava's `after` is exclusive: one second before the high-water
+            # mark keeps activities that started in its second (the ones already
+            # stored are just upserted again)
+            activities = self._fetch(access_token, {
+                'after': to_epoch(state.high_water_mark) - 1,
+                'page': page,
+                'per_page': self.page_size,
+            }, INTERACTIVE)
+            written += self._store_page(session, state, activities)
+            session.commit()
+            if len(activities) < self.page_size:
+                return written
+            page += 1
+
+    def _backfill(self, session, state, access_token, priority, max_pages=None):
+        written = 0
+        pages = 0
+        inclusive = True
+        while max_pages is None or pages < max_pages:
+            params = {'per_page': self.page_size}
+            cursor = state.backfill_cursor
+            if cursor is not None:
+                # Strava's `before` is exclusive: asking for one second past the
+                # cursor keeps activities that started in the same second as it
+                # (the ones already stored are just upserted again)
+                params['before'] = to_epoch(cursor) + (1 if inclusive else 0)
+            activities = self._fetch(access_token, params, priority)
+            written += self._store_page(session, state, activities)
+            pages += 1
+            # A page that didn't move the cursor was all that one second; step past it
+            inclusive = state.backfill_cursor != cursor
+            if len(activities) < self.page_size:
+                state.backfilled = True
+            session.commit()
+            if state.backfilled:
+                break
+        return written
+
+    def _fetch(self, access_token, params, priority):
+        try:
+            response = self.client.get("/athlete/activities", access_token, params=params,
+                                       priority=priority)
+        except requests.RequestException as e:
+            raise SyncError(f"Failed to fetch activities from Strava ({e})")
+        if response.status_code != 200:
+            raise SyncError(f"Failed to fetch activities from Strava ({response.status_code})")
+        return response.json()
+
+    def _store_page(self, session, state, activities):
+        if not activities:
+            return 0
+        for values in self._upsert(session, state.user_id, activities):
+            start = values['start_date']
+            if state.high_water_mark is None or start > state.high_water_mark:
+                state.high_water_mark = start
+            if state.backfill_cursor is None or start < state.backfill_cursor:
+                state.backfill_cursor = start
+        return len(activities)
+
+    def _upsert(self, session, user_id, activities):
+        return ingest_batch(session, activities, user_id, standings=self.standings)
+
+    # Single-activity changes pushed by webhooks.  These leave the sync
+    # state alone: an out-of-order event must not move the high-water mark
+    # past activities that haven't been fetched yet.
+
+    def store_activity(self, user_id, data):
+        """Insert or replace one activity from its Strava JSON"""
+        with self.session_factory() as session:
+            self._upsert(session, user_id, [data])
+            session.commit()
+
+    def patch_activity(self, activity_id, updates, owner_id=None):
+        """Apply a webhook's `updates` (title/type/private) to a stored activity
+
+        Returns False if the activity isn't stored locally, or belongs to
+        someone other than `owner_id` when that is given.
+        """
+        with self.session_factory() as session:
+            activity = session.get(Activity, activity_id)
+            if activity is None or (owner_id is not None and activity.user_id != owner_id):
+                return False
+            old = rollup_values(activity)
+            delta = RollupDelta()
+            delta.remove(old)
+            if 'title' in updates:
+                activity.name = updates['title']
+            if 'type' in updates:
+                activity.sport_type_id = SportTypeLookup().id_for(session, updates['type'])
+            if 'private' in updates:
+                activity.private = str(updates['private']).lower() == 'true'
+            new = rollup_values(activity)
+            delta.add(new)
+            delta.apply(session)
+            self.standings.apply(session, [old], [new])
+            bump_versions(session, [activity.user_id])
+            session.commit()
+            return True
+
+    def delete_activity(self, activity_id, owner_id=None):
+        """Remove an activity with its streams, rollups and standings; only `owner_id`'s when given"""
+        with self.session_factory() as session:
+            if owner_id is not None and session.query(Activity.user_id).filter_by(
+                    id=activity_id).scalar() not in (None, owner_id):
+                return
+            old = tracked_values(session, [activity_id])
+            delta = RollupDelta()
+            for values in old:
+                delta.remove(values)
+            delta.apply(session)
+            self.standings.apply(session, old, [])
+            bump_versions(session, [values['user_id'] for values in old])
+            session.execute(challenge_activity_table.delete().where(
+                challenge_activity_table.c.activity_id == activity_id))
+            session.execute(user_activity_table.delete().where(
+                user_activity_table.c.activity_id == activity_id))
+            session.query(ActivityStream).filter_by(activity_id=activity_id).delete()
+            session.query(Activity).filter_by(id=activity_id).delete()
+            session.commit()
+
+    def _upsert_user(self, session, athlete):
+        session.merge(User(**user_values(athlete)))
+
+
+class SyncError(Exception):
+    pass
+
+
+_sync = None
+_sync_lock = threading.Lock()
+
+
+def get_sync():
+    """Return the process-wide ActivitySync, creating it on first use"""
+    global _sync
+    if _sync is None:
+        with _sync_lock:
+            if _sync is None:
+                _sync = ActivitySync()
+    return _sync
@@ -0,0 +1,25 @@
+# templating.py :
+
+from datetime import datetime
+
+
+# Define a custom Jinja filter for formatting datetime
+def format_datetime(dt):
+    from .display import format_start_date
+    # Parse the datetime string into a datetime object
+    dt_obj = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%SZ')
+    # Format the datetime object into the desired format
+    return format_start_date(dt_obj)
+
+
+# Define a custom Jinja filter for formatting timedelta
+def format_timedelta(seconds):
+    from .display import format_duration
+    # Format the duration using humanize library (same as the stored display fields)
+    return format_duration(seconds)
+
+
+def init_templating(app):
+    """Register the filters the shared templates use (humanize loads with the first page that needs it)"""
+    app.add_template_filter(format_datetime)
+    app.add_template_filter(format_timedelta)
@@ -0,0 +1,77 @@
+# tokens.py :
+
+import os
+import time
+
+import requests
+
+from .models import AthleteToken, Session
+
+# Refresh this long before Strava's expires_at, so a token never lapses mid-request
+REFRESH_AHEAD = int(os.getenv('STRAVA_REFRESH_AHEAD', 600))
+
+
+def needs_refresh(expires_at, now=None, ahead=REFRESH_AHEAD):
+    """True when a token expiring at `expires_at` (epoch seconds) is due for refresh
+
+    Decided locally, without asking Strava.  Tokens with no known expiry
+    (sessions from before it was stored) are taken as valid.
+    """
+    if expires_at is None:
+        return False
+    return expires_at - ahead <= (now or time.time())
+
+
+def is_expired(expires_at, now=None):
+    return needs_refresh(expires_at, now, ahead=0)
+
+
+def refresh_token_set(client, refresh_token, client_id, client_secret):
+    """Exchange a refresh token for a new token set, or None if Strava refused or is unreachable"""
+    try:
+        response = client.refresh(client_id, client_secret, refresh_token)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+
+def save_tokens(athlete_id, token_set, session_factory=Session):
+    """Store the token set from a Strava token response for an athlete"""
+    with session_factory() as session:
+        session.merge(AthleteToken(
+            user_id=athlete_id,
+            access_token=token_set['access_token'],
+            refresh_token=token_set.get('refresh_token'),
+            expires_at=token_set.get('expires_at'),
+        ))
+        session.commit()
+
+
+def load_tokens(athlete_id, session_factory=Session):
+    """The athlete's stored token set, or None"""
+    with session_factory(expire_on_commit=False) as session:
+        return session.get(AthleteToken, athlete_id)
+
+
+def fresh_tokens(athlete_id, client, credentials, session_factory=Session):
+    """The athlete's stored token set, refreshed and saved first if it is about to expire
+
+    `credentials` is the app's (client id, client secret), see config.credentials().
+    """
+    tokens = load_tokens(athlete_id, session_factory)
+    if tokens is None or not tokens.refresh_token or not needs_refresh(tokens.expires_at):
+        return tokens
+    token_set = refresh_token_set(client, tokens.refresh_token, *credentials)
+    if token_set is None:
+        # Still usable until it actually expires; try again on the next call
+        return tokens
+    save_tokens(athlete_id, token_set, session_factory)
+    return load_tokens(athlete_id, session_factory)
+
+
+def delete_tokens(athlete_id, session_factory=Session):
+    with session_factory() as session:
+        session.query(AthleteToken).filter_by(user_id=athlete_id).delete()
+        session.commit()
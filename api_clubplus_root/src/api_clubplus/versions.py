@@ -0,0 +1,28 @@
+# versions.py :
+
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .models import DataVersion, dialect_insert
+
+
+def bump_versions(conn, user_ids):
+    """Mark the athletes' stored data as changed, in the caller's transaction"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    now = datetime.utcnow().replace(microsecond=0)
+    stmt = dialect_insert(conn, DataVersion.__table__)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': DataVersion.__table__.c.version + 1, 'updated_at': stmt.excluded.updated_at},
+    ), [{'user_id': user_id, 'version': 1, 'updated_at': now} for user_id in user_ids])
+
+
+def data_version(session, user_id):
+    """(version, updated_at) of an athlete's stored data; (0, None) before anything was written"""
+    row = session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.user_id == user_id)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
@@ -0,0 +1,547 @@
+# web.py :
+#
+# The dashboard UI.  The local store (SQLAlchemy models, humanize display
+# fields, NumPy frames) is imported by the first view that reads it, not
+# when the app starts.
+
+from datetime import date, datetime
+import os
+import threading
+import time
+
+from flask import Blueprint, redirect, url_for, render_template, session, request, jsonify, make_response
+from markupsafe import Markup
+
+from .cache import CacheEntry, MemoryCache, athlete_tag
+from .conditional import is_not_modified, make_etag, not_modified, with_validators
+from .config import authorization_url, credentials
+from .fanout import gather
+from .filters import DateRange
+from .metrics import count_cache, install_db_hooks
+from .templating import format_datetime
+
+web_bp = Blueprint("web", __name__)
+
+# Rendered activity table pages, keyed by athlete, data version and page parameters
+fragment_cache = MemoryCache(maxsize=int(os.getenv('FRAGMENT_CACHE_SIZE', 256)))
+
+_store_ready = False
+_store_lock = threading.Lock()
+_frame_store = None
+
+
+def strava():
+    # The shared Strava client; requests and the caches load with the first call
+    from .client import get_client
+    return get_client()
+
+
+def init_store():
+    """Import the models and create the local store's tables, once per process"""
+    global _store_ready
+    if not _store_ready:
+        with _store_lock:
+            if not _store_ready:
+                from .models import init_db
+                install_db_hooks()
+                init_db()
+                _store_ready = True
+
+
+def open_store():
+    """A session on the local activity store"""
+    init_store()
+    from .models import Session
+    return Session()
+
+
+def activity_sync():
+    # Local activity store, kept up to date by the sync engine
+    from .sync import get_sync
+    init_store()
+    return get_sync()
+
+
+def frame_store():
+    # Column arrays for /analytics, memory-mapped from ACTIVITY_FRAME_DIR when set
+    global _frame_store
+    if _frame_store is None:
+        from .frames import FrameStore
+        _frame_store = FrameStore()
+    return _frame_store
+
+
+def page_size_arg():
+    from .queries import PAGE_SIZE
+    return request.args.get('page_size', PAGE_SIZE, type=int)
+
+
+# Initialize session variable to track login status
+@web_bp.before_app_request
+def before_request():
+    session.permanent = True
+
+
+def remember_tokens(token_set):
+    # Keep the whole token set so validity can be decided locally and refreshed ahead of expiry
+    session['access_token'] = token_set['access_token']
+    session['refresh_token'] = token_set.get('refresh_token')
+    session['expires_at'] = token_set.get('expires_at')
+
+
+def current_access_token():
+    # The session's access token, refreshed shortly before it expires;
+    # None when there is no usable token and the user has to log in again
+    access_token = session.get('access_token')
+    if not access_token:
+        return None
+    from .tokens import is_expired, needs_refresh, refresh_token_set, save_tokens
+    if not needs_refresh(session.get('expires_at')):
+        return access_token
+    token_set = None
+    if session.get('refresh_token'):
+        token_set = refresh_token_set(strava(), session['refresh_token'], *credentials())
+    if token_set is None:
+        if not is_expired(session.get('expires_at')):
+            # Refresh failed but the token still works; try again on the next request
+            return access_token
+        session.clear()
+        return None
+    remember_tokens(token_set)
+    if session.get('athlete_id'):
+        # Webhook processing uses the stored copy
+        init_store()
+        save_tokens(session['athlete_id'], token_set)
+    return token_set['access_token']
+
+
+@web_bp.route("/")
+def home():
+    if current_access_token():
+        # Token is valid (checked locally from expires_at), redirect to dashboard
+        return redirect(url_for(".dashboard"))
+
+    # User is not logged in or access token is invalid, render the home page with login button
+    return render_template("home.html")
+
+
+@web_bp.route("/login")
+def login():
+    # Check if user is already authenticated; an expired token that can't be
+    # refreshed clears the session and we proceed with login
+    if current_access_token():
+        return redirect(url_for(".dashboard"))
+
+    # Redirect user to Strava's authorization page with the app's scope
+    return redirect(authorization_url())
+
+
+@web_bp.route("/strava/auth", methods=['GET', 'POST'])
+def strava_auth():
+    auth_code = None
+    if request.method == 'GET':
+        # Retrieve authorization code from query parameters
+        auth_code = request.args.get('code')
+    elif request.method == 'POST':
+        # Retrieve authorization code from form data
+        auth_code = request.form.get('code')
+
+    if auth_code:
+        # Exchange authorization code for access token
+        response = strava().exchange_code(*credentials(), auth_code)
+        if response.status_code == 200:
+            token_set = response.json()
+            access_token = token_set.get('access_token')
+            athlete = token_set.get('athlete')
+
+            # Fetch user data from Strava API
+            response = strava().get("/athlete/activities", access_token)
+            if response.status_code == 200:
+                # Store the token set in session
+                remember_tokens(token_set)
+                if athlete:
+                    from .tokens import save_tokens
+                    # Remember who this is so the dashboard doesn't have to ask first
+                    activity_sync().register_athlete(athlete)
+                    session['athlete_id'] = athlete['id']
+                    # Keep the token server-side for webhook-driven updates
+                    save_tokens(athlete['id'], token_set)
+
+                # Redirect to the dashboard
+                return redirect(url_for(".dashboard"))
+            else:
+                return "Failed to fetch user activities from Strava API"
+        else:
+            return "Failed to authenticate with Strava"
+    else:
+        return "Authorization code not found"
+
+
+def sync_activities(athlete_id, access_token, athlete=None):
+    from .sync import SyncError
+    try:
+        activity_sync().sync(athlete_id, access_token, athlete)
+    except SyncError:
+        # Strava is unavailable, serve what has already been synced
+        pass
+
+
+def render_activity_rows(athlete_id, date_range):
+    # Keyset pagination: ?cursor=<next/prev cursor>&direction=prev&page_size=N
+    # Returns (rows html, next cursor, prev cursor); the rendered rows are reused
+    # until the athlete's data version changes
+    from .queries import activity_page
+    from .versions import data_version
+    cursor = request.args.get('cursor') or None
+    backwards = request.args.get('direction') == 'prev'
+    page_size = page_size_arg()
+    with open_store() as db:
+        version, _ = data_version(db, athlete_id)
+        key = (athlete_id, version, cursor, backwards, page_size, date_range.start, date_range.end)
+        entry = fragment_cache.get(key)
+        count_cache('fragments', 'miss' if entry is None else 'hit')
+        if entry is None:
+            page = activity_page(db, athlete_id, cursor=cursor, backwards=backwards,
+                                 page_size=page_size, start=date_range.start, end=date_range.end,
+                                 display=True)
+            rows = Markup(render_template("_activity_rows.html", activities=page.activities))
+            entry = CacheEntry((rows, page.next_cursor, page.prev_cursor), time.time(),
+                               tag=athlete_tag(athlete_id))
+            fragment_cache.set(key, entry)
+        return entry.data
+
+
+def read_summary(athlete_id):
+    # Weekly and monthly totals per sport, read from the rollup table only
+    from .rollups import summary
+    with open_store() as db:
+        return {
+            'week': summary(db, athlete_id, 'week', 4),
+            'month': summary(db, athlete_id, 'month', 6),
+        }
+
+
+def dashboard_validators(response):
+    # Per-user pages: the session cookie selects the representation
+    response.vary.add('Cookie')
+    return response
+
+
+@web_bp.route("/dashboard", methods=['GET', 'POST'])
+def dashboard():
+    from .versions import data_version
+    access_token = current_access_token()
+    if not access_token:
+        return redirect(url_for(".login"))
+
+    # Filter activities on a start date range if provided (DD-MM-YYYY, both ends inclusive)
+    try:
+        date_range = DateRange.from_form(request.values.get('start_date'), request.values.get('end_date'))
+    except ValueError:
+        return "Invalid date range. Please use DD-MM-YYYY format with the end date on or after the start date."
+
+    import requests
+    from .ratelimit import RateLimited
+    athlete_id = session.get('athlete_id')
+    try:
+        if athlete_id:
+            # Retrieve user data and bring the local activity store up to date concurrently
+            response, _ = gather(
+                lambda: strava().cached_get("/athlete", access_token, tag=athlete_tag(athlete_id)),
+                lambda: sync_activities(athlete_id, access_token),
+            )
+        else:
+            # Retrieve user data from Strava API (served from cache when fresh)
+            response = strava().cached_get("/athlete", access_token)
+    except RateLimited as e:
+        page = make_response(render_template("access_revoked.html"), 429)
+        page.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+        return page
+    except requests.RequestException:
+        # Strava unreachable or timed out with nothing cached
+        return render_template("access_revoked.html"), 502
+    if response.status_code == 200:
+        athlete = response.json()
+        user_name = athlete["firstname"]
+
+        if not athlete_id:
+            # Sessions from before athlete_id was stored: sync now and remember the id
+            sync_activities(athlete['id'], access_token, athlete)
+            session['athlete_id'] = athlete['id']
+
+        # The page only changes with the athlete's data version, their name, the query or
+        # posted form (the date range), and the day (summary windows), so a client holding
+        # that copy gets a 304
+        with open_store() as db:
+            version, updated_at = data_version(db, athlete['id'])
+        today = date.today()
+        last_modified = max(updated_at or datetime.min, datetime.combine(today, datetime.min.time()))
+        etag = make_etag('dashboard', athlete['id'], version, user_name, today,
+                         date_range.start, date_range.end, sorted(request.values.items(multi=True)))
+        if is_not_modified(etag, last_modified):
+            return dashboard_validators(not_modified(etag, last_modified))
+
+        # Read one page of activities from the local store, filtered on start date in the query
+        try:
+            activity_rows, next_cursor, prev_cursor = render_activity_rows(athlete['id'], date_range)
+        except ValueError:
+            return "Invalid page cursor."
+
+        page = render_template("dashboard.html", user_name=user_name, activity_rows=activity_rows,
+                               summary=read_summary(athlete['id']),
+                               next_cursor=next_cursor, prev_cursor=prev_cursor,
+                               page_size=page_size_arg(),
+                               start_date=request.values.get('start_date', ''),
+                               end_date=request.values.get('end_date', ''),
+                               format_datetime=format_datetime)
+        return dashboard_validators(with_validators(make_response(page), etag, last_modified))
+    else:
+        # Access might be revoked, display message and redirect after a delay
+        return render_template("access_revoked.html")
+
+
+@web_bp.route("/dashboard/activities")
+def dashboard_activities():
+    # Fragment for the "Load more" button: the next page of rows, read from the local store only
+    from .versions import data_version
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return "Not logged in", 401
+    with open_store() as db:
+        version, updated_at = data_version(db, athlete_id)
+    etag = make_etag('activity_rows', athlete_id, version, sorted(request.args.items(multi=True)))
+    if is_not_modified(etag, updated_at):
+        return dashboard_validators(not_modified(etag, updated_at))
+    try:
+        date_range = DateRange.from_form(request.args.get('start_date'), request.args.get('end_date'))
+        activity_rows, next_cursor, _ = render_activity_rows(athlete_id, date_range)
+    except ValueError:
+        return "Invalid date range or page cursor.", 400
+
+    response = make_response(activity_rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return dashboard_validators(with_validators(response, etag, updated_at))
+
+
+@web_bp.route("/clubs/<int:club_id>/feed")
+def club_activity_feed(club_id):
+    # Members' activities merged newest first; ?cursor=<next_cursor>&page_size=N
+    from .feed import club_feed, is_member
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    with open_store() as db:
+        if not is_member(db, club_id, athlete_id):
+            return jsonify({"error": "Not a member of this club"}), 403
+        try:
+            page = club_feed(db, club_id, cursor=request.args.get('cursor') or None,
+                             page_size=page_size_arg())
+        except ValueError:
+            return jsonify({"error": "Invalid page cursor"}), 400
+    return jsonify({'activities': page.activities, 'next_cursor': page.next_cursor})
+
+
+@web_bp.route("/activities/near")
+def nearby_activities():
+    # Public activities (and the athlete's own) starting within ?radius= metres of
+    # ?lat=&lng=, newest first; ?mine=1 keeps only the athlete's; ?cursor=&page_size=N
+    from .geo import activities_near
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius = request.args.get('radius', 1000, type=float)
+    if lat is None or lng is None:
+        return jsonify({"error": "lat and lng are required"}), 400
+    with open_store() as db:
+        try:
+            page = activities_near(db, lat, lng, radius, viewer_id=athlete_id,
+                                   user_id=athlete_id if request.args.get('mine') else None,
+                                   cursor=request.args.get('cursor') or None,
+                                   page_size=page_size_arg())
+        except ValueError:
+            return jsonify({"error": "Invalid point, radius or page cursor"}), 400
+    return jsonify({'activities': page.activities, 'next_cursor': page.next_cursor})
+
+
+@web_bp.route("/activities/bbox")
+def activities_in_bounding_box():
+    # Activities starting inside ?bbox=south,west,north,east (degrees), newest first;
+    # same visibility, ?mine=1 and paging as /activities/near
+    from .geo import BoundingBox, activities_in_box
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    with open_store() as db:
+        try:
+            page = activities_in_box(db, BoundingBox.from_string(request.args.get('bbox')),
+                                     viewer_id=athlete_id,
+                                     user_id=athlete_id if request.args.get('mine') else None,
+                                     cursor=request.args.get('cursor') or None,
+                                     page_size=page_size_arg())
+        except ValueError:
+            return jsonify({"error": "Invalid bounding box or page cursor"}), 400
+    return jsonify({'activities': page.activities, 'next_cursor': page.next_cursor})
+
+
+@web_bp.route("/search")
+def search_activities():
+    # Full-text search: ?q=<words, "a phrase", prefix*>&type=activities|challenges|comments,
+    # over the athlete's own data or, with ?club_id=, a club they belong to; best match
+    # first, or newest first with ?order=recent; ?cursor=&page_size=N
+    from .feed import is_member
+    from .search import has_search_index, search
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    club_id = request.args.get('club_id', type=int)
+    with open_store() as db:
+        if not has_search_index(db):
+            return jsonify({"error": "Search is not available on this database"}), 501
+        if club_id is not None and not is_member(db, club_id, athlete_id):
+            return jsonify({"error": "Not a member of this club"}), 403
+        try:
+            page = search(db, request.args.get('type', 'activities'), request.args.get('q'), athlete_id,
+                          club_id=club_id, cursor=request.args.get('cursor') or None,
+                          page_size=page_size_arg(), order=request.args.get('order', 'rank'))
+        except ValueError:
+            return jsonify({"error": "Invalid search, type, order or page cursor"}), 400
+    return jsonify({'results': page.results, 'next_cursor': page.next_cursor})
+
+
+@web_bp.route("/challenges/<int:challenge_id>/leaderboard")
+def challenge_leaderboard(challenge_id):
+    # Top N of a challenge plus the logged-in athlete's standing, from the in-memory leaderboard;
+    # a club's challenge is only shown to the club's members
+    from .feed import is_member
+    from .leaderboard import get_standings
+    from .models import Challenge
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    with open_store() as db:
+        challenge = db.get(Challenge, challenge_id)
+        if challenge is None:
+            return jsonify({"error": "No such challenge"}), 404
+        if challenge.club_id is not None and not is_member(db, challenge.club_id, athlete_id):
+            return jsonify({"error": "Not a member of this club"}), 403
+    standings = get_standings()
+    top = [{'rank': rank, 'athlete_id': user_id, 'score': score}
+           for rank, user_id, score in standings.top(challenge_id, limit)]
+    me = None
+    mine = standings.rank(challenge_id, athlete_id)
+    if mine:
+        me = {'rank': mine[0], 'athlete_id': athlete_id, 'score': mine[1]}
+    return jsonify({'challenge_id': challenge_id, 'top': top, 'me': me})
+
+
+@web_bp.route("/challenges/<int:challenge_id>/join", methods=['POST'])
+def join_challenge(challenge_id):
+    # Enter the logged-in athlete into an open challenge (of a club they belong to),
+    # scoring the qualifying activities they already have
+    from .feed import is_member
+    from .leaderboard import get_standings
+    from .models import Challenge
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    standings = get_standings()
+    with open_store() as db:
+        challenge = db.get(Challenge, challenge_id)
+        if challenge is None:
+            return jsonify({"error": "No such challenge"}), 404
+        if challenge.club_id is not None and not is_member(db, challenge.club_id, athlete_id):
+            return jsonify({"error": "Not a member of this club"}), 403
+        if challenge.complete:
+            return jsonify({"error": "Challenge is complete"}), 409
+        standings.join(db, challenge_id, athlete_id)
+        db.commit()
+    mine = standings.rank(challenge_id, athlete_id)
+    return jsonify({'challenge_id': challenge_id,
+                    'me': {'rank': mine[0], 'athlete_id': athlete_id, 'score': mine[1]}})
+
+
+@web_bp.route("/analytics")
+def activity_analytics():
+    # Pace distribution, speed percentiles, per-sport totals and the training load
+    # curve over the athlete's whole history, computed on NumPy columns; ?days=N
+    from .frames import HAVE_NUMPY
+    from .versions import data_version
+    athlete_id = session.get('athlete_id')
+    if not session.get('access_token') or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    if not HAVE_NUMPY:
+        return jsonify({"error": "Analytics are not installed on this server"}), 501
+    from .analytics import sport_names, summarize
+    days = min(max(request.args.get('days', 90, type=int), 1), 730)
+    with open_store() as db:
+        version, _ = data_version(db, athlete_id)
+        today = date.today()
+        etag = make_etag('analytics', athlete_id, version, days, today)
+        if is_not_modified(etag):
+            return dashboard_validators(not_modified(etag))
+        frame = frame_store().get(db, athlete_id)
+        names = sport_names(db)
+    result = summarize(frame, days, today, names)
+    result['athlete_id'] = athlete_id
+    return dashboard_validators(with_validators(jsonify(result), etag))
+
+
+@web_bp.route("/activities/<int:activity_id>/streams")
+def activity_streams(activity_id):
+    # GPS and sensor streams of one of the athlete's activities, fetched from Strava on
+    # first request and kept as compressed blobs; ?types=latlng,altitude&start=0&end=N
+    # decodes only the blocks covering the requested points
+    import requests
+    from .frames import HAVE_NUMPY
+    from .models import Activity
+    athlete_id = session.get('athlete_id')
+    access_token = current_access_token()
+    if not access_token or not athlete_id:
+        return jsonify({"error": "Not logged in"}), 401
+    if not HAVE_NUMPY:
+        return jsonify({"error": "Streams are not installed on this server"}), 501
+    from .streams import fetch_streams, load_streams, store_streams
+    types = [name for name in request.args.get('types', '').split(',') if name]
+    start = request.args.get('start', 0, type=int)
+    end = request.args.get('end', type=int)
+    with open_store() as db:
+        if db.query(Activity.user_id).filter_by(id=activity_id).scalar() != athlete_id:
+            return jsonify({"error": "Activity not found"}), 404
+        # Recorded streams never change, so the query alone identifies the representation
+        etag = make_etag('streams', activity_id, sorted(request.args.items(multi=True)))
+        if is_not_modified(etag):
+            return dashboard_validators(not_modified(etag))
+        streams = load_streams(db, activity_id)
+        if not streams:
+            try:
+                fetched = fetch_streams(strava(), access_token, activity_id)
+            except requests.RequestException:
+                return jsonify({"error": "Could not fetch streams from Strava"}), 502
+            if fetched:
+                store_streams(db, activity_id, fetched)
+                db.commit()
+                streams = load_streams(db, activity_id)
+    result = {name: view[start:end].tolist() for name, view in streams.items()
+              if not types or name in types}
+    points = max((len(view) for view in streams.values()), default=0)
+    return dashboard_validators(with_validators(
+        jsonify({'activity_id': activity_id, 'points': points, 'streams': result}), etag))
+
+
+@web_bp.route("/logout")
+def logout():
+    access_token = current_access_token()
+    if access_token:
+        # Revoke access token
+        revoke_response = strava().deauthorize(*credentials(), access_token)
+        if revoke_response.status_code != 200:
+            return "Failed to revoke access token"
+
+    # Clear session
+    session.clear()
+    # Redirect user to home page after logout
+    return redirect(url_for(".home"))
@@ -0,0 +1,156 @@
+# webhooks.py :
+
+import logging
+import os
+import queue
+import threading
+
+from flask import Blueprint, jsonify, request
+
+from .cache import athlete_tag, token_tag
+
+# Shared secret given to Strava when creating the push subscription
+VERIFY_TOKEN = os.getenv('STRAVA_VERIFY_TOKEN')
+# Required: events are only accepted for this subscription (the endpoint is public)
+SUBSCRIPTION_ID = os.getenv('STRAVA_SUBSCRIPTION_ID')
+
+# Activity fields Strava reports in `updates` that can be applied without a fetch
+PATCHABLE = {'title', 'type', 'private'}
+
+logger = logging.getLogger(__name__)
+
+webhooks_bp = Blueprint("webhooks", __name__)
+
+
+class EventProcessor:
+    """Applies Strava push events to the local store on a worker thread
+
+    Strava expects the POST to be acknowledged within two seconds, so events
+    are only queued by the request handler.  The Strava client and the
+    local store are loaded with the first processor, not with the blueprint.
+    `credentials` (client id, client secret) refresh the athletes' stored
+    tokens; by default those of the app creating the processor.
+    """
+
+    def __init__(self, client=None, sync=None, credentials=None):
+        from .client import get_client
+        from .config import credentials as app_credentials
+        from .sync import get_sync
+        self.client = client or get_client()
+        self.sync = sync or get_sync()
+        # Captured now: the worker thread runs outside any app context
+        self.credentials = credentials or app_credentials()
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, event):
+        self.queue.put(event)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def join(self):
+        """Block until every queued event has been applied"""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            try:
+                self.apply(event)
+            except Exception:
+                logger.exception("Failed to apply Strava event %s", event)
+            finally:
+                self.queue.task_done()
+
+    def apply(self, event):
+        from .tokens import delete_tokens
+        athlete_id = event['owner_id']
+        if event['object_type'] == 'activity':
+            self._apply_activity(athlete_id, event)
+        elif event['object_type'] == 'athlete':
+            if str(event.get('updates', {}).get('authorized')).lower() == 'false':
+                # The athlete revoked access: forget their tokens
+                delete_tokens(athlete_id)
+        self.invalidate(athlete_id)
+
+    def _apply_activity(self, athlete_id, event):
+        from .ratelimit import BACKGROUND
+        from .tokens import fresh_tokens
+        activity_id = event['object_id']
+        updates = event.get('updates') or {}
+        if event['aspect_type'] == 'update' and updates and set(updates) <= PATCHABLE:
+            # Refused for an activity stored under another athlete
+            if self.sync.patch_activity(activity_id, updates, owner_id=athlete_id):
+                return
+        # New activity, a delete, or a change we can't apply from the event alone:
+        # ask Strava, as the athlete, what the activity looks like now
+        tokens = fresh_tokens(athlete_id, self.client, self.credentials)
+        if tokens is None:
+            logger.info("No stored token for athlete %s, skipping activity %s", athlete_id, activity_id)
+            return
+        response = self.client.get(f"/activities/{activity_id}", tokens.access_token,
+                                   priority=BACKGROUND)
+        if response.status_code == 404:
+            # Gone on Strava too; never touches another athlete's activity
+            self.sync.delete_activity(activity_id, owner_id=athlete_id)
+            return
+        response.raise_for_status()
+        data = response.json()
+        owner = (data.get('athlete') or {}).get('id')
+        if owner is not None and owner != athlete_id:
+            logger.warning("Activity %s belongs to athlete %s, not %s; ignoring event",
+                           activity_id, owner, athlete_id)
+            return
+        self.sync.store_activity(athlete_id, data)
+
+    def invalidate(self, athlete_id):
+        """Drop cached Strava responses for the athlete"""
+        from .tokens import load_tokens
+        cache = self.client.cache
+        if cache is None:
+            return
+        cache.invalidate_tag(athlete_tag(athlete_id))
+        # Entries cached without the athlete (e.g. by the JSON API), whatever their params
+        tokens = load_tokens(athlete_id)
+        if tokens is not None:
+            cache.invalidate_tag(token_tag(tokens.access_token))
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_processor():
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            from .models import init_db
+            # Apps without the web UI haven't created the tables yet
+            init_db()
+            _processor = EventProcessor()
+    return _processor
+
+
+@webhooks_bp.route("/strava/webhook", methods=['GET'])
+def verify_subscription():
+    """Answer Strava's subscription validation handshake"""
+    if request.args.get('hub.mode') != 'subscribe' or not VERIFY_TOKEN or \
+            request.args.get('hub.verify_token') != VERIFY_TOKEN:
+        return jsonify({"error": "Invalid verification request"}), 403
+    return jsonify({"hub.challenge": request.args.get('hub.challenge')})
+
+
+@webhooks_bp.route("/strava/webhook", methods=['POST'])
+def receive_event():
+    """Queue a push event and acknowledge it straight away"""
+    event = request.get_json(silent=True)
+    required = ('object_type', 'object_id', 'aspect_type', 'owner_id')
+    if not event or any(key not in event for key in required):
+        return jsonify({"error": "Malformed event"}), 400
+    if not SUBSCRIPTION_ID or str(event.get('subscription_id')) != SUBSCRIPTION_ID:
+        return jsonify({"error": "Unknown subscription"}), 403
+    get_processor().submit(event)
+    return jsonify({"status": "queued"})
@@ -0,0 +1,152 @@
+# bench_analytics.py :
+#
+# Loads one athlete with 100k activities into a throwaway SQLite database
+# and times the /analytics figures (pace distribution, speed percentiles,
+# per-sport totals, training load) computed on an ActivityFrame against the
+# same figures from a Python loop over row dicts, checking they agree.  Also
+# times loading the frame from the database and from memory-mapped .npy files.
+#
+#   python benchmarks/bench_analytics.py --activities 100000
+
+import argparse
+import math
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import analytics
+from api_clubplus.frames import FRAME_COLUMNS, ActivityFrame, FrameStore
+from api_clubplus.ingest import BulkIngest
+from api_clubplus.models import Activity
+from bench_ingest import fresh_engine, strava_activities
+
+
+def activities(count, seed=7):
+    rng = random.Random(seed)
+    for activity in strava_activities(count, athletes=1, seed=seed):
+        activity['average_speed'] = activity['distance'] / activity['moving_time']
+        activity['max_speed'] = activity['average_speed'] * rng.uniform(1.1, 1.8)
+        yield activity
+
+
+def load_dicts(session, user_id):
+    """What the app did before frames: every row as a dict"""
+    query = select(*(Activity.__table__.c[name] for name in FRAME_COLUMNS
+                     if name != 'start_date_local'), Activity.start_date_local)
+    return [dict(row) for row in session.execute(query.where(Activity.user_id == user_id)).mappings()]
+
+
+def percentile(values, p):
+    # Linear interpolation between closest ranks, as numpy.percentile does
+    rank = (len(values) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def loop_summary(rows, days, today):
+    edges = analytics.PACE_BINS
+    pace_counts = [0] * (len(edges) - 1)
+    speeds = {'avg_speed': [], 'max_speed': []}
+    sports = defaultdict(lambda: [0, 0.0, 0, 0.0])
+    first = today - timedelta(days=days + analytics.CHRONIC_DAYS - 2)
+    daily = defaultdict(float)
+    for row in rows:
+        if row['dist'] > 0:
+            pace = min(max(row['moving_time'] / (row['dist'] / 1000.0), edges[0]), edges[-1])
+            for i in range(len(edges) - 1):
+                if pace < edges[i + 1] or i == len(edges) - 2:
+                    pace_counts[i] += 1
+                    break
+        for column in speeds:
+            if row[column] is not None:
+                speeds[column].append(row[column])
+        totals = sports[row['sport_type_id'] or 0]
+        totals[0] += 1
+        totals[1] += row['dist']
+        totals[2] += row['moving_time']
+        totals[3] += row['total_elevation_gain'] or 0.0
+        day = (row['start_date_local'] or row['start_date']).date()
+        if first <= day <= today:
+            daily[day] += row['moving_time'] / 60.0
+    percentiles = {}
+    for column, values in speeds.items():
+        values.sort()
+        percentiles[column] = {str(p): percentile(values, p) for p in analytics.SPEED_PERCENTILES}
+    load = []
+    for i in range(days):
+        day = today - timedelta(days=days - 1 - i)
+        acute = sum(daily[day - timedelta(days=d)] for d in range(analytics.ACUTE_DAYS)) / analytics.ACUTE_DAYS
+        chronic = sum(daily[day - timedelta(days=d)]
+                      for d in range(analytics.CHRONIC_DAYS)) / analytics.CHRONIC_DAYS
+        load.append({'date': day.isoformat(), 'load': daily[day], 'acute': acute, 'chronic': chronic,
+                     'ratio': acute / chronic if chronic else 0.0})
+    totals = sorted(sports.items(), key=lambda item: -item[1][1])
+    return {
+        'pace_distribution': {'edges': [float(e) for e in edges], 'counts': pace_counts},
+        'speed_percentiles': percentiles,
+        'sport_totals': [{'sport_type_id': sport, 'activities': t[0], 'distance': t[1],
+                          'moving_time': t[2], 'elevation_gain': t[3]} for sport, t in totals],
+        'training_load': load,
+    }
+
+
+def close(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(close(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(close(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def timed(fn, rounds=5):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    engine, _ = fresh_engine()
+    BulkIngest(engine).ingest(activities(args.activities))
+    session = sessionmaker(bind=engine)()
+
+    load_ms, frame = timed(lambda: ActivityFrame.load(session, 1), rounds=3)
+    dicts_ms, rows = timed(lambda: load_dicts(session, 1), rounds=3)
+    store = FrameStore(tempfile.mkdtemp())
+    store.get(session, 1)
+    mmap_ms, mapped = timed(lambda: store.get(session, 1))
+    today = frame['start_date_local'].max().item().date()
+    print(f"{len(frame)} activities")
+    print(f"  load: frame from SQL {load_ms:8.1f} ms, dicts from SQL {dicts_ms:8.1f} ms,"
+          f" frame from .npy mmap {mmap_ms:6.2f} ms")
+
+    loop_ms, expected = timed(lambda: loop_summary(rows, args.days, today), rounds=1)
+    for label, source in (('in memory', frame), ('mmap', mapped)):
+        numpy_ms, result = timed(lambda: analytics.summarize(source, args.days, today))
+        for row in result['sport_totals']:
+            del row['sport_type']
+        for key in expected:
+            assert close(result[key], expected[key]), key
+        print(f"  analytics: dict loop {loop_ms:8.1f} ms, NumPy ({label}) {numpy_ms:6.1f} ms"
+              f"  ({loop_ms / numpy_ms:.0f}x)")
+
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# bench_client.py :
+#
+# Compares one-off requests.get calls (new connection per call, as the apps
+# used to do) against the pooled StravaClient, using the local mock server
+# with a simulated handshake delay.
+#
+#   python benchmarks/bench_client.py --calls 200 --handshake-delay 0.03
+
+import argparse
+import statistics
+import time
+
+import requests
+
+from api_clubplus.client import StravaClient
+from mock_strava import MockStrava
+
+
+def timed(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = fn()
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples, server):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<16} mean {statistics.mean(samples) * 1000:7.2f} ms"
+          f"  p50 {statistics.median(samples) * 1000:7.2f} ms"
+          f"  p95 {p95 * 1000:7.2f} ms"
+          f"  connections {server.connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--handshake-delay', type=float, default=0.03,
+                        help='seconds charged per new TCP connection')
+    args = parser.parse_args()
+
+    server = MockStrava(handshake_delay=args.handshake_delay).start()
+    url = f"{server.url}/api/v3/athlete"
+    headers = {'Authorization': 'Bearer mock-access-token'}
+
+    report('requests.get', timed(lambda: requests.get(url, headers=headers), args.calls), server)
+
+    server.reset_counters()
+    client = StravaClient(api_url=f"{server.url}/api/v3")
+    report('StravaClient', timed(lambda: client.get('/athlete', 'mock-access-token'), args.calls), server)
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
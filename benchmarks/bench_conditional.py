@@ -0,0 +1,91 @@
+# bench_conditional.py :
+#
+# Conditional requests on both hops.  Upstream: revalidating an expired
+# /athlete/activities cache entry with If-None-Match (Strava answers 304)
+# against downloading and parsing the page again.  Downstream: api.py's
+# /activities answered 200 with the full JSON against 304 Not Modified for
+# a client that already holds it.
+#
+#   python benchmarks/bench_conditional.py --activities 200 --rounds 200
+
+import argparse
+import os
+import tempfile
+import time
+
+from mock_strava import MockStrava
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault('STRAVA_CACHE_PATH', os.path.join(workdir, 'cache.db'))
+os.environ.setdefault('STRAVA_RATELIMIT_PATH', os.path.join(workdir, 'ratelimit.db'))
+
+TOKEN = 'mock-access-token'
+
+
+def revalidate(client, key, params, rounds, conditional):
+    """Time cached_get on an entry that has just expired"""
+    elapsed = 0.0
+    for _ in range(rounds):
+        entry = client.cache.get(key)
+        entry.stored_at = 0
+        if not conditional:
+            entry.etag = None
+        start = time.perf_counter()
+        response = client.cached_get('/athlete/activities', TOKEN, params)
+        response.json()
+        elapsed += time.perf_counter() - start
+    return elapsed / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    server = MockStrava(activity_count=args.activities, rate_limit=(10 ** 6, 10 ** 6)).start()
+    os.environ['STRAVA_URL'] = server.url
+
+    from api_clubplus.cache import TieredCache, cache_key
+    from api_clubplus.client import StravaClient
+
+    client = StravaClient(api_url=f"{server.url}/api/v3", cache=TieredCache())
+    params = {'per_page': args.activities}
+    key = cache_key(TOKEN, '/athlete/activities', params)
+    first = client.cached_get('/athlete/activities', TOKEN, params)
+    assert first.headers.get('ETag')
+
+    server.reset_counters()
+    full_ms = revalidate(client, key, params, args.rounds, conditional=False)
+    assert server.not_modified == 0
+    server.reset_counters()
+    conditional_ms = revalidate(client, key, params, args.rounds, conditional=True)
+    assert server.not_modified == args.rounds
+    # A 304 keeps the body (and our ETag of it) and restarts the TTL
+    assert client.cached_get('/athlete/activities', TOKEN, params).etag == first.etag
+    print(f"upstream, {args.activities} activities per page:")
+    print(f"  full download {full_ms:6.2f} ms, revalidated with 304 {conditional_ms:6.2f} ms per expired entry")
+    client.close()
+
+    from api import app
+
+    http = app.test_client()
+    url = '/activities'
+    bearer = {'Authorization': f'Bearer {TOKEN}'}
+    response = http.get(url, headers=bearer)
+    etag = response.headers['ETag']
+    size = len(response.data)
+    timings = {}
+    for label, headers in (('200', bearer), ('304', dict(bearer, **{'If-None-Match': etag}))):
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            response = http.get(url, headers=headers)
+            assert response.status_code == int(label)
+        timings[label] = (time.perf_counter() - start) / args.rounds * 1000
+    print("downstream /activities (first page):")
+    print(f"  200 with {size} bytes {timings['200']:6.2f} ms, 304 with 0 bytes {timings['304']:6.2f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# bench_fanout.py :
+#
+# Dashboard data gathering, sequential vs concurrent, against the mock
+# server with an injected per-request delay.  The "sequential" column is the
+# old dashboard behaviour (/athlete, then /athlete/activities).
+#
+#   python benchmarks/bench_fanout.py --latency 0.1 --rounds 20
+
+import argparse
+import statistics
+import time
+
+from api_clubplus.client import StravaClient
+from api_clubplus.fanout import gather
+from mock_strava import MockStrava
+
+
+def sequential(client):
+    athlete = client.get('/athlete', 'mock-access-token')
+    activities = client.get('/athlete/activities', 'mock-access-token')
+    return athlete, activities
+
+
+def concurrent(client):
+    return gather(
+        lambda: client.get('/athlete', 'mock-access-token'),
+        lambda: client.get('/athlete/activities', 'mock-access-token'),
+    )
+
+
+def measure(fn, client, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for response in fn(client):
+            response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='seconds of delay injected into every upstream request')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    server = MockStrava(latency=args.latency).start()
+    client = StravaClient(api_url=f"{server.url}/api/v3")
+    # Warm the pool so both variants start with open connections
+    concurrent(client)
+
+    print(f"upstream latency {args.latency * 1000:.0f} ms, {args.rounds} rounds")
+    for label, fn in (('sequential', sequential), ('concurrent', concurrent)):
+        samples = measure(fn, client, args.rounds)
+        print(f"{label:<12} mean {statistics.mean(samples) * 1000:7.1f} ms"
+              f"  p50 {statistics.median(samples) * 1000:7.1f} ms"
+              f"  max {max(samples) * 1000:7.1f} ms")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
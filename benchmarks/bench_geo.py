@@ -0,0 +1,104 @@
+# bench_geo.py :
+#
+# Loads activities starting around a handful of cities into a throwaway
+# SQLite database and times a page of "activities in this box" and
+# "activities near this point" three ways: through the activity_geo R*Tree,
+# through the (start_lat, start_lng) index alone, and by parsing every
+# row's start_latlng string as the app had to before the numeric columns.
+# The indexed answers are checked against the full scan.
+#
+#   python benchmarks/bench_geo.py --activities 1000000
+
+import argparse
+import random
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import geo
+from api_clubplus.ingest import BulkIngest
+from api_clubplus.models import Activity
+from bench_ingest import fresh_engine, strava_activities
+
+CITIES = [(51.5074, -0.1278), (48.8566, 2.3522), (40.7128, -74.0060), (-33.8688, 151.2093),
+          (35.6762, 139.6503), (52.5200, 13.4050), (37.7749, -122.4194), (-36.8485, 174.7633)]
+PAGE = 50
+
+
+def activities(count, seed=11):
+    rng = random.Random(seed)
+    for activity in strava_activities(count, seed=seed):
+        lat, lng = rng.choice(CITIES)
+        # Most activities start within ~20 km of a city centre
+        start = [round(lat + rng.gauss(0, 0.1), 7), round(lng + rng.gauss(0, 0.15), 7)]
+        activity['start_latlng'] = start
+        activity['end_latlng'] = start
+        activity['private'] = rng.random() < 0.1
+        yield activity
+
+
+def scan(session, box=None, near=None):
+    """Every row's coordinates parsed in Python, filtered and sorted: the pre-index baseline"""
+    matches = []
+    query = select(Activity.id, Activity.start_date, Activity.start_latlng).where(Activity.private.is_(False))
+    for activity_id, start_date, latlng in session.execute(query):
+        if not latlng:
+            continue
+        lat, lng = (float(part) for part in latlng.split(','))
+        if box is not None and not (box.south <= lat <= box.north and box.west <= lng <= box.east):
+            continue
+        if near is not None and geo.distance(near[0], near[1], lat, lng) > near[2]:
+            continue
+        matches.append((start_date, activity_id))
+    matches.sort(reverse=True)
+    return [activity_id for _, activity_id in matches[:PAGE]]
+
+
+def timed(fn, rounds=5):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=1000000)
+    args = parser.parse_args()
+
+    engine, _ = fresh_engine()
+    start = time.perf_counter()
+    BulkIngest(engine).ingest(activities(args.activities))
+    print(f"{args.activities} activities ingested in {time.perf_counter() - start:.1f} s")
+    session = sessionmaker(bind=engine)()
+    assert geo.has_rtree(session), "SQLite build without R*Tree"
+
+    # A box over central London, about 4 x 3 km, and everything within 2 km of Trafalgar Square
+    box = geo.BoundingBox(51.49, -0.15, 51.52, -0.09)
+    near = (51.5080, -0.1281, 2000)
+    cases = (
+        ('bbox', lambda: geo.activities_in_box(session, box, page_size=PAGE), {'box': box}),
+        ('near 2 km', lambda: geo.activities_near(session, *near, page_size=PAGE), {'near': near}),
+    )
+    key = str(engine.url)
+    for label, query, scan_args in cases:
+        geo._rtree[key] = True
+        rtree_ms, page = timed(query)
+        geo._rtree[key] = False
+        btree_ms, btree_page = timed(query)
+        geo._rtree[key] = True
+        scan_ms, expected = timed(lambda: scan(session, **scan_args), rounds=1)
+        ids = [activity['id'] for activity in page.activities]
+        assert ids == expected == [activity['id'] for activity in btree_page.activities], label
+        print(f"  {label:9}: R*Tree {rtree_ms:7.2f} ms, lat/lng index {btree_ms:7.2f} ms,"
+              f" parse every row {scan_ms:8.1f} ms  ({scan_ms / rtree_ms:.0f}x)")
+
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# bench_ingest.py :
+#
+# Measures bulk ingest throughput (rows/sec) of Strava activity JSON into a
+# throwaway SQLite database at several sizes, for a first load and for a
+# re-ingest of the same activities (every row hits ON CONFLICT), and compares
+# against per-row ORM merges on the smallest size.
+#
+#   python benchmarks/bench_ingest.py --sizes 10000 100000 1000000 --batch-size 5000
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.ingest import BulkIngest, activity_values
+from api_clubplus.models import Activity, init_db
+
+SPORTS = ['Run', 'Ride', 'Swim', 'Walk', 'Hike', 'VirtualRide', 'TrailRun']
+
+
+def strava_activities(count, athletes=500, seed=42):
+    """Synthetic Strava activity JSON for a club of `athletes`"""
+    rng = random.Random(seed)
+    epoch = datetime(2015, 1, 1)
+    span = int(timedelta(days=365 * 9).total_seconds())
+    # A pool of start times keeps generation cheap next to the ingest being measured
+    starts = [(epoch + timedelta(seconds=rng.randint(0, span))).strftime('%Y-%m-%dT%H:%M:%SZ')
+              for _ in range(10000)]
+    for activity_id in range(1, count + 1):
+        start = rng.choice(starts)
+        sport = rng.choice(SPORTS)
+        yield {
+            'id': activity_id,
+            'athlete': {'id': rng.randint(1, athletes)},
+            'name': f'{sport} {activity_id}',
+            'type': sport,
+            'sport_type': sport,
+            'distance': rng.uniform(1000, 40000),
+            'moving_time': rng.randint(600, 10000),
+            'elapsed_time': rng.randint(600, 12000),
+            'total_elevation_gain': rng.uniform(0, 800),
+            'start_date': start,
+            'start_date_local': start,
+            'timezone': '(GMT+00:00) UTC',
+            'start_latlng': [51.5, -0.12],
+            'end_latlng': [51.5, -0.12],
+            'average_speed': 3.2,
+            'max_speed': 4.1,
+            'private': False,
+            'kudos_count': rng.randint(0, 20),
+        }
+
+
+def fresh_engine():
+    path = os.path.join(tempfile.mkdtemp(), 'bench_ingest.db')
+    engine = create_engine(f'sqlite:///{path}')
+    init_db(engine)
+    return engine, path
+
+
+def rate(count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return count / elapsed, elapsed
+
+
+def orm_merge(engine, activities):
+    """The per-row ORM path bulk ingest replaces"""
+    with sessionmaker(bind=engine)() as session:
+        for data in activities:
+            session.merge(Activity(**activity_values(data, None, data['athlete']['id'])))
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"batch size {args.batch_size}")
+    for size in args.sizes:
+        engine, path = fresh_engine()
+        ingest = BulkIngest(engine, batch_size=args.batch_size)
+        first, elapsed = rate(size, lambda: ingest.ingest(strava_activities(size)))
+        again, _ = rate(size, lambda: ingest.ingest(strava_activities(size)))
+        with engine.connect() as conn:
+            stored = conn.execute(select(func.count()).select_from(Activity)).scalar()
+        assert stored == size, (stored, size)
+        print(f"  {size:>9} activities: {first:9.0f} rows/s first load ({elapsed:.1f} s),"
+              f" {again:9.0f} rows/s re-ingest")
+        engine.dispose()
+        os.remove(path)
+
+    size = min(args.sizes)
+    engine, path = fresh_engine()
+    baseline, elapsed = rate(size, lambda: orm_merge(engine, strava_activities(size)))
+    print(f"  ORM merge baseline at {size}: {baseline:9.0f} rows/s ({elapsed:.1f} s)")
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
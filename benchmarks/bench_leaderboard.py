@@ -0,0 +1,126 @@
+# bench_leaderboard.py :
+#
+# Times the challenge leaderboard engine with 100k participants: score
+# updates, top-N and "my rank" against re-sorting every participant, then
+# runs qualifying activities through BulkIngest into a challenge stored in a
+# throwaway SQLite database and checks the in-memory standings against the
+# persisted scores.
+#
+#   python benchmarks/bench_leaderboard.py --participants 100000 --updates 20000
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.ingest import BulkIngest
+from api_clubplus.leaderboard import ChallengeStandings, Leaderboard
+from api_clubplus.models import Challenge, Leadership, SportType, init_db, user_challenge_table
+
+
+def per_op(fn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def resort_rank(scores, user_id):
+    """What the stub would need: sort everyone, then find the user"""
+    ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return next(i for i, (u, _) in enumerate(ordered) if u == user_id) + 1
+
+
+def bench_memory(participants, updates, rng):
+    start = time.perf_counter()
+    board = Leaderboard(1, ((user_id, rng.uniform(0, 500000)) for user_id in range(1, participants + 1)))
+    print(f"  built board of {participants} in {time.perf_counter() - start:.2f} s")
+    users = [rng.randint(1, participants) for _ in range(updates)]
+    gains = [rng.uniform(1000, 40000) for _ in range(updates)]
+    update_us = per_op(lambda i: board.set(users[i], board.scores[users[i]] + gains[i]), updates)
+    rank_us = per_op(lambda i: board.rank(users[i]), updates)
+    top_us = per_op(lambda i: board.top(10), updates)
+    resort_us = per_op(lambda i: resort_rank(board.scores, users[i]), 20)
+    print(f"  score update {update_us:8.1f} us, my rank {rank_us:6.1f} us, top 10 {top_us:6.1f} us")
+    print(f"  re-sort baseline for one rank: {resort_us / 1000:8.1f} ms")
+
+    # Ranks must agree with a full sort, ties included
+    ordered = sorted(board.scores.values(), reverse=True)
+    for user_id in rng.sample(range(1, participants + 1), 200):
+        score = board.scores[user_id]
+        assert board.rank(user_id) == ordered.index(score) + 1
+    assert [s for _, _, s in board.top(100)] == ordered[:100]
+
+
+def bench_ingest(participants, activities, rng):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_leaderboard.db')
+    engine = create_engine(f'sqlite:///{path}')
+    init_db(engine)
+    session_factory = sessionmaker(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(SportType.__table__.insert(), [{'id': 1, 'name': 'Run'}])
+        conn.execute(Challenge.__table__.insert(), [{
+            'id': 1, 'name': 'January distance', 'activity_type': 'Run', 'metric': 'distance',
+            'start_date': datetime(2024, 1, 1), 'start_time': datetime(2024, 1, 1),
+            'end_date': datetime(2024, 1, 31), 'end_time': datetime(2024, 1, 31, 23, 59, 59),
+            'complete': False,
+        }])
+        conn.execute(user_challenge_table.insert(),
+                     [{'user_id': u, 'challenge_id': 1} for u in range(1, participants + 1)])
+        conn.execute(Leadership.__table__.insert(),
+                     [{'challenge_id': 1, 'user_id': u, 'score': 0.0, 'activity_count': 0}
+                      for u in range(1, participants + 1)])
+
+    standings = ChallengeStandings(session_factory, flush_interval=None)
+    start = time.perf_counter()
+    standings.board(1)
+    print(f"  loaded board of {participants} from the database in {time.perf_counter() - start:.2f} s")
+
+    batch = [{
+        'id': i, 'athlete': {'id': rng.randint(1, participants)}, 'name': f'Run {i}',
+        'type': 'Run', 'sport_type': 'Run', 'distance': rng.uniform(1000, 40000),
+        'moving_time': 1800, 'elapsed_time': 1900,
+        'start_date': f'2024-01-{rng.randint(1, 31):02d}T07:00:00Z',
+    } for i in range(1, activities + 1)]
+    start = time.perf_counter()
+    BulkIngest(engine, batch_size=1000, standings=standings).ingest(batch)
+    elapsed = time.perf_counter() - start
+    print(f"  ingested {activities} qualifying activities in {elapsed:.2f} s"
+          f" ({activities / elapsed:.0f} rows/s, standings included)")
+
+    with session_factory() as session:
+        stored = dict(session.execute(select(Leadership.user_id, Leadership.score)).all())
+    board = standings.board(1)
+    assert all(abs(board.scores[u] - score) < 1e-6 for u, score in stored.items())
+    start = time.perf_counter()
+    written = standings.flush_ranks(1)
+    print(f"  in-memory standings match persisted scores; flushed {written} ranks"
+          f" in {time.perf_counter() - start:.2f} s")
+    with session_factory() as session:
+        leader = session.scalars(select(Leadership).where(Leadership.rank == 1)).first()
+        assert leader.user_id == standings.top(1, 1)[0][1]
+    engine.dispose()
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--participants', type=int, default=100000)
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--activities', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    print("in-memory engine:")
+    bench_memory(args.participants, args.updates, rng)
+    print("through bulk ingest:")
+    bench_ingest(args.participants, args.activities, rng)
+
+
+if __name__ == '__main__':
+    main()
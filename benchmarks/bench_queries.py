@@ -0,0 +1,122 @@
+# bench_queries.py :
+#
+# Builds a throwaway SQLite database with N activities spread over many
+# athletes, checks with EXPLAIN QUERY PLAN that the range/sport/user lookups
+# in api_clubplus.queries use the composite indexes, and times them against
+# the same query forced to a full table scan.
+#
+#   python benchmarks/bench_queries.py --activities 1000000 --users 1000
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import queries
+from api_clubplus.models import Activity, Comment, SportType, init_db, user_activity_table
+
+SPORTS = ['Run', 'Ride', 'Swim', 'Walk', 'Hike']
+BATCH = 50000
+
+
+def populate(engine, activities, users):
+    rng = random.Random(42)
+    epoch = datetime(2015, 1, 1)
+    span = int(timedelta(days=365 * 9).total_seconds())
+    with engine.begin() as conn:
+        conn.execute(SportType.__table__.insert(),
+                     [{'id': i + 1, 'name': name} for i, name in enumerate(SPORTS)])
+        for offset in range(0, activities, BATCH):
+            rows, links = [], []
+            for activity_id in range(offset + 1, min(offset + BATCH, activities) + 1):
+                user_id = rng.randint(1, users)
+                rows.append({
+                    'id': activity_id, 'user_id': user_id, 'name': f'Activity {activity_id}',
+                    'dist': rng.uniform(1000, 40000), 'moving_time': rng.randint(600, 10000),
+                    'elapsed_time': rng.randint(600, 12000),
+                    'sport_type_id': rng.randint(1, len(SPORTS)),
+                    'start_date': epoch + timedelta(seconds=rng.randint(0, span)),
+                    'private': False, 'likes': 0,
+                })
+                links.append({'user_id': user_id, 'activity_id': activity_id})
+            conn.execute(Activity.__table__.insert(), rows)
+            conn.execute(user_activity_table.insert(), links)
+
+
+def timed(session, fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def assert_plan(session, query, index):
+    plan = queries.explain(session, query)
+    joined = ' | '.join(plan)
+    assert any(index in step for step in plan), f"{index} not used: {joined}"
+    assert not any(step.startswith('SCAN activities') for step in plan), f"full scan: {joined}"
+    assert not any('TEMP B-TREE' in step for step in plan), f"sort not served by index: {joined}"
+    print(f"  plan ok ({index}): {joined}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_queries.db')
+    engine = create_engine(f'sqlite:///{path}')
+    init_db(engine)
+    start = time.perf_counter()
+    populate(engine, args.activities, args.users)
+    print(f"populated {args.activities} activities in {time.perf_counter() - start:.1f} s")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    session = sessionmaker(bind=engine)()
+    user_id = 7
+    month_start, month_end = datetime(2020, 3, 1), datetime(2020, 4, 1)
+    run = queries.sport_type_id(session, 'Run')
+
+    print("query plans:")
+    assert_plan(session, queries.activities_query(user_id, month_start, month_end),
+                'ix_activities_user_start')
+    assert_plan(session, queries.activities_query(user_id, month_start, month_end, run),
+                'ix_activities_user_sport_start')
+    assert_plan(session, queries.activities_query(user_id), 'ix_activities_user_start')
+    plan = queries.explain(session, select(user_activity_table.c.user_id)
+                           .where(user_activity_table.c.activity_id == 123))
+    assert any('ix_user_activity_activity_id' in step for step in plan), plan
+    plan = queries.explain(session, select(Comment.id).where(Comment.user_id == user_id))
+    assert any('ix_comments_user_id' in step for step in plan), plan
+    print("  association / comment lookups use their indexes")
+
+    print(f"median latency over {args.rounds} rounds:")
+    cases = [
+        ('user, last month', lambda: queries.activities_in_range(session, user_id, month_start, month_end)),
+        ('user runs, last month', lambda: queries.activities_in_range(session, user_id, month_start, month_end, run)),
+        ('user, latest 30', lambda: queries.activities_in_range(session, user_id, limit=30)),
+        ('full scan baseline', lambda: session.execute(text(
+            "SELECT * FROM activities NOT INDEXED WHERE user_id = :u"
+            " AND start_date >= :s AND start_date < :e ORDER BY start_date DESC, id DESC"),
+            {'u': user_id, 's': str(month_start), 'e': str(month_end)}).fetchall()),
+    ]
+    for label, fn in cases:
+        print(f"  {label:<24} {timed(session, fn, args.rounds):9.3f} ms")
+
+    session.close()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# bench_render.py :
+#
+# Renders the dashboard activity table at 1k and 10k rows three ways: the
+# old per-row filters (strptime/strftime and humanize on every view), the
+# display fields precomputed at ingest, and a fragment cache hit.
+#
+#   python benchmarks/bench_render.py --rows 1000 10000
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'render.db')}")
+os.environ.setdefault('STRAVA_CACHE_PATH', os.path.join(workdir, 'cache.db'))
+os.environ.setdefault('STRAVA_RATELIMIT_PATH', os.path.join(workdir, 'ratelimit.db'))
+
+from flask import render_template  # noqa: E402
+
+from api_clubplus.cache import CacheEntry, MemoryCache  # noqa: E402
+from api_clubplus.ingest import activity_values  # noqa: E402
+from api_clubplus.queries import activity_to_dict  # noqa: E402
+from app import app  # noqa: E402
+from mock_strava import make_activity  # noqa: E402
+
+
+class Row:
+    """Stands in for a loaded Activity"""
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    cache = MemoryCache()
+    with app.test_request_context('/dashboard'):
+        for count in args.rows:
+            stored = [Row(activity_values(make_activity(i), 1, 1)) for i in range(1, count + 1)]
+            raw = [activity_to_dict(row, 'Run') for row in stored]
+            display = [activity_to_dict(row, 'Run', display=True) for row in stored]
+
+            def render_cached():
+                entry = cache.get(count)
+                if entry is None:
+                    html = render_template('_activity_rows.html', activities=display)
+                    cache.set(count, CacheEntry(html, time.time()))
+
+            render_cached()
+            filters_ms = timed(lambda: render_template('_activity_rows.html', activities=raw), args.rounds)
+            display_ms = timed(lambda: render_template('_activity_rows.html', activities=display), args.rounds)
+            cached_ms = timed(render_cached, args.rounds)
+            print(f"  {count:>6} rows: per-row filters {filters_ms:8.1f} ms,"
+                  f" precomputed {display_ms:7.1f} ms, fragment cache hit {cached_ms:6.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# bench_rollups.py :
+#
+# Loads one athlete's history at several lengths through BulkIngest (which
+# maintains the weekly/monthly rollups), then times the dashboard summary
+# read from the rollups against the same totals aggregated from raw
+# activities.  Also applies random updates and deletes and checks the
+# incrementally maintained rollups match a full rebuild.
+#
+#   python benchmarks/bench_rollups.py --sizes 1000 10000 100000
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import rollups
+from api_clubplus.ingest import BulkIngest
+from api_clubplus.models import Activity, ActivityRollup, init_db
+from api_clubplus.sync import ActivitySync
+from bench_ingest import strava_activities
+
+TODAY = date(2024, 1, 1)
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def raw_totals(session, user_id):
+    """What the summary costs without rollups: aggregate the whole history"""
+    return session.execute(
+        select(Activity.sport_type_id, func.count(), func.sum(Activity.dist),
+               func.sum(Activity.moving_time), func.sum(Activity.total_elevation_gain))
+        .where(Activity.user_id == user_id)
+        .group_by(func.strftime('%Y-%W', Activity.start_date_local), Activity.sport_type_id)
+    ).all()
+
+
+def snapshot(session):
+    return sorted(
+        (r.user_id, r.period, r.period_start, r.sport_type_id, r.activity_count,
+         round(r.distance, 3), r.moving_time, round(r.elevation_gain, 3))
+        for r in session.scalars(select(ActivityRollup))
+    )
+
+
+def check_consistency(engine, session_factory, size, rng):
+    activities = list(strava_activities(size, athletes=3, seed=7))
+    ingest = BulkIngest(engine, batch_size=500)
+    ingest.ingest(activities)
+    # Re-ingest a sample with new distances, dates and sports
+    changed = []
+    for data in rng.sample(activities, size // 10):
+        data = dict(data, distance=data['distance'] * 2, sport_type='Ride', type='Ride',
+                    start_date_local='2016-06-01T08:00:00Z')
+        changed.append(data)
+    ingest.ingest(changed)
+    sync = ActivitySync(client=object(), session_factory=session_factory, background_backfill=False)
+    for data in rng.sample(activities, size // 20):
+        sync.delete_activity(data['id'])
+    for data in rng.sample(activities, size // 20):
+        sync.patch_activity(data['id'], {'type': 'Swim'})
+
+    with session_factory() as session:
+        incremental = snapshot(session)
+    with engine.begin() as conn:
+        rollups.rebuild(conn)
+    with session_factory() as session:
+        rebuilt = snapshot(session)
+    assert incremental == rebuilt, "incremental rollups drifted from a rebuild"
+    print(f"  incremental rollups match a rebuild after updates/deletes ({len(rebuilt)} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for size in args.sizes:
+        path = os.path.join(tempfile.mkdtemp(), 'bench_rollups.db')
+        engine = create_engine(f'sqlite:///{path}')
+        init_db(engine)
+        BulkIngest(engine).ingest(strava_activities(size, athletes=1))
+        session = sessionmaker(bind=engine)()
+        rollup_ms = timed(lambda: (rollups.summary(session, 1, 'week', 4, TODAY),
+                                   rollups.summary(session, 1, 'month', 6, TODAY)), args.rounds)
+        raw_ms = timed(lambda: raw_totals(session, 1), args.rounds)
+        print(f"  {size:>7} activities: summary from rollups {rollup_ms:7.3f} ms,"
+              f" aggregated from activities {raw_ms:8.3f} ms")
+        session.close()
+        engine.dispose()
+        os.remove(path)
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_rollups_check.db')
+    engine = create_engine(f'sqlite:///{path}')
+    init_db(engine)
+    check_consistency(engine, sessionmaker(bind=engine), 5000, rng)
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# bench_search.py :
+#
+# Fills a throwaway SQLite database with activities and comments drawn from
+# a Zipf-distributed vocabulary (so some words are in most rows and some in
+# a handful), letting the FTS5 triggers index them on the way in.  Then
+# times a page of search results (best match first and newest first) for
+# common, rare, prefix and phrase queries over one athlete's data and over
+# a club, against the LIKE '%...%' queries that were the only option before.
+#
+#   python benchmarks/bench_search.py --activities 1000000 --comments 5000000
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.models import Activity, Club, Comment, User, user_club_table
+from api_clubplus.search import has_search_index, search
+from bench_ingest import fresh_engine
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'be', 'do', 'fa', 'gu', 'hi', 'ja', 'ze', 'po']
+BATCH = 50000
+PAGE = 20
+CLUB_MEMBERS = 200
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda _: rng.random())
+
+
+class Text:
+    def __init__(self, words, rng):
+        self.words = words
+        self.rng = rng
+        self.cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+
+    def sentence(self, low, high):
+        return ' '.join(self.rng.choices(self.words, cum_weights=self.cum_weights,
+                                         k=self.rng.randint(low, high)))
+
+
+def fill(engine, activities, comments, athletes, text, rng):
+    epoch = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'id': i, 'first_name': 'A', 'last_name': str(i),
+                                     'created_at': epoch, 'updated_at': epoch}
+                                    for i in range(1, athletes + 1)])
+        conn.execute(insert(Club), [{'id': 1, 'name': 'Bench club', 'admin_id': 1, 'verified': True}])
+        conn.execute(insert(user_club_table), [{'user_id': i, 'club_id': 1}
+                                               for i in range(1, CLUB_MEMBERS + 1)])
+    for start in range(0, activities, BATCH):
+        with engine.begin() as conn:
+            conn.execute(insert(Activity), [{
+                'id': i, 'user_id': rng.randint(1, athletes), 'name': text.sentence(2, 6),
+                'dist': 5000.0, 'moving_time': 1500, 'elapsed_time': 1600,
+                'start_date': epoch + timedelta(minutes=i), 'private': rng.random() < 0.1, 'likes': 0,
+            } for i in range(start + 1, min(start + BATCH, activities) + 1)])
+    for start in range(0, comments, BATCH):
+        with engine.begin() as conn:
+            conn.execute(insert(Comment), [{
+                'id': i, 'user_id': rng.randint(1, athletes), 'comment': text.sentence(5, 15),
+                'created_at': epoch + timedelta(minutes=i),
+            } for i in range(start + 1, min(start + BATCH, comments) + 1)])
+
+
+def like_query(kind, word, user_id, club_id):
+    """The LIKE scan equivalent of a search, unranked"""
+    model, column = (Activity, Activity.name) if kind == 'activities' else (Comment, Comment.comment)
+    query = select(model.id).where(column.like(f'%{word}%'))
+    if club_id is None:
+        query = query.where(model.user_id == user_id)
+    else:
+        members = select(user_club_table.c.user_id).where(user_club_table.c.club_id == club_id)
+        query = query.where(model.user_id.in_(members))
+        if model is Activity:
+            query = query.where(Activity.private.is_(False))
+    return query.limit(PAGE)
+
+
+def timed(fn, rounds=5):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=1000000)
+    parser.add_argument('--comments', type=int, default=5000000)
+    parser.add_argument('--athletes', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    text = Text(vocabulary(args.words, rng), rng)
+    engine, _ = fresh_engine()
+    start = time.perf_counter()
+    fill(engine, args.activities, args.comments, args.athletes, text, rng)
+    print(f"{args.activities} activities and {args.comments} comments written and indexed"
+          f" in {time.perf_counter() - start:.1f} s")
+    session = sessionmaker(bind=engine)()
+    assert has_search_index(session), "SQLite build without FTS5"
+
+    # The busiest athlete in the club, so the "mine" searches have the most to sift through
+    user_id = session.execute(select(Comment.user_id).where(Comment.user_id <= CLUB_MEMBERS)
+                              .group_by(Comment.user_id).order_by(func.count().desc()).limit(1)).scalar()
+    common, middling, rare = text.words[0], text.words[100], text.words[5000]
+    phrase = ' '.join(session.get(Comment, 1).comment.split()[:2])
+    queries = [
+        ('common word', common, common),
+        ('mid word', middling, middling),
+        ('rare word', rare, rare),
+        ('prefix', middling[:3] + '*', middling[:3]),
+        ('phrase', f'"{phrase}"', phrase),
+    ]
+    for kind in ('activities', 'comments'):
+        for scope, club_id in (('mine', None), ('club', 1)):
+            print(f"  {kind}, {scope}:")
+            for label, query, like in queries:
+                ranked_ms, page = timed(lambda: search(session, kind, query, user_id, club_id=club_id,
+                                                       page_size=PAGE))
+                recent_ms, _ = timed(lambda: search(session, kind, query, user_id, club_id=club_id,
+                                                    page_size=PAGE, order='recent'))
+                like_ms, _ = timed(lambda: session.execute(like_query(kind, like, user_id, club_id)).all(),
+                                   rounds=1)
+                print(f"    {label:11}: FTS5 ranked {ranked_ms:7.2f} ms, newest first {recent_ms:6.2f} ms"
+                      f" ({len(page.results):2} hits), LIKE {like_ms:8.1f} ms")
+
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
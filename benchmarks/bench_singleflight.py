@@ -0,0 +1,56 @@
+# bench_singleflight.py :
+#
+# Fires bursts of identical concurrent cached GETs (many tabs opening the
+# dashboard at once) at the mock server and reports how many upstream calls
+# were actually made and the coalescing ratio.
+#
+#   python benchmarks/bench_singleflight.py --threads 50 --bursts 5 --latency 0.1
+
+import argparse
+import threading
+import time
+
+from api_clubplus.cache import TieredCache
+from api_clubplus.client import StravaClient
+from mock_strava import MockStrava
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = MockStrava(latency=args.latency, rate_limit=(10 ** 6, 10 ** 6)).start()
+    client = StravaClient(api_url=f"{server.url}/api/v3", pool_maxsize=args.threads)
+
+    start = time.perf_counter()
+    for burst in range(args.bursts):
+        # A fresh cache per burst so every burst is a cold miss
+        client.cache = TieredCache()
+        barrier = threading.Barrier(args.threads)
+
+        def worker():
+            barrier.wait()
+            client.cached_get('/athlete', 'mock-access-token').json()
+            client.cached_get('/athlete/activities', 'mock-access-token').json()
+
+        threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = client.flights.stats()
+    print(f"{args.bursts} bursts x {args.threads} threads x 2 endpoints in {elapsed:.2f} s")
+    print(f"upstream calls {server.api_requests} for {stats['requests']} requests "
+          f"(coalescing ratio {stats['coalescing_ratio']:.3f})")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# bench_startup.py :
+#
+# Starts each app the way a fresh worker would, in a new interpreter every
+# round: times the import that builds the app and its first request, and
+# lists which heavy dependencies were loaded by then.  create_app defers
+# SQLAlchemy, humanize and NumPy to the first request that needs them, so
+# this fails if any of them is imported while an app is being built, or if
+# a build takes longer than --budget milliseconds.
+#
+#   python benchmarks/bench_startup.py --rounds 10
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('sqlalchemy', 'humanize', 'numpy', 'requests')
+# None of these may load while an app is built
+DEFERRED = {'sqlalchemy', 'humanize', 'numpy'}
+
+# label -> (statement that leaves a Flask app in `app`, first request path)
+TARGETS = {
+    'app.py (web + webhooks)': ('from app import app', '/'),
+    'api.py (JSON API)': ('from api import app', '/authorize'),
+    'main.py (routes/)': ('from main import app', '/auth/login'),
+    'test.py': ('from test import app', '/login'),
+    'create_app() (everything)': ('from api_clubplus import create_app; app = create_app()', '/api/authorize'),
+}
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+%s
+built = time.perf_counter()
+heavy = [name for name in %r if name in sys.modules]
+status = app.test_client().get(%r).status_code
+done = time.perf_counter()
+print(json.dumps({'build': (built - start) * 1000, 'first': (done - built) * 1000,
+                  'heavy': heavy, 'status': status}))
+'''
+
+
+def probe(statement, path, env):
+    result = subprocess.run([sys.executable, '-c', PROBE % (statement, HEAVY, path)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=1000, help="slowest acceptable app build, ms")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    # Throwaway store, caches and rate limit state, so nothing here touches the real ones
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{tmp}/startup.db',
+               STRAVA_CACHE_PATH=f'{tmp}/cache.db', STRAVA_RATELIMIT_PATH=f'{tmp}/ratelimit.db',
+               PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, 'api_clubplus_root', 'src'),
+                                           os.environ.get('PYTHONPATH', '')]))
+    # Warm the OS file cache and bytecode so every round measures the same thing
+    for statement, path in TARGETS.values():
+        probe(statement, path, env)
+
+    flask_ms = statistics.median(probe('from flask import Flask; app = Flask("x")', '/', env)['build']
+                                 for _ in range(args.rounds))
+    print(f"Flask alone: {flask_ms:.0f} ms")
+    failures = []
+    for label, (statement, path) in TARGETS.items():
+        runs = [probe(statement, path, env) for _ in range(args.rounds)]
+        build = statistics.median(run['build'] for run in runs)
+        first = statistics.median(run['first'] for run in runs)
+        heavy = runs[0]['heavy']
+        print(f"  {label:28} build {build:6.1f} ms, first request {path} {first:6.1f} ms"
+              f" ({runs[0]['status']}), loaded at startup: {', '.join(heavy) or 'none of ' + '/'.join(HEAVY)}")
+        if build > args.budget:
+            failures.append(f"{label} took {build:.0f} ms to build")
+        if DEFERRED & set(heavy):
+            failures.append(f"{label} imports {', '.join(heavy)} at startup")
+    assert not failures, '; '.join(failures)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# bench_streams.py :
+#
+# Stores the GPS/sensor streams of a batch of synthetic 1 Hz recordings two
+# ways in throwaway SQLite databases: as the compressed delta-encoded blobs
+# of activity_streams, and as the JSON text Strava sends.  Reports database
+# size, then the time to decode every activity's latlng and altitude in full
+# and just a 100 point slice from the middle, checking the blobs give
+# back the original values to the precision Strava sends.
+#
+#   python benchmarks/bench_streams.py --activities 200 --points 3600
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.ingest import BulkIngest
+from api_clubplus.models import ActivityStream
+from api_clubplus.streams import STREAM_SPECS, StreamView, load_streams, store_streams
+from bench_ingest import fresh_engine
+from mock_strava import make_activity, make_streams
+
+SLICE = 100
+
+json_streams = Table(
+    'json_streams', MetaData(),
+    Column('activity_id', Integer, primary_key=True),
+    Column('stream_type', String(20), primary_key=True),
+    Column('data', Text, nullable=False),
+)
+
+
+def recordings(count, points):
+    for i in range(1, count + 1):
+        activity = make_activity(i)
+        activity['moving_time'] = points
+        activity['athlete'] = {'id': 1}
+        yield activity, {name: stream['data'] for name, stream in make_streams(activity).items()}
+
+
+def file_size(engine, path):
+    with engine.connect() as conn:
+        conn.execute(text('VACUUM'))
+    return os.path.getsize(path)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--activities', type=int, default=200)
+    parser.add_argument('--points', type=int, default=3600)
+    args = parser.parse_args()
+
+    data = list(recordings(args.activities, args.points))
+    ids = [activity['id'] for activity, _ in data]
+
+    blob_engine, blob_path = fresh_engine()
+    BulkIngest(blob_engine).ingest(activity for activity, _ in data)
+    json_path = os.path.join(os.path.dirname(blob_path), 'json_streams.db')
+    json_engine = create_engine(f'sqlite:///{json_path}')
+    json_streams.create(json_engine)
+    baseline = file_size(json_engine, json_path)
+    empty = file_size(blob_engine, blob_path)
+
+    def encode():
+        with blob_engine.begin() as conn:
+            for activity, streams in data:
+                store_streams(conn, activity['id'], streams)
+
+    encode_ms, _ = timed(encode)
+    with json_engine.begin() as conn:
+        conn.execute(json_streams.insert(), [
+            {'activity_id': activity['id'], 'stream_type': name, 'data': json.dumps(values)}
+            for activity, streams in data for name, values in streams.items()])
+    blob_size = file_size(blob_engine, blob_path) - empty
+    json_size = file_size(json_engine, json_path) - baseline
+    total = args.activities * args.points
+    print(f"{args.activities} activities x {args.points} points, {len(data[0][1])} streams each")
+    print(f"  storage: JSON {json_size / 1e6:7.1f} MB, blobs {blob_size / 1e6:6.1f} MB"
+          f"  ({json_size / blob_size:.1f}x smaller), encode {encode_ms:.0f} ms")
+
+    session = sessionmaker(bind=blob_engine)()
+    for activity, streams in data[:20]:
+        for name, view in load_streams(session, activity['id']).items():
+            _, scale = STREAM_SPECS[name]
+            assert np.allclose(view.array(), np.array(streams[name], dtype='float64'),
+                               rtol=0, atol=0.5 / scale + 1e-9), name
+    # Decode from rows already read, so both sides pay the same query cost
+    types = ('latlng', 'altitude')
+    middle = args.points // 2
+    blob_rows = session.execute(select(ActivityStream.data, ActivityStream.encoding, ActivityStream.scale)
+                                .where(ActivityStream.stream_type.in_(types))).all()
+    with json_engine.connect() as conn:
+        json_rows = conn.execute(select(json_streams.c.data)
+                                 .where(json_streams.c.stream_type.in_(types))).scalars().all()
+
+    def blob_full():
+        return [StreamView(*row).array() for row in blob_rows]
+
+    def blob_slice():
+        return [StreamView(*row)[middle:middle + SLICE] for row in blob_rows]
+
+    def json_full():
+        return [np.array(json.loads(data)) for data in json_rows]
+
+    def json_slice():
+        return [np.array(json.loads(data)[middle:middle + SLICE]) for data in json_rows]
+
+    for label, blob_fn, json_fn, points in (('full', blob_full, json_full, total),
+                                            (f'{SLICE} point slice', blob_slice, json_slice,
+                                             args.activities * SLICE)):
+        blob_ms = min(timed(blob_fn)[0] for _ in range(3))
+        json_ms = min(timed(json_fn)[0] for _ in range(3))
+        print(f"  decode latlng+altitude, {label}: JSON {json_ms:8.1f} ms, blobs {blob_ms:7.1f} ms"
+              f"  ({json_ms / blob_ms:.0f}x, {2 * points / blob_ms / 1000:.1f}M points/s)")
+
+    session.close()
+    blob_engine.dispose()
+    json_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+# loadtest.py :
+#
+# Drives the apps under concurrent load against the local Strava stand-in
+# and reports, per endpoint, p50/p95/p99 latency, throughput, response
+# statuses and the upstream calls it caused, as JSON.
+#
+# Targets: `app` (app.py), `api` (api.py), `main` (main.py and routes/) and
+# `package` (the api_clubplus Flask app and StravaClient used directly).
+# Endpoints run one after another, each with --concurrency workers that
+# have logged in beforehand, so upstream counts belong to one endpoint.
+#
+#   python benchmarks/loadtest.py --concurrency 16 --requests 50 --latency 0.02 \
+#       --output results.json
+#   python benchmarks/loadtest.py --targets api --compare results.json
+#
+# With --compare, endpoints whose p95 or throughput got worse than the
+# baseline by more than --tolerance are listed and the exit status is 1.
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from mock_strava import MockStrava
+
+TOKEN = 'mock-access-token'
+# How API clients send it
+BEARER = {'Authorization': f'Bearer {TOKEN}'}
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of sorted samples"""
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+class FlaskWorker:
+    """One simulated user: a test client with its own cookie jar"""
+
+    def __init__(self, app, login=None):
+        self.http = app.test_client()
+        self.etags = {}
+        if login:
+            self.http.get(login)
+
+    def get(self, path, conditional=False, headers=None, **kwargs):
+        headers = dict(headers or {})
+        if conditional and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        response = self.http.get(path, headers=headers, **kwargs)
+        response.close()
+        if response.headers.get('ETag'):
+            self.etags[path] = response.headers['ETag']
+        return response.status_code
+
+    def post(self, path, **kwargs):
+        response = self.http.post(path, **kwargs)
+        response.close()
+        return response.status_code
+
+
+class ClientWorker:
+    """Calls the package's StravaClient directly"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def cached_get(self, path):
+        return self.client.cached_get(path, TOKEN).status_code
+
+    def get(self, path):
+        return self.client.get(path, TOKEN).status_code
+
+
+def open_challenge():
+    """Add an open challenge, outside any club, to the store; returns its id"""
+    from datetime import datetime
+    from api_clubplus.models import Challenge, Session, init_db
+    init_db()
+    with Session() as session:
+        challenge = Challenge(name='Load test distance', activity_type='Any', metric='distance',
+                              start_date=datetime(2000, 1, 1), start_time=datetime(2000, 1, 1),
+                              end_date=datetime(2100, 1, 1), end_time=datetime(2100, 1, 1), complete=False)
+        session.add(challenge)
+        session.commit()
+        return challenge.id
+
+
+def app_target():
+    from app import app
+    leaderboard = f'/challenges/{open_challenge()}/leaderboard'
+    return (lambda: FlaskWorker(app, '/strava/auth?code=x')), [
+        ('GET /', lambda w: w.get('/')),
+        ('GET /dashboard', lambda w: w.get('/dashboard')),
+        ('GET /dashboard (If-None-Match)', lambda w: w.get('/dashboard', conditional=True)),
+        ('GET /dashboard/activities', lambda w: w.get('/dashboard/activities?page_size=10')),
+        ('GET /challenges/1/leaderboard', lambda w: w.get(leaderboard)),
+    ]
+
+
+def api_target(app=None):
+    if app is None:
+        from api import app
+    return (lambda: FlaskWorker(app)), [
+        ('GET /authorize', lambda w: w.get('/authorize')),
+        ('GET /activities', lambda w: w.get('/activities', headers=BEARER)),
+        ('GET /activities (If-None-Match)', lambda w: w.get('/activities', conditional=True, headers=BEARER)),
+        ('GET /activities?format=ndjson', lambda w: w.get('/activities?format=ndjson', headers=BEARER)),
+        ('POST /refresh_token', lambda w: w.post('/refresh_token', json={'refresh_token': 'x'})),
+    ]
+
+
+def main_target():
+    from main import app
+    return (lambda: FlaskWorker(app, '/auth/strava/auth?code=x')), [
+        ('GET /', lambda w: w.get('/')),
+        ('GET /dashboard/dashboard', lambda w: w.get('/dashboard/dashboard')),
+    ]
+
+
+def package_target():
+    from api_clubplus import create_app
+    from api_clubplus.client import get_client
+    app = create_app({'REDIRECT_URI': 'http://localhost'}, blueprints=('api',))
+    endpoints = api_target(app)[1]
+    client = get_client()
+    return (lambda: (FlaskWorker(app), ClientWorker(client))), [
+        (f'app {name}', lambda w, call=call: call(w[0])) for name, call in endpoints
+    ] + [
+        ('StravaClient.cached_get /athlete', lambda w: w[1].cached_get('/athlete')),
+        ('StravaClient.get /athlete/activities', lambda w: w[1].get('/athlete/activities')),
+    ]
+
+
+TARGETS = {
+    'app': app_target,
+    'api': api_target,
+    'main': main_target,
+    'package': package_target,
+}
+
+
+def run_endpoint(make_worker, call, server, concurrency, requests, warmup):
+    workers = [make_worker() for _ in range(concurrency)]
+    for worker in workers:
+        for _ in range(warmup):
+            call(worker)
+    # Let background cache refreshes from the warmup land before counting
+    time.sleep(0.05)
+
+    samples = [[] for _ in workers]
+    statuses = [Counter() for _ in workers]
+    errors = [0] * concurrency
+    barrier = threading.Barrier(concurrency + 1)
+
+    def drive(i):
+        barrier.wait()
+        for _ in range(requests):
+            start = time.perf_counter()
+            try:
+                statuses[i][call(workers[i])] += 1
+            except Exception:
+                errors[i] += 1
+            samples[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=drive, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    before = server.call_counts()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = server.call_counts()
+
+    latencies = sorted(s for worker_samples in samples for s in worker_samples)
+    status_counts = sum(statuses, Counter())
+    upstream = {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'status': {str(code): n for code, n in sorted(status_counts.items())},
+        'exceptions': sum(errors),
+        'upstream_calls': upstream,
+        'upstream_per_request': round(sum(upstream.values()) / len(latencies), 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Endpoints whose p95 or throughput regressed past the tolerance"""
+    previous = {(r['target'], r['endpoint']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['target'], result['endpoint']))
+        if old is None:
+            continue
+        p95 = result['p95_ms'] / old['p95_ms'] if old['p95_ms'] else 1.0
+        rps = result['throughput_rps'] / old['throughput_rps'] if old['throughput_rps'] else 1.0
+        print(f"  {result['target']:<8} {result['endpoint']:<42} p95 x{p95:5.2f}  throughput x{rps:5.2f}",
+              file=sys.stderr)
+        if p95 > 1 + tolerance or rps < 1 - tolerance:
+            regressions.append({'target': result['target'], 'endpoint': result['endpoint'],
+                                'p95_ratio': round(p95, 3), 'throughput_ratio': round(rps, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__ and __doc__.splitlines()[0])
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help='per worker, per endpoint')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed requests per worker first')
+    parser.add_argument('--latency', type=float, default=0.02, help='upstream latency in seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--activities', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=30)
+    parser.add_argument('--rate-limit', default='100000,1000000', help='15-minute,daily quota')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = MockStrava(latency=args.latency, latency_jitter=args.latency_jitter,
+                        activity_count=args.activities, per_page=args.per_page,
+                        rate_limit=tuple(int(n) for n in args.rate_limit.split(',')),
+                        error_rate=args.error_rate).start()
+    # Every target shares one throwaway store, cache and rate limit state
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'STRAVA_URL': server.url,
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        'STRAVA_CACHE_PATH': os.path.join(workdir, 'cache.db'),
+        'STRAVA_RATELIMIT_PATH': os.path.join(workdir, 'ratelimit.db'),
+    })
+
+    results = []
+    for target in args.targets:
+        make_worker, endpoints = TARGETS[target]()
+        for name, call in endpoints:
+            result = dict(target=target, endpoint=name,
+                          **run_endpoint(make_worker, call, server, args.concurrency,
+                                         args.requests, args.warmup))
+            results.append(result)
+            print(f"{target:<8} {name:<42} {result['throughput_rps']:8.1f} req/s"
+                  f"  p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}"
+                  f"  p99 {result['p99_ms']:8.2f} ms  upstream/req {result['upstream_per_request']:.2f}"
+                  f"  {result['status']}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'config': {key: value for key, value in vars(args).items()
+                       if key not in ('output', 'compare', 'tolerance')},
+        },
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(results, json.load(f), args.tolerance)
+
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(body + '\n')
+    else:
+        print(body)
+    server.shutdown()
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+# mock_strava.py :
+#
+# Local stand-in for the Strava API used by the benchmarks.  Serves the
+# handful of endpoints the apps call, over HTTP/1.1 keep-alive, and can
+# inject a per-connection delay to model the TCP+TLS handshake cost.  GETs
+# carry an ETag and a matching If-None-Match is answered with 304.
+#
+# Latency (with jitter), default and maximum page size, the rate limit quota
+# and a rate of injected 5xx errors are all configurable, and upstream calls
+# are counted per endpoint.
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def strip(activity):
+    return {k: v for k, v in activity.items() if not k.startswith('_')}
+
+
+def make_activity(i):
+    epoch = 1700000000 - i * 86400
+    return {
+        '_epoch': epoch,
+        'id': i,
+        'athlete': {'id': 1},
+        'name': f'Morning Run {i}',
+        'type': 'Run',
+        'sport_type': 'Run',
+        'distance': 5000.0 + i,
+        'moving_time': 1500 + i,
+        'elapsed_time': 1600 + i,
+        'total_elevation_gain': 12.5,
+        'start_date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(epoch)),
+        'start_date_local': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(epoch)),
+        'timezone': '(GMT+00:00) UTC',
+        'start_latlng': [51.5 + i * 1e-4, -0.12],
+        'end_latlng': [51.5, -0.12 - i * 1e-4],
+        'average_speed': 3.2,
+        'max_speed': 4.1,
+        'private': False,
+        'kudos_count': i % 7,
+    }
+
+
+def make_streams(activity, keys=None):
+    """A 1 Hz recording of the activity, rounded to the precision Strava sends"""
+    rng = random.Random(activity['id'])
+    points = activity['moving_time']
+    lat, lng = activity['start_latlng']
+    altitude, distance, heartrate = 30.0, 0.0, 120
+    streams = {name: [] for name in ('time', 'latlng', 'distance', 'altitude', 'velocity_smooth',
+                                     'heartrate', 'cadence', 'grade_smooth')}
+    for second in range(points):
+        speed = max(0.5, activity['average_speed'] + rng.gauss(0, 0.3))
+        climb = rng.gauss(0, 0.2)
+        lat += rng.gauss(2e-5, 1e-5)
+        lng += rng.gauss(1e-5, 1e-5)
+        altitude += climb
+        distance += speed
+        heartrate = min(190, max(90, heartrate + rng.choice((-1, 0, 0, 1))))
+        streams['time'].append(second)
+        streams['latlng'].append([round(lat, 7), round(lng, 7)])
+        streams['distance'].append(round(distance, 1))
+        streams['altitude'].append(round(altitude, 1))
+        streams['velocity_smooth'].append(round(speed, 3))
+        streams['heartrate'].append(heartrate)
+        streams['cadence'].append(85 + rng.randint(-2, 2))
+        streams['grade_smooth'].append(round(climb / speed * 100, 1))
+    return {name: {'data': data, 'series_type': 'distance', 'original_size': points, 'resolution': 'high'}
+            for name, data in streams.items() if keys is None or name in keys}
+
+
+class MockStrava(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), handshake_delay=0.0, latency=0.0,
+                 activity_count=30, rate_limit=(200, 2000), latency_jitter=0.0, per_page=30,
+                 max_per_page=200, error_rate=0.0, seed=1):
+        super().__init__(address, MockStravaHandler)
+        self.handshake_delay = handshake_delay
+        # Every request waits latency + uniform(0, latency_jitter) seconds
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        # (15-minute, daily) quota reported in X-RateLimit-* headers; 429 once exceeded
+        self.rate_limit = rate_limit
+        # Page size when per_page is not given, and the cap on it (Strava's is 200)
+        self.per_page = per_page
+        self.max_per_page = max_per_page
+        # Fraction of API GETs answered with a 500/503
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.api_requests = 0
+        self.activities = [make_activity(i) for i in range(1, activity_count + 1)]
+        self.connections = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def reset_counters(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+            self.api_requests = 0
+            self.not_modified = 0
+            self.errors = 0
+            self.calls.clear()
+
+    def count_call(self, method, path):
+        # Per-endpoint counts, with ids collapsed so they group by route
+        with self._lock:
+            self.calls[f"{method} {re.sub(r'/[0-9]+', '/{id}', path)}"] += 1
+
+    def call_counts(self):
+        with self._lock:
+            return dict(self.calls)
+
+    def chance(self, rate):
+        with self._lock:
+            return self.random.random() < rate
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+class MockStravaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # Runs once per TCP connection: charge the simulated handshake here
+        super().setup()
+        self.server.count('connections')
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        if status == 200 and self.command == 'GET':
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            headers = dict(headers or {}, ETag=etag)
+            if self.headers.get('If-None-Match') == etag:
+                self.server.count('not_modified')
+                status, body = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self):
+        self.server.count('requests')
+        url = urlparse(self.path)
+        self.server.count_call(self.command, url.path)
+        delay = self.server.latency
+        if self.server.latency_jitter:
+            with self.server._lock:
+                delay += self.server.random.uniform(0, self.server.latency_jitter)
+        if delay:
+            time.sleep(delay)
+        return url
+
+    def _rate_limit(self):
+        """Count an API call; returns (headers, over_limit)"""
+        self.server.count('api_requests')
+        used = self.server.api_requests
+        short, daily = self.server.rate_limit
+        headers = {'X-RateLimit-Limit': f'{short},{daily}', 'X-RateLimit-Usage': f'{used},{used}'}
+        return headers, used > short or used > daily
+
+    def do_GET(self):
+        url = self._begin()
+        query = parse_qs(url.query)
+        headers, limited = self._rate_limit()
+        if limited:
+            self._send_json({'message': 'Rate Limit Exceeded'}, 429, headers)
+        elif self.server.error_rate and self.server.chance(self.server.error_rate):
+            self.server.count('errors')
+            status = 503 if self.server.chance(0.5) else 500
+            self._send_json({'message': 'Service Unavailable'}, status, headers)
+        elif url.path == '/api/v3/athlete':
+            self._send_json({'id': 1, 'firstname': 'Test', 'lastname': 'Athlete'}, headers=headers)
+        elif url.path == '/api/v3/athlete/activities':
+            page = int(query.get('page', ['1'])[0])
+            per_page = min(int(query.get('per_page', [self.server.per_page])[0]),
+                           self.server.max_per_page)
+            activities = self.server.activities
+            # Like Strava: newest first, oldest first when `after` is given
+            if 'before' in query:
+                before = int(query['before'][0])
+                activities = [a for a in activities if a['_epoch'] < before]
+            if 'after' in query:
+                after = int(query['after'][0])
+                activities = [a for a in reversed(activities) if a['_epoch'] > after]
+            start = (page - 1) * per_page
+            self._send_json([strip(a) for a in activities[start:start + per_page]], headers=headers)
+        elif re.fullmatch(r'/api/v3/activities/[0-9]+/streams', url.path):
+            activity_id = int(url.path.split('/')[4])
+            activity = next((a for a in self.server.activities if a['id'] == activity_id), None)
+            if activity is None:
+                self._send_json({'message': 'Record Not Found'}, 404, headers)
+            else:
+                keys = set(','.join(query.get('keys', [])).split(',')) - {''} or None
+                self._send_json(make_streams(activity, keys), headers=headers)
+        elif url.path.startswith('/api/v3/activities/'):
+            activity_id = int(url.path.rsplit('/', 1)[1])
+            activity = next((a for a in self.server.activities if a['id'] == activity_id), None)
+            if activity is None:
+                self._send_json({'message': 'Record Not Found'}, 404, headers)
+            else:
+                self._send_json(strip(activity), headers=headers)
+        else:
+            self._send_json({'message': 'Record Not Found'}, 404, headers)
+
+    def do_POST(self):
+        url = self._begin()
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        if url.path == '/oauth/token':
+            self._send_json({
+                'token_type': 'Bearer',
+                'access_token': 'mock-access-token',
+                'refresh_token': 'mock-refresh-token',
+                'expires_at': int(time.time()) + 21600,
+                'expires_in': 21600,
+                'athlete': {'id': 1, 'firstname': 'Test', 'lastname': 'Athlete'},
+            })
+        elif url.path == '/oauth/deauthorize':
+            self._send_json({'access_token': 'mock-access-token'})
+        else:
+            self._send_json({'message': 'Record Not Found'}, 404)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local Strava stand-in')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--handshake-delay', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--activities', type=int, default=30)
+    parser.add_argument('--per-page', type=int, default=30)
+    parser.add_argument('--max-per-page', type=int, default=200)
+    parser.add_argument('--rate-limit', default='200,2000', help='15-minute,daily quota')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockStrava(('127.0.0.1', args.port), args.handshake_delay, args.latency,
+                        activity_count=args.activities,
+                        rate_limit=tuple(int(n) for n in args.rate_limit.split(',')),
+                        latency_jitter=args.latency_jitter, per_page=args.per_page,
+                        max_per_page=args.max_per_page, error_rate=args.error_rate)
+    print(f"Mock Strava listening on {server.url}")
+    server.serve_forever()
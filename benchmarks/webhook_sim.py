@@ -0,0 +1,159 @@
+# webhook_sim.py :
+#
+# Local stand-in for Strava's push subscription.  Sends synthetic
+# create/update/delete/deauthorize events to the webhook receiver and checks
+# what they did to the local store.
+#
+# With --url the events are just POSTed to a running app (ids from --athlete
+# and --activity) and the acknowledgement latency is reported:
+#
+#   python benchmarks/webhook_sim.py --url http://localhost:5000 --athlete 1 --activity 42
+#
+# Without it the script runs app.py in-process against the mock Strava
+# server and a throwaway database, and asserts on the results.
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import urllib.request
+
+from mock_strava import MockStrava, make_activity
+
+VERIFY_TOKEN = 'webhook-sim'
+SUBSCRIPTION_ID = 1
+
+
+def event(object_type, aspect_type, object_id, owner_id, updates=None):
+    return {
+        'object_type': object_type,
+        'object_id': object_id,
+        'aspect_type': aspect_type,
+        'owner_id': owner_id,
+        'subscription_id': SUBSCRIPTION_ID,
+        'event_time': int(time.time()),
+        'updates': updates or {},
+    }
+
+
+def scenario(athlete_id, activity_id):
+    return [
+        event('activity', 'create', activity_id, athlete_id),
+        event('activity', 'update', activity_id, athlete_id, {'title': 'Renamed by webhook'}),
+        event('activity', 'update', activity_id, athlete_id, {'private': 'true'}),
+        event('activity', 'delete', activity_id, athlete_id),
+        event('athlete', 'update', athlete_id, athlete_id, {'authorized': 'false'}),
+    ]
+
+
+def post_events(url, events):
+    for item in events:
+        request = urllib.request.Request(f"{url}/strava/webhook", data=json.dumps(item).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            status = response.status
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"  {item['object_type']:<8} {item['aspect_type']:<7} -> {status} in {elapsed:.1f} ms")
+
+
+def self_test():
+    server = MockStrava(activity_count=30).start()
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'STRAVA_URL': server.url,
+        'STRAVA_VERIFY_TOKEN': VERIFY_TOKEN,
+        'STRAVA_SUBSCRIPTION_ID': str(SUBSCRIPTION_ID),
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'STRAVA_CACHE_PATH': os.path.join(workdir, 'cache.db'),
+        'STRAVA_RATELIMIT_PATH': os.path.join(workdir, 'ratelimit.db'),
+    })
+    # Imported late so the settings above are picked up
+    from app import app
+    from api_clubplus.models import Activity, Session
+    from api_clubplus.tokens import load_tokens
+    from api_clubplus.webhooks import get_processor
+
+    web = app.test_client()
+    response = web.get('/strava/webhook', query_string={
+        'hub.mode': 'subscribe', 'hub.verify_token': VERIFY_TOKEN, 'hub.challenge': 'abc'})
+    assert response.get_json() == {'hub.challenge': 'abc'}, response.data
+    response = web.get('/strava/webhook', query_string={
+        'hub.mode': 'subscribe', 'hub.verify_token': 'wrong', 'hub.challenge': 'abc'})
+    assert response.status_code == 403
+    print("subscription handshake ok")
+
+    # Log in and let the initial sync and backfill finish
+    web.get('/strava/auth?code=sim')
+    web.get('/dashboard')
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        with Session() as session:
+            if session.query(Activity).count() == 30:
+                break
+        time.sleep(0.1)
+    athlete_id, activity_id = 1, 31
+    assert load_tokens(athlete_id) is not None
+    print("athlete logged in and synced (30 activities)")
+
+    # The athlete uploads a new activity on Strava
+    server.activities.insert(0, make_activity(activity_id))
+    with app.app_context():
+        # The same processor the webhook requests use, built with the app's credentials
+        processor = get_processor()
+    expected = [
+        ('create', 1, lambda a: a is not None and a.name == f'Morning Run {activity_id}'),
+        ('update title', 0, lambda a: a.name == 'Renamed by webhook'),
+        ('update private', 0, lambda a: a.private is True),
+        # Only applied once Strava confirms the activity is gone
+        ('delete', 1, lambda a: a is None),
+        ('deauthorize', 0, lambda a: load_tokens(athlete_id) is None),
+    ]
+    for item, (label, upstream, check) in zip(scenario(athlete_id, activity_id), expected):
+        if item['aspect_type'] == 'delete':
+            # The athlete deleted it on Strava
+            server.activities = [a for a in server.activities if a['id'] != activity_id]
+        server.reset_counters()
+        start = time.perf_counter()
+        response = web.post('/strava/webhook', json=item)
+        acked = (time.perf_counter() - start) * 1000
+        assert response.status_code == 200, response.data
+        processor.join()
+        applied = (time.perf_counter() - start) * 1000
+        with Session() as session:
+            assert check(session.get(Activity, activity_id)), label
+        assert server.api_requests == upstream, (label, server.api_requests)
+        print(f"  {label:<15} acked in {acked:5.1f} ms, applied in {applied:6.1f} ms,"
+              f" {server.api_requests} upstream call(s)")
+
+    response = web.post('/strava/webhook', json={'object_type': 'activity'})
+    assert response.status_code == 400
+    forged = event('activity', 'delete', 1, athlete_id)
+    response = web.post('/strava/webhook', json=dict(forged, subscription_id=SUBSCRIPTION_ID + 1))
+    assert response.status_code == 403
+    # Events naming another athlete as owner leave athlete 1's activities alone
+    for item in (event('activity', 'delete', 1, 2), event('activity', 'update', 1, 2, {'title': 'Forged'})):
+        assert web.post('/strava/webhook', json=item).status_code == 200
+    processor.join()
+    with Session() as session:
+        assert session.get(Activity, 1).name == 'Morning Run 1'
+    print("events for another subscription or owner rejected")
+    print("all events applied as expected")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help="post events to a running app instead of self-testing")
+    parser.add_argument('--athlete', type=int, default=1)
+    parser.add_argument('--activity', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.url:
+        post_events(args.url.rstrip('/'), scenario(args.athlete, args.activity))
+    else:
+        self_test()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
-from flask import Flask
+from api_clubplus import create_app
 from routes import init_routes
 
-app = Flask(__name__)
-app.secret_key = "supersekrit"
+# Only the routes/ blueprints; settings and /metrics come from the factory
+app = create_app(blueprints=(), import_name=__name__)
 
 # Initialize routes
 init_routes(app)
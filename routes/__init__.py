@@ -5,6 +5,7 @@ from .dashboard_routes import dashboard_bp
 from .logout_routes import logout_bp
 
 def init_routes(app):
+    # For an app from api_clubplus.create_app, which provides the settings and /metrics
     app.register_blueprint(home_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
@@ -1,6 +1,5 @@
 from flask import Blueprint, render_template, redirect, url_for, session
-import requests
-from .auth_routes import API_URL
+from api_clubplus.client import get_client
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -11,10 +10,10 @@ def dashboard():
         return redirect(url_for("auth.login"))
 
     # Retrieve user data from Strava API
-    headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.get(f"{API_URL}/athlete", headers=headers)
+    response = get_client().cached_get("/athlete", access_token)
     if response.status_code == 200:
         user_name = response.json()["firstname"]
-        return render_template("dashboard.html", user_name=user_name)
+        # No activity table or summary here, just the greeting; logout is its own blueprint
+        return render_template("dashboard.html", user_name=user_name, logout_url=url_for("logout.logout"))
     else:
         return "Failed to fetch user details"
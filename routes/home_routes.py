@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, url_for
 
 home_bp = Blueprint("home", __name__)
 
 @home_bp.route("/")
 def home():
-    return render_template("home.html")
+    # The template links to '.login' by default; here login lives in the auth blueprint
+    return render_template("home.html", login_url=url_for("auth.login"))
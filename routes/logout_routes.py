@@ -1,6 +1,6 @@
 from flask import Blueprint, redirect, url_for, session
-import requests
-from .auth_routes import CLIENT_ID, CLIENT_SECRET
+from api_clubplus.client import get_client
+from api_clubplus.config import credentials
 
 logout_bp = Blueprint("logout", __name__)
 
@@ -9,12 +9,7 @@ def logout():
     access_token = session.get('access_token')
     if access_token:
         # Revoke access token
-        revoke_params = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'access_token': access_token
-        }
-        revoke_response = requests.post('https://www.strava.com/oauth/deauthorize', data=revoke_params)
+        revoke_response = get_client().deauthorize(*credentials(), access_token)
         if revoke_response.status_code != 200:
             return "Failed to revoke access token"
 
@@ -1,16 +1,19 @@
-from flask import Flask, redirect, url_for, render_template, session, request
-from strava_api.api import authorize, strava_auth, refresh_token, revoke_token, get_activities
-from strava_api import CLIENT_ID, CLIENT_SECRET, REDIRECT_URI, STRAVA_AUTH_URL, API_URL
-import os
-from dotenv import load_dotenv
+from flask import redirect, url_for, render_template, session, request
+from markupsafe import Markup
+from api_clubplus import create_app
+from api_clubplus.client import get_client
+from api_clubplus.config import authorization_url, credentials
+from api_clubplus.fanout import gather
+from api_clubplus.filters import DateRange
 import requests
 
 
-app = Flask(__name__)
-app.secret_key = "supersekrit"
+# The JSON API (/strava/auth, /refresh_token, /revoke_token, /activities) plus
+# the pages below, which read activities straight from Strava
+app = create_app({'REDIRECT_URI': 'http://localhost'}, blueprints=('api',),
+                 import_name=__name__)
 
-# Load environment variables
-load_dotenv()
+strava = get_client()
 
 # Initialize session variable to track login status
 @app.before_request
@@ -29,27 +32,19 @@ def home():
 
 @app.route("/login")
 def login():
-    # Define the desired scope
-    scope = "activity:read_all,read_all" 
+    # Redirect user to Strava's authorization page with the app's scope
+    return redirect(authorization_url())
 
-    # Redirect user to Strava's authorization page with the defined scope
-    return redirect(f"{STRAVA_AUTH_URL}?client_id={CLIENT_ID}&redirect_uri={REDIRECT_URI}&response_type=code&scope={scope}")
 
-@app.route("/strava/auth", methods=['GET', 'POST'])
-def strava_auth_route():
-    return strava_auth()
-
-@app.route("/refresh_token", methods=['POST'])
-def refresh_token_route():
-    return refresh_token()
-
-@app.route("/revoke_token", methods=['POST'])
-def revoke_token_route():
-    return revoke_token()
-
-@app.route("/activities", methods=['POST', 'GET'])
-def get_activities_route():
-    return get_activities()
+def fetch_activities(access_token, date_range):
+    if not date_range:
+        activities_response = strava.cached_get("/athlete/activities", access_token)
+        return activities_response.json() if activities_response.status_code == 200 else []
+    # Let Strava filter on the window and page through only the matching activities
+    try:
+        return list(strava.iter_activities(access_token, date_range.strava_params()))
+    except requests.RequestException:
+        return []
 
 
 @app.route("/dashboard", methods=['GET', 'POST'])
@@ -58,20 +53,26 @@ def dashboard():
     if not access_token:
         return redirect(url_for("login"))
 
-    # Retrieve user data from Strava API
-    headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.get(f"{API_URL}/athlete", headers=headers)
+    # Filter activities on a start date range if provided (DD-MM-YYYY, both ends inclusive)
+    try:
+        date_range = DateRange.from_form(request.form.get('start_date'), request.form.get('end_date'))
+    except ValueError:
+        return "Invalid date range. Please use DD-MM-YYYY format with the end date on or after the start date."
+
+    # Retrieve user data and activities from Strava API concurrently (served from cache when fresh)
+    response, activities = gather(
+        lambda: strava.cached_get("/athlete", access_token),
+        lambda: fetch_activities(access_token, date_range),
+    )
     if response.status_code == 200:
         user_name = response.json()["firstname"]
 
-        # Fetch activities
-        activities_response = requests.get(f"{API_URL}/athlete/activities", headers=headers)
-        if activities_response.status_code == 200:
-            activities = activities_response.json()
-        else:
-            activities = [] 
-
-        return render_template("dashboard.html", user_name=user_name, activities=activities)
+        # The shared dashboard template takes the table rows pre-rendered; there is no
+        # local store here, so no summary or paging either
+        activity_rows = Markup(render_template("_activity_rows.html", activities=activities))
+        return render_template("dashboard.html", user_name=user_name, activity_rows=activity_rows,
+                               start_date=request.form.get('start_date', ''),
+                               end_date=request.form.get('end_date', ''))
     else:
         # Access might be revoked, display message and redirect after a delay
         return render_template("access_revoked.html")
@@ -82,12 +83,7 @@ def logout():
     access_token = session.get('access_token')
     if access_token:
         # Revoke access token
-        revoke_params = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'access_token': access_token
-        }
-        revoke_response = requests.post('https://www.strava.com/oauth/deauthorize', data=revoke_params)
+        revoke_response = strava.deauthorize(*credentials(), access_token)
         if revoke_response.status_code != 200:
             return "Failed to revoke access token"
 
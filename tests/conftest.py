@@ -0,0 +1,138 @@
+# conftest.py :
+#
+# The package (and the benchmarks' Strava stand-in) is imported from the
+# checkout, and every database it opens (activity store, response cache,
+# rate limit state) lives in a throwaway directory, set before any
+# api_clubplus module reads its settings.  FakeStrava and the fixtures
+# below stand in for Strava in the tests.
+
+import calendar
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'api_clubplus_root', 'src'), ROOT, os.path.join(ROOT, 'benchmarks')]
+
+_tmp = tempfile.mkdtemp(prefix='api_clubplus_tests_')
+os.environ.update(DATABASE_URL=f'sqlite:///{_tmp}/store.db', STRAVA_CACHE_PATH=f'{_tmp}/cache.db',
+                  STRAVA_RATELIMIT_PATH=f'{_tmp}/ratelimit.db')
+
+# The athlete a FakeStrava token belongs to, and who the `logged_in` client is
+ATHLETE = 42
+
+
+class Response:
+    """The parts of requests.Response the package reads"""
+
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} from Strava", response=self)
+
+
+def _epoch(activity):
+    return calendar.timegm(time.strptime(activity['start_date'], '%Y-%m-%dT%H:%M:%SZ'))
+
+
+class FakeStrava:
+    """In-memory stand-in for StravaClient
+
+    Serves /athlete, /athlete/activities (newest first, paged, with Strava's
+    exclusive `before`/`after`) and /activities/<id> from `activities`,
+    which only tokens in `visible_to` may see when it is set.  Every call
+    raises `error` when that is set.  GETs are recorded in `calls`, token
+    refreshes in `refreshes`; any authorization code is exchanged for 'token'.
+    """
+    cache = None
+
+    def __init__(self, activities=(), athlete_id=ATHLETE, visible_to=None):
+        self.activities = {activity['id']: activity for activity in activities}
+        self.athlete_id = athlete_id
+        self.visible_to = visible_to
+        self.error = None
+        self.calls = []
+        self.refreshes = []
+
+    def add(self, *activities):
+        for activity in activities:
+            self.activities[activity['id']] = activity
+
+    def listing(self, params=None):
+        params = params or {}
+        before, after = params.get('before'), params.get('after')
+        listed = sorted(self.activities.values(), key=lambda a: (_epoch(a), a['id']), reverse=True)
+        listed = [a for a in listed if (before is None or _epoch(a) < before)
+                  and (after is None or _epoch(a) > after)]
+        per_page = params.get('per_page', 30)
+        start = (params.get('page', 1) - 1) * per_page
+        return listed[start:start + per_page]
+
+    def get(self, path, access_token, params=None, priority=None, **kwargs):
+        self.calls.append((path, access_token))
+        if self.error is not None:
+            raise self.error
+        if self.visible_to is not None and access_token not in self.visible_to:
+            return Response(404)
+        if path == '/athlete':
+            return Response(200, {'id': self.athlete_id, 'firstname': 'Ada'})
+        if path == '/athlete/activities':
+            return Response(200, self.listing(params))
+        activity = self.activities.get(int(path.rsplit('/', 1)[1]))
+        return Response(200, activity) if activity else Response(404)
+
+    def cached_get(self, path, access_token, params=None, tag=None, priority=None):
+        return self.get(path, access_token, params, priority)
+
+    def iter_activities(self, access_token, params=None, per_page=200, max_pages=None, priority=None):
+        # A generator like StravaClient's: nothing is fetched before the first next()
+        if self.error is not None:
+            raise self.error
+        yield from self.listing(dict(params or {}, per_page=10 ** 6))
+
+    def refresh(self, client_id, client_secret, refresh_token):
+        self.refreshes.append((client_id, client_secret, refresh_token))
+        return Response(200, {'access_token': 'refreshed-token', 'refresh_token': 'next-refresh',
+                              'expires_at': int(time.time()) + 21600})
+
+    def exchange_code(self, client_id, client_secret, code):
+        return Response(200, {'access_token': 'token', 'refresh_token': 'refresh', 'expires_at': 1700021600,
+                              'athlete': {'id': self.athlete_id, 'firstname': 'Ada'}})
+
+
+@pytest.fixture
+def strava():
+    return FakeStrava()
+
+
+@pytest.fixture
+def web_strava(monkeypatch, strava):
+    """`strava` behind the web blueprint, with the dashboard's sync switched off"""
+    from api_clubplus import web
+    monkeypatch.setattr(web, 'strava', lambda: strava)
+    monkeypatch.setattr(web, 'sync_activities', lambda *args, **kwargs: None)
+    return strava
+
+
+@pytest.fixture
+def logged_in():
+    """logged_in(app, athlete_id=ATHLETE): a test client with a Strava session"""
+
+    def client_for(app, athlete_id=ATHLETE, access_token='token'):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['access_token'] = access_token
+            session['athlete_id'] = athlete_id
+        return client
+    return client_for
@@ -0,0 +1,61 @@
+# test_analytics.py :
+#
+# The NumPy figures behind /analytics must equal the plain-Python loop over
+# row dicts that benchmarks/bench_analytics.py times them against.
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+pytest.importorskip('numpy')
+
+from api_clubplus import analytics  # noqa: E402
+from api_clubplus.frames import ActivityFrame, FrameStore  # noqa: E402
+from api_clubplus.ingest import BulkIngest  # noqa: E402
+from api_clubplus.leaderboard import ChallengeStandings  # noqa: E402
+from api_clubplus.models import init_db  # noqa: E402
+from bench_analytics import activities, close, load_dicts, loop_summary  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('analytics')}/analytics.db")
+    init_db(engine)
+    factory = sessionmaker(bind=engine)
+    BulkIngest(engine, standings=ChallengeStandings(factory, flush_interval=None)).ingest(activities(3000))
+    with factory() as session:
+        yield session
+    engine.dispose()
+
+
+def numpy_summary(frame, days, today):
+    result = analytics.summarize(frame, days, today)
+    for row in result['sport_totals']:
+        del row['sport_type']
+    return result
+
+
+@pytest.mark.parametrize('days', [1, 90, 730])
+def test_summary_matches_the_dict_loop(session, days):
+    frame = ActivityFrame.load(session, 1)
+    today = frame['start_date_local'].max().item().date()
+    expected = loop_summary(load_dicts(session, 1), days, today)
+    result = numpy_summary(frame, days, today)
+    for key in expected:
+        assert close(result[key], expected[key]), key
+
+
+def test_memory_mapped_frame_gives_the_same_summary(session, tmp_path):
+    store = FrameStore(str(tmp_path))
+    store.get(session, 1)
+    mapped = store.get(session, 1)
+    frame = ActivityFrame.load(session, 1)
+    today = frame['start_date_local'].max().item().date()
+    assert close(numpy_summary(mapped, 90, today), numpy_summary(frame, 90, today))
+
+
+def test_an_athlete_without_activities(session):
+    frame = ActivityFrame.load(session, 999)
+    assert len(frame) == 0
+    result = numpy_summary(frame, 30, None)
+    assert result['sport_totals'] == [] and sum(result['pace_distribution']['counts']) == 0
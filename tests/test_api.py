@@ -0,0 +1,46 @@
+# test_api.py :
+
+import pytest
+import requests
+
+from api_clubplus import api, create_app
+from api_clubplus.ratelimit import RateLimited
+
+
+@pytest.mark.parametrize('error, status', [
+    (RateLimited(30), 429),
+    (requests.ConnectionError("connection refused"), 502),
+    (requests.Timeout("read timed out"), 502),
+])
+def test_ndjson_stream_maps_upstream_failures(monkeypatch, strava, error, status):
+    strava.error = error
+    monkeypatch.setattr(api, 'strava', lambda: strava)
+    client = create_app(blueprints=('api',)).test_client()
+    response = client.get('/activities?format=ndjson', headers={'Authorization': 'Bearer token'})
+    assert response.status_code == status
+    assert 'error' in response.json
+    if status == 429:
+        assert response.headers['Retry-After'] == '30'
+
+
+@pytest.mark.parametrize('error, status', [
+    (RateLimited(30), 429),
+    (requests.ConnectionError("connection refused"), 502),
+])
+def test_activities_map_upstream_failures_on_a_cold_cache(monkeypatch, strava, error, status):
+    strava.error = error
+    monkeypatch.setattr(api, 'strava', lambda: strava)
+    client = create_app(blueprints=('api',)).test_client()
+    response = client.get('/activities', headers={'Authorization': 'Bearer token'})
+    assert response.status_code == status
+    assert 'error' in response.json
+    if status == 429:
+        assert response.headers['Retry-After'] == '30'
+
+
+def test_activities_ignore_a_token_in_the_query_string(monkeypatch, strava):
+    monkeypatch.setattr(api, 'strava', lambda: strava)
+    client = create_app(blueprints=('api',)).test_client()
+    assert client.get('/activities?access_token=token').status_code == 400
+    assert client.post('/activities', json={'access_token': 'token'}).status_code == 200
+    assert strava.calls == [('/athlete/activities', 'token')]
@@ -0,0 +1,61 @@
+# test_apps.py :
+#
+# Every app the factory builds renders its pages: the shared templates need
+# the factory's filters whichever blueprints are served.
+
+import pytest
+
+from api_clubplus import create_app
+
+
+def strava_activity():
+    return {'id': 1, 'name': 'Lunch Run', 'type': 'Run', 'distance': 5000.0, 'moving_time': 1500,
+            'elapsed_time': 1600, 'start_date': '2024-01-02T12:00:00Z'}
+
+
+@pytest.mark.parametrize('blueprints', [(), ('api',), ('web',), ('web', 'api', 'webhooks')])
+def test_every_app_has_the_template_filters(blueprints):
+    filters = create_app(blueprints=blueprints).jinja_env.filters
+    assert filters['format_timedelta'](90) == '1 minute and 30 seconds'
+    assert filters['format_datetime']('2024-01-02T12:00:00Z') == '02 January 2024, 12:00:00 PM'
+
+
+def test_web_app_pages_render(web_strava, logged_in):
+    from app import app
+    assert app.test_client().get('/').status_code == 200
+    assert logged_in(app).get('/dashboard').status_code == 200
+
+
+def test_strava_backed_dashboard_renders(monkeypatch, strava, logged_in):
+    import test
+    strava.add(strava_activity())
+    monkeypatch.setattr(test, 'strava', strava)
+    assert test.app.test_client().get('/').status_code == 200
+    client = logged_in(test.app)
+    assert client.get('/').status_code == 302
+    for response in (client.get('/dashboard'),
+                     client.post('/dashboard', data={'start_date': '01-01-2024', 'end_date': '31-01-2024'})):
+        assert response.status_code == 200
+        assert b'Lunch Run' in response.data and b'25 minutes' in response.data
+
+
+def test_routes_app_pages_render(monkeypatch, strava, logged_in):
+    import main
+    import routes.dashboard_routes
+    monkeypatch.setattr(routes.dashboard_routes, 'get_client', lambda: strava)
+    assert main.app.test_client().get('/').status_code == 200
+    response = logged_in(main.app).get('/dashboard/dashboard')
+    assert response.status_code == 200
+    assert b'Ada' in response.data
+
+
+def test_routes_app_login_keeps_the_whole_token_set(monkeypatch, strava):
+    import main
+    import routes.auth_routes
+    monkeypatch.setattr(routes.auth_routes, 'get_client', lambda: strava)
+    client = main.app.test_client()
+    assert client.get('/auth/login').status_code == 302
+    assert client.get('/auth/strava/auth?code=abc').status_code == 302
+    with client.session_transaction() as session:
+        assert (session['access_token'], session['refresh_token'], session['expires_at']) == \
+            ('token', 'refresh', 1700021600)
@@ -0,0 +1,50 @@
+from api_clubplus.cache import CacheEntry, DiskCache, MemoryCache, TieredCache, athlete_tag, cache_key
+
+
+def entry(data, tag=None):
+    return CacheEntry(data, 1000.0, tag)
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(maxsize=2)
+    cache.set('a', entry(1))
+    cache.set('b', entry(2))
+    cache.get('a')
+    cache.set('c', entry(3))
+    assert cache.get('b') is None
+    assert cache.get('a').data == 1 and cache.get('c').data == 3
+
+
+def test_invalidate_tag_drops_only_that_athlete():
+    cache = MemoryCache()
+    cache.set('a1', entry(1, athlete_tag(1)))
+    cache.set('a2', entry(2, athlete_tag(1)))
+    cache.set('b1', entry(3, athlete_tag(2)))
+    cache.invalidate_tag(athlete_tag(1))
+    assert cache.get('a1') is None and cache.get('a2') is None
+    assert cache.get('b1').data == 3
+
+
+def test_cache_key_never_contains_the_token():
+    key = cache_key('secret-token', '/athlete', {'page': 1})
+    assert 'secret-token' not in key
+    assert key == cache_key('secret-token', '/athlete', {'page': 1})
+    assert key != cache_key('other-token', '/athlete', {'page': 1})
+
+
+def test_disk_tier_is_shared_and_promoted(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    writer = TieredCache(disk=DiskCache(path))
+    stored = writer.set('k', {'id': 1}, tag=athlete_tag(1), etag='"v1"')
+
+    reader = TieredCache(disk=DiskCache(path))  # another worker on the same host
+    found = reader.get('k')
+    assert found.data == {'id': 1} and found.etag == '"v1"'
+    assert found.digest == stored.digest
+    assert reader.memory.get('k') is not None
+
+    renewed = reader.renew('k', found)
+    assert DiskCache(path).get('k').stored_at == renewed.stored_at
+
+    writer.invalidate_tag(athlete_tag(1))
+    assert DiskCache(path).get('k') is None
@@ -0,0 +1,32 @@
+# test_client.py :
+
+import pytest
+
+from api_clubplus.client import StravaClient
+from mock_strava import MockStrava
+
+
+@pytest.fixture
+def server():
+    server = MockStrava().start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_calls_share_one_pooled_connection(server):
+    client = StravaClient(api_url=f'{server.url}/api/v3')
+    for _ in range(5):
+        assert client.get('/athlete', 'token').status_code == 200
+    assert server.requests == 5
+    assert server.connections == 1
+
+
+def test_gets_are_retried_on_5xx(server):
+    server.error_rate = 1.0
+    client = StravaClient(api_url=f'{server.url}/api/v3', max_retries=2, backoff_factor=0)
+    response = client.get('/athlete', 'token')
+    assert response.status_code in (500, 503)
+    # The first attempt plus two retries, over the same connection
+    assert server.errors == 3
+    assert server.connections == 1
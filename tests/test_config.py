@@ -0,0 +1,21 @@
+import os
+
+from api_clubplus import create_app
+from api_clubplus.config import data_path
+
+
+def test_data_files_go_to_the_configured_directory(monkeypatch, tmp_path):
+    monkeypatch.setenv('STRAVA_DATA_DIR', str(tmp_path / 'data'))
+    assert data_path('strava_cache.db') == str(tmp_path / 'data' / 'strava_cache.db')
+    assert os.path.isdir(tmp_path / 'data')
+
+
+def test_data_files_default_to_the_instance_folder(monkeypatch, tmp_path):
+    monkeypatch.delenv('STRAVA_DATA_DIR', raising=False)
+    monkeypatch.chdir(tmp_path)
+    app = create_app(blueprints=())
+    app.instance_path = str(tmp_path / 'instance')
+    with app.app_context():
+        path = data_path('strava_ratelimit.db')
+    assert path == str(tmp_path / 'instance' / 'strava_ratelimit.db')
+    assert os.listdir(tmp_path) == ['instance']
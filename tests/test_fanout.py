@@ -0,0 +1,35 @@
+# test_fanout.py :
+
+import threading
+import time
+
+import pytest
+
+from api_clubplus.fanout import gather
+
+
+def test_results_come_back_in_call_order():
+    # The first call finishes last
+    results = gather(lambda: time.sleep(0.05) or 'slow', lambda: 'fast', lambda: 3)
+    assert results == ['slow', 'fast', 3]
+
+
+def test_calls_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+    # Each call waits for the other two, so this only returns if they overlap
+    assert gather(barrier.wait, barrier.wait, barrier.wait) is not None
+
+
+def test_an_error_is_raised_after_every_call_finished():
+    finished = []
+
+    def fail():
+        raise ValueError('upstream failed')
+
+    def slow():
+        time.sleep(0.05)
+        finished.append('slow')
+
+    with pytest.raises(ValueError, match='upstream failed'):
+        gather(fail, slow)
+    assert finished == ['slow']
@@ -0,0 +1,70 @@
+# test_feed.py :
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.feed import club_feed, is_member
+from api_clubplus.models import Activity, Club, User, init_db, user_club_table
+
+CLUB, MEMBERS, OUTSIDER = 1, (1, 2, 3, 4, 5), 6
+
+
+@pytest.fixture(scope='module')
+def feed_db(tmp_path_factory):
+    """Members with interleaved histories (some private, some sharing a start second) and an outsider"""
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('feed')}/feed.db")
+    init_db(engine)
+    rng = random.Random(3)
+    now = datetime(2024, 1, 1)
+    activities = []
+    for n in range(1, 301):
+        # Coarse start times so activities of different members share a second
+        activities.append({'id': n, 'user_id': rng.choice(MEMBERS + (OUTSIDER,)), 'name': f'Activity {n}',
+                           'dist': 1000.0, 'moving_time': 60, 'elapsed_time': 60, 'likes': 0,
+                           'start_date': now - timedelta(hours=rng.randrange(100)),
+                           'private': rng.random() < 0.2})
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {'id': user_id, 'first_name': f'Member {user_id}', 'last_name': 'X', 'created_at': now,
+             'updated_at': now} for user_id in MEMBERS + (OUTSIDER,)])
+        conn.execute(Club.__table__.insert(), {'id': CLUB, 'name': 'Club', 'admin_id': 1, 'verified': False})
+        conn.execute(user_club_table.insert(), [{'user_id': user_id, 'club_id': CLUB} for user_id in MEMBERS])
+        conn.execute(Activity.__table__.insert(), activities)
+    with sessionmaker(bind=engine)() as session:
+        yield session, activities
+    engine.dispose()
+
+
+@pytest.mark.parametrize('page_size', [1, 7, 50, 200])
+def test_pages_follow_the_merged_order(feed_db, page_size):
+    session, activities = feed_db
+    expected = [a['id'] for a in sorted(activities, key=lambda a: (a['start_date'], a['id']), reverse=True)
+                if a['user_id'] in MEMBERS and not a['private']]
+    seen, cursor = [], None
+    while True:
+        page = club_feed(session, CLUB, cursor=cursor, page_size=page_size)
+        assert len(page.activities) <= page_size
+        seen.extend(activity['id'] for activity in page.activities)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_activities_carry_their_athlete(feed_db):
+    session, activities = feed_db
+    owners = {a['id']: a['user_id'] for a in activities}
+    for activity in club_feed(session, CLUB, page_size=20).activities:
+        assert activity['athlete']['id'] == owners[activity['id']]
+        assert activity['athlete']['firstname'] == f"Member {owners[activity['id']]}"
+
+
+def test_membership_and_empty_clubs(feed_db):
+    session, _ = feed_db
+    assert is_member(session, CLUB, MEMBERS[0]) and not is_member(session, CLUB, OUTSIDER)
+    page = club_feed(session, CLUB + 1)
+    assert page.activities == [] and page.next_cursor is None
@@ -0,0 +1,87 @@
+# test_geo.py :
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import geo
+from api_clubplus.geo import BoundingBox, activities_in_box, activities_near
+from api_clubplus.models import Activity, init_db
+
+# id: (owner, private, lat, lng)
+POINTS = {
+    1: (1, False, 51.5, -0.12),       # London
+    2: (2, True, 51.5045, -0.12),     # 500 m north of it, private
+    3: (1, False, 51.545, -0.12),     # 5 km north
+    4: (1, False, -17.0, 179.95),     # Fiji, either side of the antimeridian
+    5: (2, False, -17.0, -179.95),
+    6: (1, False, -17.0, 170.0),      # 1000 km west of them
+}
+
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('geo')}/geo.db")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.execute(Activity.__table__.insert(), [
+            {'id': i, 'user_id': owner, 'name': f'Activity {i}', 'dist': 1000.0, 'moving_time': 60,
+             'elapsed_time': 60, 'likes': 0, 'private': private, 'start_lat': lat, 'start_lng': lng,
+             'start_date': datetime(2024, 1, 1) + timedelta(days=i)}
+            for i, (owner, private, lat, lng) in POINTS.items()])
+    with sessionmaker(bind=engine)() as session:
+        assert geo.has_rtree(session)
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture(params=['rtree', 'index'])
+def index(request, session, monkeypatch):
+    """Run a test on the R*Tree and again on the lat/lng index"""
+    if request.param == 'index':
+        monkeypatch.setattr(geo, 'has_rtree', lambda session: False)
+    return request.param
+
+
+def ids(page):
+    return [activity['id'] for activity in page.activities]
+
+
+def test_near_keeps_private_activities_to_their_owner(session, index):
+    assert ids(activities_near(session, 51.5, -0.12, 1000, viewer_id=1)) == [1]
+    page = activities_near(session, 51.5, -0.12, 1000, viewer_id=2)
+    assert ids(page) == [2, 1]
+    assert [activity['distance'] for activity in page.activities] == pytest.approx([500.4, 0.0], abs=1)
+    assert ids(activities_near(session, 51.5, -0.12, 6000, viewer_id=1)) == [3, 1]
+
+
+def test_near_reaches_across_the_antimeridian(session, index):
+    page = activities_near(session, -17.0, 179.99, 20000)
+    assert ids(page) == [5, 4]
+    assert all(activity['distance'] < 10000 for activity in page.activities)
+
+
+def test_bbox_crossing_the_antimeridian(session, index):
+    assert ids(activities_in_box(session, BoundingBox.from_string('-18,179,-16,-179'))) == [5, 4]
+    assert ids(activities_in_box(session, BoundingBox.from_string('-18,169,-16,171'))) == [6]
+    assert ids(activities_in_box(session, BoundingBox.from_string('-18,-179,-16,179'))) == [6]
+
+
+def test_bbox_pages_with_a_cursor(session, index):
+    box = BoundingBox(-90, -180, 90, 180)
+    seen, cursor = [], None
+    while True:
+        page = activities_in_box(session, box, viewer_id=1, cursor=cursor, page_size=2)
+        seen.extend(ids(page))
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [6, 5, 4, 3, 1]
+
+
+def test_malformed_boxes_are_rejected():
+    for value in ('', '1,2,3', '10,0,5,1', '0,0,1,nan', '0,-181,1,0'):
+        with pytest.raises(ValueError):
+            BoundingBox.from_string(value)
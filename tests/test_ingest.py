@@ -0,0 +1,54 @@
+# test_ingest.py :
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.ingest import BulkIngest, ingest_batch
+from api_clubplus.leaderboard import ChallengeStandings
+from api_clubplus.models import Activity, init_db, user_activity_table
+from mock_strava import make_activity
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/ingest.db')
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def standings(engine):
+    return ChallengeStandings(sessionmaker(bind=engine), flush_interval=None)
+
+
+def counts(conn):
+    return (conn.execute(select(func.count()).select_from(Activity)).scalar(),
+            conn.execute(select(func.count()).select_from(user_activity_table)).scalar())
+
+
+def test_ingesting_a_batch_again_updates_in_place(engine, standings):
+    batch = [make_activity(i) for i in range(1, 4)]
+    with engine.begin() as conn:
+        ingest_batch(conn, batch, standings=standings)
+    batch[0]['name'] = 'Renamed'
+    with engine.begin() as conn:
+        rows = ingest_batch(conn, batch, standings=standings)
+    assert [row['id'] for row in rows] == [1, 2, 3]
+
+    with engine.connect() as conn:
+        assert counts(conn) == (3, 3)
+        assert conn.execute(select(Activity.name, Activity.user_id).where(Activity.id == 1)).one() == \
+            ('Renamed', 1)
+        assert conn.execute(select(Activity.start_lat, Activity.start_lng).where(Activity.id == 2)).one() == \
+            (51.5002, -0.12)
+
+
+def test_bulk_ingest_writes_in_batches(engine, standings):
+    ingest = BulkIngest(engine, batch_size=4, standings=standings)
+    assert ingest.ingest(make_activity(i) for i in range(1, 11)) == 10
+    # Overlapping the first run: upserted, not duplicated
+    assert ingest.ingest((make_activity(i) for i in range(5, 13)), user_id=1) == 8
+    with engine.connect() as conn:
+        assert counts(conn) == (12, 12)
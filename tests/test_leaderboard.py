@@ -0,0 +1,107 @@
+import random
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.ingest import ingest_batch
+from api_clubplus.leaderboard import ChallengeStandings, Leaderboard
+from api_clubplus.models import Challenge, Leadership, init_db
+from mock_strava import make_activity
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/leaderboard.db')
+    init_db(engine)
+    with engine.begin() as conn:
+        for challenge_id, activity_type in ((1, 'Run'), (2, 'Kayaking')):
+            conn.execute(Challenge.__table__.insert(), {
+                'id': challenge_id, 'name': f'{activity_type} distance', 'activity_type': activity_type,
+                'metric': 'distance', 'start_date': datetime(2023, 1, 1), 'start_time': datetime(2023, 1, 1),
+                'end_date': datetime(2023, 12, 31), 'end_time': datetime(2023, 12, 31, 23, 59, 59),
+                'complete': False,
+            })
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def activity(activity_id, athlete_id, distance):
+    data = make_activity(activity_id)
+    data['athlete'] = {'id': athlete_id}
+    data['distance'] = distance
+    return data
+
+
+def test_ranks_match_a_full_sort():
+    rng = random.Random(5)
+    board = Leaderboard(1, ((user_id, rng.choice([10.0, 20.0, 30.0, rng.random()])) for user_id in range(500)))
+    for user_id in rng.sample(range(500), 100):
+        board.set(user_id, rng.choice([20.0, rng.random()]))
+    ordered = sorted(board.scores.values(), reverse=True)
+    for user_id, score in board.scores.items():
+        assert board.rank(user_id) == ordered.index(score) + 1
+    assert [score for _, _, score in board.ranked()] == ordered
+
+
+def test_board_reloads_after_another_workers_write(session_factory):
+    reader = ChallengeStandings(session_factory, flush_interval=None)
+    writer = ChallengeStandings(session_factory, flush_interval=None)
+    with session_factory() as session:
+        for athlete_id in (1, 2):
+            writer.join(session, 1, athlete_id)
+        session.commit()
+    assert reader.top(1) == [(1, 1, 0.0), (1, 2, 0.0)]
+
+    with session_factory() as session:
+        ingest_batch(session, [activity(1, 2, 5000.0)], standings=writer)
+        session.commit()
+    assert reader.top(1) == [(1, 2, 5000.0), (2, 1, 0.0)]
+    assert reader.rank(1, 1) == (2, 0.0)
+
+
+def test_sport_without_a_sport_type_row_matches_nothing(session_factory):
+    standings = ChallengeStandings(session_factory, flush_interval=None)
+    with session_factory() as session:
+        standings.join(session, 2, 1)
+        session.commit()
+        data = activity(2, 1, 5000.0)
+        data['type'] = data['sport_type'] = None
+        ingest_batch(session, [data], standings=standings)
+        session.commit()
+    assert standings.rank(2, 1) == (1, 0.0)
+
+
+def test_long_lived_session_keeps_one_pair_of_listeners(session_factory):
+    standings = ChallengeStandings(session_factory, flush_interval=None)
+    with session_factory() as session:
+        standings.join(session, 1, 1)
+        session.commit()
+        for i in range(20):
+            ingest_batch(session, [activity(100 + i, 1, 1000.0)], standings=standings)
+            if i % 2:
+                session.rollback()
+            else:
+                session.commit()
+        assert len(session.dispatch.after_commit) == 1
+        assert len(session.dispatch.after_rollback) == 1
+    assert standings.rank(1, 1) == (1, 10000.0)
+
+
+def test_ranks_are_flushed_after_a_change(session_factory):
+    standings = ChallengeStandings(session_factory, flush_interval=0.01)
+    with session_factory() as session:
+        standings.join(session, 1, 1)
+        standings.join(session, 1, 2)
+        ingest_batch(session, [activity(3, 2, 5000.0)], standings=standings)
+        session.commit()
+    deadline = time.monotonic() + 5
+    while True:
+        with session_factory() as session:
+            ranks = dict(session.execute(select(Leadership.user_id, Leadership.rank)).all())
+        if ranks == {1: 2, 2: 1} or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert ranks == {1: 2, 2: 1}
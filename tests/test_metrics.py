@@ -0,0 +1,41 @@
+# test_metrics.py :
+
+from api_clubplus import create_app
+from api_clubplus.metrics import Counter, Histogram, Registry
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.register(Counter('demo_requests_total', 'Requests', ('route',)))
+    latency = registry.register(Histogram('demo_seconds', 'Latency', buckets=(0.1, 1.0)))
+    requests.inc(route='/a')
+    requests.inc(2, route='/a "quoted"')
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+    assert registry.expose().splitlines() == [
+        '# HELP demo_requests_total Requests',
+        '# TYPE demo_requests_total counter',
+        'demo_requests_total{route="/a"} 1',
+        'demo_requests_total{route="/a \\"quoted\\""} 2',
+        '# HELP demo_seconds Latency',
+        '# TYPE demo_seconds histogram',
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1.0"} 2',
+        'demo_seconds_bucket{le="+Inf"} 3',
+        'demo_seconds_sum 5.55',
+        'demo_seconds_count 3',
+    ]
+
+
+def test_apps_serve_their_requests_on_metrics():
+    client = create_app(blueprints=('api',), import_name='metrics-test').test_client()
+    response = client.get('/authorize')
+    assert 'total;dur=' in response.headers['Server-Timing']
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    assert metrics.mimetype == 'text/plain'
+    body = metrics.get_data(as_text=True)
+    assert 'http_requests_total{app="metrics-test",endpoint="/authorize",method="GET",status="200"} 1' in body
+    assert 'http_request_duration_seconds_count{app="metrics-test",endpoint="/authorize"} 1' in body
+    assert '# TYPE singleflight_calls_total counter' in body
@@ -0,0 +1,45 @@
+# test_models.py :
+
+from sqlalchemy import create_engine, inspect
+
+from api_clubplus.models import init_db
+
+# activities and users as the original create_database.py made them
+OLD_SCHEMA = (
+    """CREATE TABLE sport_types (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL)""",
+    """CREATE TABLE users (id INTEGER PRIMARY KEY, first_name VARCHAR(50) NOT NULL,
+           last_name VARCHAR(50) NOT NULL, sex VARCHAR(10) NOT NULL, created_at DATETIME NOT NULL,
+           updated_at DATETIME NOT NULL, email VARCHAR(255) NOT NULL UNIQUE)""",
+    """CREATE TABLE activities (id INTEGER PRIMARY KEY, name VARCHAR(255), dist FLOAT NOT NULL,
+           moving_time INTEGER NOT NULL, elapsed_time INTEGER NOT NULL, total_elevation_gain FLOAT,
+           elevation_high FLOAT, elevation_low FLOAT, sport_type_id INTEGER REFERENCES sport_types(id),
+           start_date DATETIME NOT NULL, start_date_local DATETIME, timezone VARCHAR(50),
+           start_latlng VARCHAR, end_latlng VARCHAR, avg_speed FLOAT, max_speed FLOAT,
+           private BOOLEAN NOT NULL, likes INTEGER NOT NULL)""",
+    """INSERT INTO activities (id, name, dist, moving_time, elapsed_time, start_date, start_latlng,
+           end_latlng, private, likes)
+       VALUES (1, 'Old ride', 1000, 60, 60, '2020-01-01 00:00:00', '51.5,-0.12', '51.52,-0.1', 0, 0)""",
+)
+
+
+def test_init_db_upgrades_an_old_database(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/old.db')
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+    init_db(engine)
+    init_db(engine)  # and again, with nothing left to add
+
+    inspector = inspect(engine)
+    columns = {column['name'] for column in inspector.get_columns('activities')}
+    assert {'user_id', 'start_lat', 'start_lng'} <= columns
+    indexes = {index['name'] for index in inspector.get_indexes('activities')}
+    assert 'ix_activities_user_start' in indexes
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT name, user_id FROM activities").all() == [('Old ride', None)]
+        # Coordinates parsed from the stored strings, and the start point indexed
+        assert conn.exec_driver_sql("SELECT start_lat, start_lng, end_lat, end_lng FROM activities").all() == \
+            [(51.5, -0.12, 51.52, -0.1)]
+        assert conn.exec_driver_sql("SELECT id FROM activity_geo WHERE min_lat <= 51.5 AND max_lat >= 51.5"
+                                    " AND min_lng <= -0.12 AND max_lng >= -0.12").all() == [(1,)]
@@ -0,0 +1,116 @@
+# test_queries.py :
+#
+# The read-side lookups in api_clubplus.queries must be served by the
+# composite indexes (no full scan of `activities`, no sort in a temporary
+# B-tree), checked with EXPLAIN QUERY PLAN on a small analyzed database.
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import queries
+from api_clubplus.models import Activity, Comment, SportType, init_db, user_activity_table
+
+USER = 7
+MONTH = (datetime(2020, 3, 1), datetime(2020, 4, 1))
+
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('queries')}/queries.db")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.execute(SportType.__table__.insert(), [{'id': 1, 'name': 'Run'}, {'id': 2, 'name': 'Ride'}])
+        rows = [{'id': i, 'user_id': i % 50, 'name': f'Activity {i}', 'dist': 5000.0, 'moving_time': 1500,
+                 'elapsed_time': 1600, 'sport_type_id': i % 2 + 1,
+                 'start_date': datetime(2019, 1, 1) + timedelta(hours=7 * i), 'private': False, 'likes': 0}
+                for i in range(1, 5001)]
+        conn.execute(Activity.__table__.insert(), rows)
+        conn.execute(user_activity_table.insert(),
+                     [{'user_id': row['user_id'], 'activity_id': row['id']} for row in rows])
+        conn.execute(text("ANALYZE"))
+    with sessionmaker(bind=engine)() as session:
+        yield session
+    engine.dispose()
+
+
+def assert_plan(session, query, index):
+    plan = queries.explain(session, query)
+    joined = ' | '.join(plan)
+    assert any(index in step for step in plan), f"{index} not used: {joined}"
+    assert not any(step.startswith('SCAN activities') for step in plan), f"full scan: {joined}"
+    assert not any('TEMP B-TREE' in step for step in plan), f"sort not served by index: {joined}"
+
+
+def test_date_range_uses_user_start_index(session):
+    assert_plan(session, queries.activities_query(USER, *MONTH), 'ix_activities_user_start')
+
+
+def test_sport_and_date_range_uses_user_sport_start_index(session):
+    run = queries.sport_type_id(session, 'Run')
+    assert_plan(session, queries.activities_query(USER, *MONTH, run), 'ix_activities_user_sport_start')
+
+
+def test_latest_activities_use_user_start_index(session):
+    assert_plan(session, queries.activities_query(USER), 'ix_activities_user_start')
+
+
+def test_association_and_comment_lookups_use_their_indexes(session):
+    plan = queries.explain(session, select(user_activity_table.c.user_id)
+                           .where(user_activity_table.c.activity_id == 123))
+    assert any('ix_user_activity_activity_id' in step for step in plan), plan
+    plan = queries.explain(session, select(Comment.id).where(Comment.user_id == USER))
+    assert any('ix_comments_user_id' in step for step in plan), plan
+
+
+def test_range_query_returns_newest_first(session):
+    activities = queries.activities_in_range(session, USER, *MONTH)
+    expected = [i for i in range(5000, 0, -1) if i % 50 == USER
+                and MONTH[0] <= datetime(2019, 1, 1) + timedelta(hours=7 * i) < MONTH[1]]
+    assert expected
+    assert [activity['id'] for activity in activities] == expected
+
+
+def test_activity_page_cursors_walk_forward_and_back(session):
+    expected = [i for i in range(5000, 0, -1) if i % 50 == USER]
+    pages, cursor = [], None
+    while True:
+        page = queries.activity_page(session, USER, cursor=cursor, page_size=30)
+        pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [a['id'] for page in pages for a in page.activities] == expected
+    assert [len(page.activities) for page in pages] == [30, 30, 30, 10]
+    assert pages[0].prev_cursor is None
+
+    # Back from the last page, one page at a time, to the first
+    page = pages[-1]
+    for previous in reversed(pages[:-1]):
+        page = queries.activity_page(session, USER, cursor=page.prev_cursor, backwards=True, page_size=30)
+        assert [a['id'] for a in page.activities] == [a['id'] for a in previous.activities]
+    assert page.prev_cursor is None
+
+
+def test_activity_page_rejects_a_malformed_cursor(session):
+    with pytest.raises(ValueError):
+        queries.activity_page(session, USER, cursor='not-a-cursor')
+
+
+def test_activity_page_splits_a_second_between_pages(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/ties.db')
+    init_db(engine)
+    same = datetime(2021, 6, 1, 8)
+    with engine.begin() as conn:
+        conn.execute(Activity.__table__.insert(), [
+            {'id': i, 'user_id': USER, 'name': f'Activity {i}', 'dist': 1.0, 'moving_time': 1,
+             'elapsed_time': 1, 'start_date': same, 'private': False, 'likes': 0} for i in range(1, 6)])
+    with sessionmaker(bind=engine)() as session:
+        first = queries.activity_page(session, USER, page_size=2)
+        second = queries.activity_page(session, USER, cursor=first.next_cursor, page_size=2)
+        third = queries.activity_page(session, USER, cursor=second.next_cursor, page_size=2)
+    engine.dispose()
+    assert [[a['id'] for a in page.activities] for page in (first, second, third)] == [[5, 4], [3, 2], [1]]
+    assert third.next_cursor is None
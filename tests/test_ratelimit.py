@@ -0,0 +1,80 @@
+import pytest
+
+from api_clubplus.ratelimit import BACKGROUND, INTERACTIVE, SHORT_WINDOW, RateLimited, RateLimitScheduler
+
+
+class Clock:
+    """Time that only moves when the scheduler sleeps"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code=200, limit=None, usage=None):
+        self.status_code = status_code
+        self.headers = {}
+        if limit:
+            self.headers['X-RateLimit-Limit'] = limit
+        if usage:
+            self.headers['X-RateLimit-Usage'] = usage
+
+
+@pytest.fixture
+def clock():
+    # Start of a quarter hour, so the window doesn't roll mid-test
+    return Clock(1_700_000_000.0 - 1_700_000_000.0 % SHORT_WINDOW)
+
+
+def scheduler(tmp_path, clock, **kwargs):
+    # 100 calls per 15 minutes: a bucket of 25, a fifth of it kept for interactive calls
+    return RateLimitScheduler(str(tmp_path / 'ratelimit.db'), short_limit=100, daily_limit=1000,
+                              reserve=0.2, burst_fraction=0.25, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_background_calls_leave_the_interactive_reserve(tmp_path, clock):
+    limiter = scheduler(tmp_path, clock)
+    for _ in range(20):
+        limiter.acquire(BACKGROUND)
+    assert limiter._try_acquire(BACKGROUND) > 0
+    for _ in range(5):
+        limiter.acquire(INTERACTIVE)
+    assert limiter.headroom() == (75, 975)
+
+
+def test_interactive_caller_gives_up_past_its_wait_budget(tmp_path, clock):
+    limiter = scheduler(tmp_path, clock)
+    for _ in range(25):
+        limiter.acquire(INTERACTIVE)
+    # One token refills in 9 s, more than the 2 s interactive budget
+    with pytest.raises(RateLimited) as raised:
+        limiter.acquire(INTERACTIVE)
+    assert raised.value.retry_after == pytest.approx(9.0)
+    clock.now += 9
+    limiter.acquire(INTERACTIVE)
+
+
+def test_workers_share_one_quota(tmp_path, clock):
+    first, second = scheduler(tmp_path, clock), scheduler(tmp_path, clock)
+    for _ in range(10):
+        first.acquire(INTERACTIVE)
+    assert second.headroom() == (90, 990)
+
+
+def test_strava_headers_resync_usage(tmp_path, clock):
+    limiter = scheduler(tmp_path, clock)
+    limiter.update(Response(limit='600,30000', usage='590,12000'))
+    assert limiter.headroom() == (10, 18000)
+    limiter.update(Response(status_code=429))
+    assert limiter.headroom()[0] == 0
+    with pytest.raises(RateLimited):
+        limiter.acquire(INTERACTIVE)
+    # The quarter hour rolls over and calls are admitted again
+    clock.now += SHORT_WINDOW
+    limiter.acquire(INTERACTIVE)
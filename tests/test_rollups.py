@@ -0,0 +1,66 @@
+# test_rollups.py :
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus import rollups
+from api_clubplus.ingest import ingest_batch
+from api_clubplus.leaderboard import ChallengeStandings
+from api_clubplus.models import ActivityRollup, init_db
+from mock_strava import make_activity
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/rollups.db')
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def ingest(engine):
+    standings = ChallengeStandings(sessionmaker(bind=engine), flush_interval=None)
+
+    def write(activities):
+        with engine.begin() as conn:
+            ingest_batch(conn, activities, standings=standings)
+    return write
+
+
+def snapshot(engine):
+    with engine.connect() as conn:
+        return sorted(tuple(row) for row in conn.execute(select(ActivityRollup.__table__)))
+
+
+def test_deltas_match_a_rebuild(engine, ingest):
+    activities = [make_activity(i) for i in range(1, 40)]
+    ingest(activities)
+    # Edits: a longer distance, a move to another week, and a sport change
+    activities[0]['distance'] = 42195.0
+    activities[1]['start_date'] = activities[1]['start_date_local'] = '2023-06-01T07:00:00Z'
+    activities[2]['type'] = activities[2]['sport_type'] = 'Ride'
+    ingest(activities[:3])
+    ingest(activities)  # and the whole batch again: nothing changes
+
+    maintained = snapshot(engine)
+    with engine.begin() as conn:
+        rollups.rebuild(conn)
+    assert snapshot(engine) == maintained
+    with engine.connect() as conn:
+        weekly = conn.execute(select(ActivityRollup.activity_count).where(ActivityRollup.period == 'week'))
+        assert sum(weekly.scalars()) == len(activities)
+
+
+def test_a_moved_activity_leaves_its_old_period(engine, ingest):
+    activity = make_activity(1)
+    ingest([activity])
+    activity['start_date'] = activity['start_date_local'] = '2023-06-01T07:00:00Z'
+    ingest([activity])
+    with sessionmaker(bind=engine)() as session:
+        months = rollups.summary(session, 1, 'month', 12, today=date(2023, 12, 1))
+    assert [(row['period_start'].isoformat(), row['activities'], row['distance']) for row in months] == \
+        [('2023-06-01', 1, activity['distance'])]
@@ -0,0 +1,104 @@
+# test_search.py :
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api_clubplus.models import Activity, Challenge, Comment, init_db, user_challenge_table, user_club_table
+from api_clubplus.search import has_search_index, match_expression, search
+
+ATHLETE, MEMBER, OUTSIDER, CLUB = 1, 2, 3, 10
+
+
+@pytest.fixture(scope='module')
+def search_db(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('search')}/search.db")
+    init_db(engine)
+    when = datetime(2024, 1, 1)
+    # Every fourth one private; names repeat "tempo" a varying number of times so ranks differ
+    activities = [{'id': i, 'user_id': (ATHLETE, MEMBER, OUTSIDER)[i % 3], 'private': i % 4 == 0,
+                   'name': ' '.join(['Tempo'] * (i % 5 + 1) + ['run', str(i)]), 'dist': 1.0,
+                   'moving_time': 1, 'elapsed_time': 1, 'likes': 0, 'start_date': when} for i in range(1, 61)]
+    with engine.begin() as conn:
+        conn.execute(Activity.__table__.insert(), activities)
+        conn.execute(Activity.__table__.insert(), {'id': 61, 'user_id': ATHLETE, 'private': False,
+                                                   'name': 'Easy ride', 'dist': 1.0, 'moving_time': 1,
+                                                   'elapsed_time': 1, 'likes': 0, 'start_date': when})
+        conn.execute(Comment.__table__.insert(), [
+            {'id': 1, 'user_id': ATHLETE, 'comment': 'Great tempo today', 'created_at': when},
+            {'id': 2, 'user_id': OUTSIDER, 'comment': 'Tempo tempo', 'created_at': when}])
+        conn.execute(Challenge.__table__.insert(), [
+            {'id': i, 'name': f'Tempo challenge {i}', 'description': 'Run fast', 'club_id': club,
+             'activity_type': 'Run', 'metric': 'distance', 'complete': False, 'start_date': when,
+             'start_time': when, 'end_date': when, 'end_time': when} for i, club in ((1, CLUB), (2, None))])
+        conn.execute(user_challenge_table.insert(), {'user_id': ATHLETE, 'challenge_id': 2})
+        conn.execute(user_club_table.insert(), [{'user_id': ATHLETE, 'club_id': CLUB},
+                                                {'user_id': MEMBER, 'club_id': CLUB}])
+    with sessionmaker(bind=engine)() as session:
+        assert has_search_index(session)
+        yield session, activities
+    engine.dispose()
+
+
+def ids(page):
+    return [result['id'] for result in page.results]
+
+
+def every_page(session, order, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = search(session, 'activities', 'tempo', cursor=cursor, page_size=3, order=order, **kwargs)
+        pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+def test_search_covers_only_the_athletes_own_activities(search_db):
+    session, activities = search_db
+    own = {a['id'] for a in activities if a['user_id'] == ATHLETE}
+    assert set(ids(search(session, 'activities', 'tempo', ATHLETE, page_size=200))) == own
+    # Prefixes and phrases; private ones included for their owner
+    assert set(ids(search(session, 'activities', 'tem*', ATHLETE, page_size=200))) == own
+    assert ids(search(session, 'activities', '"easy ride"', ATHLETE)) == [61]
+    assert ids(search(session, 'activities', 'easy', MEMBER)) == []
+
+
+def test_club_search_covers_members_public_activities(search_db):
+    session, activities = search_db
+    expected = {a['id'] for a in activities if a['user_id'] in (ATHLETE, MEMBER) and not a['private']}
+    assert set(ids(search(session, 'activities', 'tempo', ATHLETE, club_id=CLUB, page_size=200))) == expected
+
+
+def test_comments_and_challenges_are_scoped(search_db):
+    session, _ = search_db
+    assert ids(search(session, 'comments', 'tempo', ATHLETE)) == [1]
+    assert ids(search(session, 'challenges', 'tempo', ATHLETE)) == [2]
+    assert ids(search(session, 'challenges', 'tempo', ATHLETE, club_id=CLUB)) == [1]
+
+
+@pytest.mark.parametrize('order', ['rank', 'recent'])
+def test_cursor_pages_follow_the_single_page_order(search_db, order):
+    session, _ = search_db
+    whole = ids(search(session, 'activities', 'tempo', ATHLETE, page_size=200, order=order))
+    pages = every_page(session, order, user_id=ATHLETE)
+    assert [i for page in pages for i in ids(page)] == whole
+    if order == 'rank':
+        scores = [result['score'] for page in pages for result in page.results]
+        assert scores == sorted(scores, reverse=True)
+    else:
+        assert whole == sorted(whole, reverse=True)
+
+
+def test_cursors_and_queries_are_validated(search_db):
+    session, _ = search_db
+    recent = search(session, 'activities', 'tempo', ATHLETE, page_size=1, order='recent').next_cursor
+    with pytest.raises(ValueError):
+        search(session, 'activities', 'tempo', ATHLETE, cursor=recent, order='rank')
+    with pytest.raises(ValueError):
+        search(session, 'activities', '*** ""', ATHLETE)
+    # FTS5 operators in the input are just words
+    assert match_expression('tempo OR NEAR(x) -y', ['name']) == \
+        '{name} : ("tempo" "OR" "NEAR" "x" "y")'
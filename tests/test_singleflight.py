@@ -0,0 +1,68 @@
+# test_singleflight.py :
+
+import threading
+import time
+
+from api_clubplus.metrics import SINGLEFLIGHT
+from api_clubplus.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def run_together(flight, outcome):
+    """Call flight.do('k', ...) from CALLERS threads at once
+
+    The call that runs waits until every caller has joined the flight, then
+    returns (or raises) outcome().  Returns (results, errors, executions).
+    """
+    results, errors, executions = [None] * CALLERS, [None] * CALLERS, []
+
+    def fn():
+        executions.append(1)
+        deadline = time.monotonic() + 5
+        while flight.stats()['requests'] < CALLERS and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return outcome()
+
+    def call(i):
+        try:
+            results[i] = flight.do('k', fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, executions
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight('test-share')
+    results, errors, executions = run_together(flight, lambda: {'id': 1})
+    assert executions == [1]
+    assert errors == [None] * CALLERS
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert (stats['requests'], stats['executions'], stats['shared']) == (CALLERS, 1, CALLERS - 1)
+
+
+def test_callers_share_the_exception():
+    flight = SingleFlight('test-error')
+
+    def fail():
+        raise ValueError('upstream failed')
+
+    results, errors, executions = run_together(flight, fail)
+    assert executions == [1]
+    assert all(isinstance(error, ValueError) for error in errors)
+    # Nothing is remembered: the next call runs again
+    assert flight.do('k', lambda: 'again') == 'again'
+
+
+def test_leaders_and_followers_are_counted_in_metrics():
+    run_together(SingleFlight('test-metrics'), lambda: None)
+    exposed = SINGLEFLIGHT.expose()
+    assert 'singleflight_calls_total{flight="test-metrics",role="leader"} 1' in exposed
+    assert f'singleflight_calls_total{{flight="test-metrics",role="follower"}} {CALLERS - 1}' in exposed
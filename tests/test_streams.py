@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from api_clubplus.streams import (DELTA_I32, DELTA_I64, STREAM_SPECS, StreamView,  # noqa: E402
+                                  encode_stream)
+
+
+def round_trip(values, stream_type, block_size=4):
+    components, scale = STREAM_SPECS[stream_type]
+    encoding, blob = encode_stream(values, components, scale, block_size=block_size)
+    return encoding, StreamView(blob, encoding, scale)
+
+
+def test_round_trip_and_slices():
+    values = [round(100 + i * 0.3, 1) for i in range(11)]
+    encoding, view = round_trip(values, 'altitude')
+    assert encoding == DELTA_I32
+    assert len(view) == 11
+    assert np.allclose(view.array(), values)
+    assert np.allclose(view[3:9], values[3:9])
+    assert np.allclose(view[1:10:3], values[1:10:3])
+    assert np.allclose(view[::-2], values[::-2])
+    assert view[-1] == pytest.approx(values[-1])
+    with pytest.raises(IndexError):
+        view[11]
+
+
+def test_empty_stream():
+    encoding, view = round_trip([], 'latlng')
+    assert len(view) == 0
+    assert view.array().shape == (0, 2)
+    assert view[0:10].shape == (0, 2)
+    assert view[::-1].shape == (0, 2)
+
+
+def test_empty_slice_of_a_stream():
+    _, view = round_trip(list(range(10)), 'heartrate')
+    assert view[5:5].shape == (0,)
+    assert view[8:2].shape == (0,)
+    # Nothing was decoded to answer them
+    assert view._blocks == {}
+
+
+def test_latlng_across_the_antimeridian():
+    track = [[0.0, 179.9999], [0.0, -179.9999], [0.0000001, 179.9999999]]
+    encoding, view = round_trip(track, 'latlng')
+    assert encoding == DELTA_I64
+    assert np.allclose(view.array(), track, rtol=0, atol=1e-7)
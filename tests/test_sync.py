@@ -0,0 +1,44 @@
+# test_sync.py :
+
+import time
+
+from api_clubplus.models import Activity, Session, init_db
+from api_clubplus.sync import ActivitySync
+from mock_strava import make_activity
+
+ATHLETE = 7
+
+
+def test_backfill_keeps_activities_sharing_the_cursor_second(strava):
+    init_db()
+    # Two pairs of activities that started in the same second, straddling page boundaries
+    activities = [make_activity(i) for i in range(9101, 9106)]
+    for activity, epoch in zip(activities, (1700000500, 1700000400, 1700000400, 1700000300, 1700000300)):
+        activity['start_date'] = activity['start_date_local'] = time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                                                              time.gmtime(epoch))
+    strava.add(*activities)
+    sync = ActivitySync(client=strava, page_size=2, background_backfill=False)
+
+    sync.sync(ATHLETE, 'token')
+
+    with Session() as session:
+        stored = {a.id for a in session.query(Activity).filter_by(user_id=ATHLETE)}
+    assert stored == {a['id'] for a in activities}
+
+
+def test_incremental_sync_keeps_activities_sharing_the_high_water_second(strava):
+    init_db()
+    athlete = ATHLETE + 1
+    first, second = make_activity(9201), make_activity(9202)
+    for activity in (first, second):
+        activity['start_date'] = activity['start_date_local'] = '2024-03-01T08:00:00Z'
+    strava.add(first)
+    sync = ActivitySync(client=strava, background_backfill=False)
+    sync.sync(athlete, 'token')
+
+    # Uploaded later, but started in the same second as the high-water mark
+    strava.add(second)
+    assert sync.sync(athlete, 'token', force=True) == 2
+
+    with Session() as session:
+        assert session.get(Activity, second['id']) is not None
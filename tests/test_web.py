@@ -0,0 +1,100 @@
+# test_web.py :
+
+from datetime import datetime
+
+import pytest
+import requests
+
+from api_clubplus import create_app
+from api_clubplus.models import Challenge, Club, Session, init_db, user_club_table
+from api_clubplus.ratelimit import RateLimited
+from api_clubplus.sync import ActivitySync
+from mock_strava import make_activity
+
+
+CLUB, CHALLENGE = 501, 501
+
+
+@pytest.fixture
+def app():
+    # Templates and static files are the ones next to app.py
+    return create_app(blueprints=('web',), import_name='app')
+
+
+@pytest.fixture
+def client(app, web_strava, logged_in):
+    return logged_in(app)
+
+
+@pytest.fixture
+def club_challenge(strava):
+    """A challenge of a club whose only member is the logged-in athlete"""
+    init_db()
+    with Session() as session:
+        session.add(Club(id=CLUB, name='Club', admin_id=strava.athlete_id, verified=False))
+        session.add(Challenge(id=CHALLENGE, name='Club distance', activity_type='Any', metric='distance',
+                              start_date=datetime(2024, 1, 1), start_time=datetime(2024, 1, 1),
+                              end_date=datetime(2024, 12, 31), end_time=datetime(2024, 12, 31),
+                              complete=False, club_id=CLUB))
+        session.execute(user_club_table.insert(), {'user_id': strava.athlete_id, 'club_id': CLUB})
+        session.commit()
+    yield CHALLENGE
+    with Session() as session:
+        session.execute(user_club_table.delete().where(user_club_table.c.club_id == CLUB))
+        session.query(Challenge).filter_by(id=CHALLENGE).delete()
+        session.query(Club).filter_by(id=CLUB).delete()
+        session.commit()
+
+
+def test_dashboard_etag_covers_the_posted_date_range(client):
+    unfiltered = client.get('/dashboard')
+    assert unfiltered.status_code == 200
+    filtered = client.post('/dashboard', data={'start_date': '01-01-2024', 'end_date': '31-01-2024'})
+    assert filtered.status_code == 200
+    assert filtered.headers['ETag'] != unfiltered.headers['ETag']
+
+    # The filtered page's tag must not validate the unfiltered one
+    revalidated = client.get('/dashboard', headers={'If-None-Match': filtered.headers['ETag']})
+    assert revalidated.status_code == 200
+    assert client.get('/dashboard', headers={'If-None-Match': unfiltered.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('error, status', [
+    (RateLimited(30), 429),
+    (requests.ConnectionError("connection refused"), 502),
+])
+def test_dashboard_shows_the_error_page_when_strava_fails(client, web_strava, error, status):
+    web_strava.error = error
+    response = client.get('/dashboard')
+    assert response.status_code == status
+    assert b'Access Might Be Revoked' in response.data
+    if status == 429:
+        assert response.headers['Retry-After'] == '30'
+
+
+def test_club_challenge_leaderboard_is_for_members_only(app, client, logged_in, strava, club_challenge):
+    url = f'/challenges/{club_challenge}/leaderboard'
+    assert client.get(url).status_code == 200
+    assert client.get(url).json['top'] == []
+    assert app.test_client().get(url).status_code == 401
+    assert logged_in(app, athlete_id=strava.athlete_id + 1).get(url).status_code == 403
+    assert client.get('/challenges/999999/leaderboard').status_code == 404
+
+
+def test_activity_rows_are_rendered_again_after_a_write(app, logged_in, strava):
+    init_db()
+    athlete = strava.athlete_id + 100
+    sync = ActivitySync(client=strava, background_backfill=False)
+    sync.store_activity(athlete, make_activity(9401))
+    client = logged_in(app, athlete_id=athlete)
+
+    first = client.get('/dashboard/activities')
+    assert b'Morning Run 9401' in first.data
+    # Same data version: served from the fragment cache, same validator
+    assert client.get('/dashboard/activities').headers['ETag'] == first.headers['ETag']
+
+    renamed = dict(make_activity(9401), name='Renamed run')
+    sync.store_activity(athlete, renamed)
+    second = client.get('/dashboard/activities')
+    assert b'Renamed run' in second.data and b'Morning Run 9401' not in second.data
+    assert second.headers['ETag'] != first.headers['ETag']
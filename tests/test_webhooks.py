@@ -0,0 +1,87 @@
+# test_webhooks.py :
+
+import time
+
+import pytest
+
+from api_clubplus.cache import TieredCache, cache_key
+from api_clubplus.client import StravaClient
+from api_clubplus.models import Activity, Session, init_db
+from api_clubplus.sync import ActivitySync
+from api_clubplus.tokens import delete_tokens, save_tokens
+from api_clubplus.webhooks import EventProcessor
+from mock_strava import make_activity
+
+OWNER, OTHER, ACTIVITY = 1, 2, 9001
+
+
+@pytest.fixture
+def processor(strava):
+    init_db()
+    # Strava 404s for an activity the token's athlete can't see
+    strava.visible_to = {'owner-token', 'refreshed-token'}
+    sync = ActivitySync(client=strava, background_backfill=False)
+    activity = make_activity(ACTIVITY)
+    strava.add(activity)
+    sync.store_activity(OWNER, activity)
+    save_tokens(OWNER, {'access_token': 'owner-token'})
+    save_tokens(OTHER, {'access_token': 'other-token'})
+    yield EventProcessor(client=strava, sync=sync, credentials=('client-id', 'client-secret'))
+    sync.delete_activity(ACTIVITY)
+    delete_tokens(OWNER)
+    delete_tokens(OTHER)
+
+
+def stored():
+    with Session() as session:
+        return session.get(Activity, ACTIVITY)
+
+
+def event(aspect_type, owner_id, updates=None):
+    return {'object_type': 'activity', 'object_id': ACTIVITY, 'aspect_type': aspect_type,
+            'owner_id': owner_id, 'updates': updates or {}}
+
+
+def test_owner_can_rename(processor):
+    processor.apply(event('update', OWNER, {'title': 'Renamed'}))
+    assert stored().name == 'Renamed'
+    assert processor.client.calls == []
+
+
+def test_other_athlete_cannot_rename(processor):
+    processor.apply(event('update', OTHER, {'title': 'Forged'}))
+    assert stored().name == f'Morning Run {ACTIVITY}'
+
+
+def test_delete_waits_for_strava(processor):
+    processor.apply(event('delete', OWNER))
+    # Still on Strava: kept
+    assert stored() is not None
+    del processor.client.activities[ACTIVITY]
+    processor.apply(event('delete', OWNER))
+    assert stored() is None
+
+
+def test_other_athlete_cannot_delete(processor):
+    processor.apply(event('delete', OTHER))
+    assert stored() is not None
+    assert processor.client.calls == [(f'/activities/{ACTIVITY}', 'other-token')]
+
+
+def test_expiring_token_is_refreshed_with_the_app_credentials(processor):
+    save_tokens(OWNER, {'access_token': 'expiring', 'refresh_token': 'refresh', 'expires_at': time.time() + 5})
+    processor.apply(event('create', OWNER))
+    assert processor.client.refreshes == [('client-id', 'client-secret', 'refresh')]
+    assert processor.client.calls == [(f'/activities/{ACTIVITY}', 'refreshed-token')]
+
+
+def test_invalidate_drops_parameterised_entries(processor, strava, monkeypatch):
+    client = StravaClient(cache=TieredCache())
+    monkeypatch.setattr(client, 'get', strava.get)
+    client.cached_get('/athlete/activities', 'owner-token', params={'page': 2})
+    key = cache_key('owner-token', '/athlete/activities', {'page': 2})
+    assert client.cache.get(key) is not None
+
+    processor.client = client
+    processor.invalidate(OWNER)
+    assert client.cache.get(key) is None